@@ -1,31 +1,118 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
 import os
 import redis
+import redis.asyncio
+import asyncio
+import base64
+import logging
+import hashlib
+import secrets
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Optional, Dict, List
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 import json
+from mcp_common.auth import (
+    GENERATION_CHANNEL, GENERATIONS_KEY, JWT_ALGORITHM, JWT_ISSUER, REVOCATION_CHANNEL, REVOKED_KEY,
+    get_current_claims, install_auth, revocation_id, verifier
+)
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import setup_tracing
 
 app = FastAPI(title="Authentication Service")
 
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Initialize Redis client
+REDIS_HOST = os.getenv("MEMORY_URL", "redis://memory:6379").split("://")[1].split(":")[0]
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 redis_client = redis.Redis(
-    host=os.getenv("MEMORY_URL", "redis://memory:6379").split("://")[1].split(":")[0],
-    port=6379,
+    host=REDIS_HOST,
+    port=REDIS_PORT,
     decode_responses=True
 )
 
 # Security configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-for-development")
-ALGORITHM = "HS256"
+APP_ENV = os.getenv("APP_ENV", "production")
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+JWT_PRIVATE_KEY_FILE = os.getenv("JWT_PRIVATE_KEY_FILE", "/run/secrets/jwt_private_key")  # mounted secret, PEM
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(len(os.sched_getaffinity(0)))))  # processes for bcrypt
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_WORKERS * 8)))  # hash jobs in flight before 429
+HASH_RETRY_AFTER = 1  # seconds suggested to clients turned away by admission control
+
+# User store
+USER_DB_URL = os.getenv("USER_DB_URL", "sqlite:///data/users.db")  # sqlite:///path or postgresql://...
+USERS_FILE = os.getenv("USERS_FILE")  # optional JSON users, keyed by username, to seed an empty store
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))
+USER_INVALIDATION_CHANNEL = "auth:users:invalidate"
+USERS_PAGE_MAX = 1000
+
+def load_signing_key() -> str:
+    """Load the RS256 private key (PEM) from JWT_PRIVATE_KEY or the secret mounted at JWT_PRIVATE_KEY_FILE.
+
+    Every replica must be given the same key. Outside production a missing key
+    is replaced by a throwaway one held only in this process; in production the
+    service refuses to start without one.
+    """
+    if os.getenv("JWT_PRIVATE_KEY"):
+        return os.environ["JWT_PRIVATE_KEY"]
+    if os.path.exists(JWT_PRIVATE_KEY_FILE):
+        with open(JWT_PRIVATE_KEY_FILE) as key_file:
+            return key_file.read()
+    if APP_ENV == "production":
+        raise RuntimeError(f"No signing key: mount one at {JWT_PRIVATE_KEY_FILE} or set JWT_PRIVATE_KEY")
+    logger.warning("No signing key configured; signing with a throwaway key for this process only")
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+def _b64(number: int) -> str:
+    data = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def public_jwk(private_pem: str) -> Dict:
+    """The public half of the signing key as a JWK, with a key id derived from it."""
+    public_key = serialization.load_pem_private_key(private_pem.encode(), password=None).public_key()
+    der = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    numbers = public_key.public_numbers()
+    return {
+        "kty": "RSA",
+        "use": "sig",
+        "alg": JWT_ALGORITHM,
+        "kid": hashlib.sha256(der).hexdigest()[:16],
+        "n": _b64(numbers.n),
+        "e": _b64(numbers.e)
+    }
+
+SIGNING_KEY = load_signing_key()
+SIGNING_JWK = public_jwk(SIGNING_KEY)
+JWKS = {"keys": [SIGNING_JWK]}
+
+# Verify our own tokens with the local key instead of fetching our JWKS
+verifier.jwks_url = None
+verifier.set_keys(JWKS)
+install_auth(app)
+setup_tracing(app, "auth-service")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
 
 # User models
 class User(BaseModel):
@@ -46,13 +133,14 @@ class TokenData(BaseModel):
     username: Optional[str] = None
     roles: List[str] = []
 
-# Mock user database - in production, use a real database
-fake_users_db = {
+# Users seeded into an empty store. Hashes are precomputed so that startup
+# does not run bcrypt.
+DEFAULT_USERS = {
     "admin": {
         "username": "admin",
         "full_name": "Administrator",
         "email": "admin@example.com",
-        "hashed_password": pwd_context.hash("admin"),
+        "hashed_password": "$2b$12$n.sV0O4uH3.Q67yCcbawDemmjuUNDMctmU55KkjQK/H3nhmTc0rQe",
         "disabled": False,
         "roles": ["admin", "user"]
     },
@@ -60,7 +148,7 @@ fake_users_db = {
         "username": "analyst",
         "full_name": "Security Analyst",
         "email": "analyst@example.com",
-        "hashed_password": pwd_context.hash("analyst"),
+        "hashed_password": "$2b$12$i4atNwOIipq9YgSjFMO9hev.n/xiJjN7mr4HRKnutc3SX2Zus1d5q",
         "disabled": False,
         "roles": ["analyst", "user"]
     },
@@ -68,29 +156,354 @@ fake_users_db = {
         "username": "user",
         "full_name": "Regular User",
         "email": "user@example.com",
-        "hashed_password": pwd_context.hash("user"),
+        "hashed_password": "$2b$12$mZcfP/qgJDorpIg5odh38.eqdSYa/CV6YhvZwBR.27sJoQD4TE7Yu",
         "disabled": False,
         "roles": ["user"]
     }
 }
 
+class UserRepository(ABC):
+    """Persistent user store. Usernames are the primary key; emails are unique."""
+
+    @abstractmethod
+    def get(self, username: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def create(self, user: Dict) -> bool:
+        """Insert a user; False if the username or email is taken."""
+        pass
+
+    @abstractmethod
+    def set_disabled(self, username: str, disabled: bool) -> bool:
+        """Disable or re-enable a user; False if there is no such user."""
+        pass
+
+    @abstractmethod
+    def list(self, after: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Users ordered by username, starting after the given username."""
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+    def seed(self, users: Dict[str, Dict]):
+        """Load users into an empty store."""
+        if self.count() == 0:
+            for user in users.values():
+                self.create(user)
+            logger.info(f"Seeded user store with {len(users)} users")
+
+    @staticmethod
+    def _row_to_user(row) -> Dict:
+        username, email, full_name, hashed_password, disabled, roles = row
+        return {
+            "username": username,
+            "email": email,
+            "full_name": full_name,
+            "hashed_password": hashed_password,
+            "disabled": bool(disabled),
+            "roles": json.loads(roles)
+        }
+
+    @staticmethod
+    def _user_to_row(user: Dict) -> tuple:
+        return (user["username"], user.get("email"), user.get("full_name"), user["hashed_password"],
+                bool(user.get("disabled")), json.dumps(user.get("roles", ["user"])))
+
+USER_COLUMNS = "username, email, full_name, hashed_password, disabled, roles"
+
+class SQLiteUserRepository(UserRepository):
+    def __init__(self, path: str):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                "username TEXT PRIMARY KEY, email TEXT, full_name TEXT, hashed_password TEXT NOT NULL, "
+                "disabled INTEGER NOT NULL DEFAULT 0, roles TEXT NOT NULL)"
+            )
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email)")
+
+    def _one(self, query: str, params: tuple) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute(query, params).fetchone()
+        return self._row_to_user(row) if row else None
+
+    def get(self, username: str) -> Optional[Dict]:
+        return self._one(f"SELECT {USER_COLUMNS} FROM users WHERE username = ?", (username,))
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        return self._one(f"SELECT {USER_COLUMNS} FROM users WHERE email = ?", (email,))
+
+    def create(self, user: Dict) -> bool:
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(f"INSERT INTO users ({USER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                                  self._user_to_row(user))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def set_disabled(self, username: str, disabled: bool) -> bool:
+        with self.lock, self.conn:
+            cursor = self.conn.execute("UPDATE users SET disabled = ? WHERE username = ?", (disabled, username))
+        return cursor.rowcount > 0
+
+    def list(self, after: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {USER_COLUMNS} FROM users WHERE username > ? ORDER BY username LIMIT ?",
+                (after or "", limit)
+            ).fetchall()
+        return [self._row_to_user(row) for row in rows]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+class PostgresUserRepository(UserRepository):
+    def __init__(self, dsn: str, max_connections: int = 10):
+        import psycopg2
+        import psycopg2.pool
+
+        self.errors = psycopg2
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, max_connections, dsn)
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "username TEXT PRIMARY KEY, email TEXT, full_name TEXT, hashed_password TEXT NOT NULL, "
+            "disabled BOOLEAN NOT NULL DEFAULT FALSE, roles TEXT NOT NULL)"
+        )
+        self._execute("CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email)")
+
+    def _execute(self, query: str, params: tuple = (), fetch: str = None):
+        conn = self.pool.getconn()
+        try:
+            with conn, conn.cursor() as cursor:
+                cursor.execute(query, params)
+                if fetch == "one":
+                    return cursor.fetchone()
+                if fetch == "all":
+                    return cursor.fetchall()
+        finally:
+            self.pool.putconn(conn)
+
+    def get(self, username: str) -> Optional[Dict]:
+        row = self._execute(f"SELECT {USER_COLUMNS} FROM users WHERE username = %s", (username,), fetch="one")
+        return self._row_to_user(row) if row else None
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        row = self._execute(f"SELECT {USER_COLUMNS} FROM users WHERE email = %s", (email,), fetch="one")
+        return self._row_to_user(row) if row else None
+
+    def create(self, user: Dict) -> bool:
+        try:
+            self._execute(f"INSERT INTO users ({USER_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s)",
+                          self._user_to_row(user))
+            return True
+        except self.errors.IntegrityError:
+            return False
+
+    def set_disabled(self, username: str, disabled: bool) -> bool:
+        row = self._execute("UPDATE users SET disabled = %s WHERE username = %s RETURNING username",
+                            (disabled, username), fetch="one")
+        return row is not None
+
+    def list(self, after: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        rows = self._execute(
+            f"SELECT {USER_COLUMNS} FROM users WHERE username > %s ORDER BY username LIMIT %s",
+            (after or "", limit), fetch="all"
+        )
+        return [self._row_to_user(row) for row in rows]
+
+    def count(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM users", fetch="one")[0]
+
+class CachedUserRepository:
+    """Read-through cache in front of a UserRepository.
+
+    Lookups by username are served from a process-local dict. Writes go to
+    the store and publish the username on USER_INVALIDATION_CHANNEL so every
+    replica drops its cached copy.
+    """
+
+    def __init__(self, store: UserRepository, size: int = USER_CACHE_SIZE):
+        self.store = store
+        self.size = size
+        self.cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+
+    def get(self, username: str) -> Optional[Dict]:
+        user = self.cache.get(username)
+        if user is not None:
+            self.cache.move_to_end(username)
+            return user
+        user = self.store.get(username)
+        if user is not None:
+            self.cache[username] = user
+            if len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+        return user
+
+    async def aget(self, username: str) -> Optional[Dict]:
+        """get() that only leaves the event loop on a cache miss."""
+        user = self.cache.get(username)
+        if user is not None:
+            self.cache.move_to_end(username)
+            return user
+        return await run_in_threadpool(self.get, username)
+
+    def get_by_email(self, email: str) -> Optional[Dict]:
+        return self.store.get_by_email(email)
+
+    def create(self, user: Dict) -> bool:
+        created = self.store.create(user)
+        if created:
+            self.publish_invalidation(user["username"])
+        return created
+
+    def set_disabled(self, username: str, disabled: bool) -> bool:
+        updated = self.store.set_disabled(username, disabled)
+        if updated:
+            self.publish_invalidation(username)
+        return updated
+
+    def list(self, after: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        return self.store.list(after, limit)
+
+    def invalidate(self, username: str):
+        self.cache.pop(username, None)
+
+    def publish_invalidation(self, username: str):
+        self.invalidate(username)
+        try:
+            redis_client.publish(USER_INVALIDATION_CHANNEL, username)
+        except Exception as e:
+            logger.warning(f"Failed to publish user cache invalidation: {str(e)}")
+
+    async def listen(self):
+        """Drop cached users changed by other replicas."""
+        client = redis.asyncio.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        try:
+            while True:
+                pubsub = client.pubsub()
+                try:
+                    await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+                    # Changes made while we were not subscribed are unknown
+                    self.cache.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.invalidate(message["data"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"User invalidation listener error: {str(e)}")
+                    await asyncio.sleep(1)
+                finally:
+                    await pubsub.aclose()
+        finally:
+            await client.aclose()
+
+    def start(self):
+        """Start listening for invalidations if called from a running event loop."""
+        if self._listener is None:
+            try:
+                self._listener = asyncio.get_running_loop().create_task(self.listen())
+            except RuntimeError:
+                pass
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+def create_user_repository(url: str) -> UserRepository:
+    if url.startswith("sqlite:///"):
+        return SQLiteUserRepository(url[len("sqlite:///"):])
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresUserRepository(url)
+    raise ValueError(f"Unsupported USER_DB_URL: {url}")
+
+_user_repository: Optional[CachedUserRepository] = None
+
+def get_user_repository() -> CachedUserRepository:
+    """The user store, opened and seeded on first use, when it also starts listening for invalidations."""
+    global _user_repository
+    if _user_repository is None:
+        store = create_user_repository(USER_DB_URL)
+        if USERS_FILE:
+            with open(USERS_FILE) as users_file:
+                store.seed(json.load(users_file))
+        else:
+            store.seed(DEFAULT_USERS)
+        _user_repository = CachedUserRepository(store)
+    _user_repository.start()
+    return _user_repository
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# bcrypt is deliberately slow; run it in worker processes so it neither blocks
+# the event loop nor holds the GIL
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_jobs = 0
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+    return _hash_pool
+
+async def run_hash_job(func, *args):
+    """Run a hashing function in the pool, rejecting with 429 once HASH_QUEUE_LIMIT jobs are in flight."""
+    global _hash_jobs
+    if _hash_jobs >= HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many concurrent logins, retry shortly",
+            headers={"Retry-After": str(HASH_RETRY_AFTER)}
+        )
+    _hash_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_hash_pool(), func, *args)
+    finally:
+        _hash_jobs -= 1
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await run_hash_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await run_hash_job(get_password_hash, password)
+
 def get_user(db, username: str):
-    if username in db:
-        user_dict = db[username]
+    user_dict = db.get(username)
+    if user_dict is not None:
         return UserInDB(**user_dict)
     return None
 
-def authenticate_user(fake_db, username: str, password: str):
-    user = get_user(fake_db, username)
+async def authenticate_user(db, username: str, password: str):
+    user_dict = await db.aget(username)
+    user = UserInDB(**user_dict) if user_dict else None
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
+        return False
+    if user.disabled:
         return False
     return user
 
@@ -100,33 +513,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "iss": JWT_ISSUER, "jti": secrets.token_urlsafe(16)})
+    encoded_jwt = jwt.encode(to_encode, SIGNING_KEY, algorithm=JWT_ALGORITHM, headers={"kid": SIGNING_JWK["kid"]})
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username, roles=payload.get("roles", []))
-    except JWTError:
-        raise credentials_exception
-    user = get_user(fake_users_db, username=token_data.username)
-    if user is None:
-        raise credentials_exception
-    return user
+async def get_current_user(claims: Dict = Depends(get_current_claims)):
+    # Everything needed for authorization is in the verified claims; no user lookup
+    return User(username=claims["sub"], roles=claims.get("roles", []))
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
-    if current_user.disabled:
+    # The claims say nothing about whether the user has been disabled since the token was issued
+    user_dict = await get_user_repository().aget(current_user.username)
+    if user_dict is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if user_dict["disabled"]:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+    return User(**{k: v for k, v in user_dict.items() if k != "hashed_password"})
 
 def has_role(required_roles: List[str]):
     async def role_checker(current_user: User = Depends(get_current_active_user)):
@@ -142,7 +548,7 @@ def has_role(required_roles: List[str]):
 
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(fake_users_db, form_data.username, form_data.password)
+    user = await authenticate_user(get_user_repository(), form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -150,20 +556,20 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Tokens are not stored; revocation works on the jti and the user's token generation
+    generation = int(redis_client.hget(GENERATIONS_KEY, user.username) or 0)
     access_token = create_access_token(
-        data={"sub": user.username, "roles": user.roles},
+        data={"sub": user.username, "roles": user.roles, "gen": generation},
         expires_delta=access_token_expires
     )
     
-    # Store token in Redis for potential revocation
-    redis_client.set(
-        f"token:{access_token}",
-        json.dumps({"username": user.username, "roles": user.roles}),
-        ex=ACCESS_TOKEN_EXPIRE_MINUTES * 60
-    )
-    
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.get("/.well-known/jwks.json")
+async def get_jwks():
+    """Public keys for verifying access tokens."""
+    return JWKS
+
 @app.get("/users/me", response_model=User)
 async def read_users_me(current_user: User = Depends(get_current_active_user)):
     return current_user
@@ -178,38 +584,102 @@ async def create_user(
     password: str,
     current_user: User = Depends(has_role(["admin"]))
 ):
-    if user.username in fake_users_db:
+    users = get_user_repository()
+    if await run_in_threadpool(users.get, user.username) is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
+    if user.email and await run_in_threadpool(users.get_by_email, user.email) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
-    hashed_password = get_password_hash(password)
+    hashed_password = await get_password_hash_async(password)
     user_dict = user.dict()
     user_dict["hashed_password"] = hashed_password
     
-    # In a real application, save to a database
-    fake_users_db[user.username] = user_dict
+    if not await run_in_threadpool(users.create, user_dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
     
     return User(**user_dict)
 
 @app.get("/users", response_model=List[User])
-async def list_users(current_user: User = Depends(has_role(["admin"]))):
-    users = []
-    for username, user_dict in fake_users_db.items():
-        user_data = {k: v for k, v in user_dict.items() if k != "hashed_password"}
-        users.append(User(**user_data))
-    return users
+async def list_users(
+    after: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=USERS_PAGE_MAX),
+    current_user: User = Depends(has_role(["admin"]))
+):
+    """List users ordered by username. Pass the last username of a page as after to get the next page."""
+    rows = await run_in_threadpool(get_user_repository().list, after, limit)
+    return [User(**{k: v for k, v in row.items() if k != "hashed_password"}) for row in rows]
 
 @app.post("/revoke")
 async def revoke_token(
     token: str,
     current_user: User = Depends(has_role(["admin"]))
 ):
-    # In a real application, you would validate the token first
-    redis_client.delete(f"token:{token}")
+    try:
+        claims = jwt.decode(token, SIGNING_JWK, algorithms=[JWT_ALGORITHM], options={"verify_exp": False, "verify_aud": False})
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid token")
+    
+    # Services check the revoked set through their bloom filters; entries expire with the token
+    revoked_id = revocation_id(token, claims)
+    redis_client.zadd(REVOKED_KEY, {revoked_id: claims["exp"]})
+    redis_client.publish(REVOCATION_CHANNEL, revoked_id)
+    verifier.revoke(revoked_id)
     return {"message": "Token revoked successfully"}
 
+def bump_token_generation(username: str) -> int:
+    """Invalidate every token issued to a user so far, in this and every other service."""
+    generation = redis_client.hincrby(GENERATIONS_KEY, username, 1)
+    redis_client.publish(GENERATION_CHANNEL, f"{username}:{generation}")
+    verifier.apply_generation(f"{username}:{generation}")
+    return generation
+
+@app.post("/users/{username}/revoke")
+async def revoke_user_tokens(
+    username: str,
+    current_user: User = Depends(has_role(["admin"]))
+):
+    """Revoke every token issued to a user so far by bumping their token generation."""
+    generation = bump_token_generation(username)
+    return {"message": f"Tokens for {username} revoked", "generation": generation}
+
+@app.post("/users/{username}/disable")
+async def disable_user(
+    username: str,
+    current_user: User = Depends(has_role(["admin"]))
+):
+    """Disable a user and revoke the tokens already issued to them."""
+    if not await run_in_threadpool(get_user_repository().set_disabled, username, True):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    generation = bump_token_generation(username)
+    return {"message": f"User {username} disabled", "generation": generation}
+
+@app.post("/users/{username}/enable")
+async def enable_user(
+    username: str,
+    current_user: User = Depends(has_role(["admin"]))
+):
+    if not await run_in_threadpool(get_user_repository().set_disabled, username, False):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return {"message": f"User {username} enabled"}
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global _hash_pool
+    if _user_repository is not None:
+        await _user_repository.stop()
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
@@ -0,0 +1,136 @@
+"""
+Benchmark logins per second under concurrency.
+
+Drives POST /token in process through httpx's ASGI transport, comparing
+bcrypt verification inline on the event loop (the previous behaviour) with
+the process pool. While logins run, a probe requests /health every 10 ms to
+show how long other requests wait behind password hashing. Redis is replaced
+by an in-memory dict and the signing key is generated up front, so nothing
+outside the process is needed.
+
+Usage:
+    python benchmarks/bench_logins.py [--logins 200] [--concurrency 32] [--workers N] [--queue-limit N] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(SERVICE_DIR))
+sys.path.append(SERVICE_DIR)
+sys.path.append(REPO_ROOT)  # for mcp_common
+
+class MemoryStore:
+    """Stand-in for the Redis calls /token makes."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event, interval: float = 0.01) -> list:
+    """/health latency measured from when each probe was due, so time spent waiting for the loop counts."""
+    latencies = []
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        await client.get("/health")
+        latencies.append(time.perf_counter() - due)
+    return latencies
+
+async def run_logins(app_module, logins: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://auth") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        codes = []
+
+        async def login(i):
+            username = ("admin", "analyst", "user")[i % 3]
+            async with semaphore:
+                response = await client.post("/token", data={"username": username, "password": username})
+                codes.append(response.status_code)
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        health = await probe
+
+    ok = codes.count(200)
+    return {
+        "seconds": elapsed,
+        "logins_per_second": ok / elapsed,
+        "succeeded": ok,
+        "rejected": codes.count(429),
+        "health_p50_ms": statistics.median(health) * 1000 if health else None,
+        "health_max_ms": max(health) * 1000 if health else None
+    }
+
+async def bench(args) -> dict:
+    import app as app_module
+
+    app_module.redis_client = MemoryStore()
+    app_module.get_user_repository()
+    report = {"logins": args.logins, "concurrency": args.concurrency,
+              "workers": app_module.HASH_WORKERS, "queue_limit": app_module.HASH_QUEUE_LIMIT, "results": []}
+
+    pooled_verify = app_module.verify_password_async
+
+    async def inline_verify(plain_password, hashed_password):
+        return app_module.verify_password(plain_password, hashed_password)
+
+    app_module.verify_password_async = inline_verify
+    report["results"].append({"mode": "inline (legacy)", **await run_logins(app_module, args.logins, args.concurrency)})
+
+    app_module.verify_password_async = pooled_verify
+    # Start the workers before timing so process start-up is not counted
+    await asyncio.gather(*(app_module.get_password_hash_async("warmup") for _ in range(app_module.HASH_WORKERS)))
+    report["results"].append({"mode": "process pool", **await run_logins(app_module, args.logins, args.concurrency)})
+    app_module.get_hash_pool().shutdown()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200, help="logins to perform")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent login requests")
+    parser.add_argument("--workers", type=int, help="hash worker processes (default: available cores)")
+    parser.add_argument("--queue-limit", type=int, help="hash jobs in flight before 429 (default: workers * 8)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    if args.workers:
+        os.environ["HASH_WORKERS"] = str(args.workers)
+    if args.queue_limit:
+        os.environ["HASH_QUEUE_LIMIT"] = str(args.queue_limit)
+    os.environ["USER_DB_URL"] = "sqlite:///:memory:"
+    os.environ["JWT_PRIVATE_KEY"] = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    logging.disable(logging.WARNING)
+
+    report = asyncio.run(bench(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['logins']} logins, concurrency {report['concurrency']}, "
+          f"{report['workers']} hash workers, queue limit {report['queue_limit']}")
+    print(f"{'mode':<18}{'seconds':>9}{'logins/s':>10}{'ok':>6}{'429':>6}{'health p50 ms':>15}{'health max ms':>15}")
+    for row in report["results"]:
+        print(f"{row['mode']:<18}{row['seconds']:>9.2f}{row['logins_per_second']:>10.1f}{row['succeeded']:>6}"
+              f"{row['rejected']:>6}{row['health_p50_ms']:>15.1f}{row['health_max_ms']:>15.1f}")
+
+if __name__ == "__main__":
+    main()
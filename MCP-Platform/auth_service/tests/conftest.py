@@ -0,0 +1,55 @@
+import pytest
+import os
+import sys
+
+import fakeredis
+import fakeredis.aioredis
+
+# Add the parent directory to the path so we can import the app, and the
+# repository root for the shared mcp_common package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+os.environ.setdefault("MEMORY_URL", "redis://localhost:6379")
+os.environ.setdefault("APP_ENV", "development")
+os.environ.setdefault("USER_DB_URL", "sqlite:///:memory:")
+os.environ.setdefault("HASH_WORKERS", "2")
+
+import app as app_module
+from mcp_common.auth import get_current_claims
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+@pytest.fixture
+def store(server, monkeypatch):
+    """A fake Redis behind the service's sync client and the invalidation listener."""
+    store = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(app_module, "redis_client", store)
+    monkeypatch.setattr(app_module.redis.asyncio, "Redis",
+                        lambda **kwargs: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    return store
+
+@pytest.fixture
+def users(store, monkeypatch):
+    """A fresh in-memory user store seeded with the default users."""
+    sqlite = app_module.SQLiteUserRepository(":memory:")
+    sqlite.seed(app_module.DEFAULT_USERS)
+    repository = app_module.CachedUserRepository(sqlite)
+    monkeypatch.setattr(app_module, "_user_repository", repository)
+    return repository
+
+@pytest.fixture
+def as_admin():
+    app_module.app.dependency_overrides[get_current_claims] = lambda: {"sub": "admin", "roles": ["admin", "user"]}
+    yield
+    app_module.app.dependency_overrides.pop(get_current_claims, None)
+
+@pytest.fixture(autouse=True)
+def hash_pool():
+    """Each test starts without a hash pool and shuts down the one it made."""
+    yield
+    if app_module._hash_pool is not None:
+        app_module._hash_pool.shutdown()
+        app_module._hash_pool = None
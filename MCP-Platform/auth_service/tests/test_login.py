@@ -0,0 +1,39 @@
+import pytest
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+from fastapi.testclient import TestClient
+from jose import jwt
+
+import app as app_module
+from app import app
+
+def test_valid_login_is_verified_in_the_hash_pool(users):
+    with TestClient(app) as client:
+        assert app_module._hash_pool is None
+        response = client.post("/token", data={"username": "admin", "password": "admin"})
+        assert response.status_code == 200
+        assert jwt.get_unverified_claims(response.json()["access_token"])["sub"] == "admin"
+        assert client.post("/token", data={"username": "admin", "password": "wrong"}).status_code == 401
+        assert isinstance(app_module._hash_pool, ProcessPoolExecutor)
+        assert app_module._hash_jobs == 0
+
+def test_logins_beyond_the_hash_queue_limit_are_turned_away(users, monkeypatch):
+    monkeypatch.setattr(app_module, "HASH_QUEUE_LIMIT", 2)
+
+    async def run():
+        # Fill every slot with a slow job
+        busy = [asyncio.create_task(app_module.run_hash_job(time.sleep, 1)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert app_module._hash_jobs == 2
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://auth") as client:
+            response = await client.post("/token", data={"username": "admin", "password": "admin"})
+        await asyncio.gather(*busy)
+        return response
+
+    response = asyncio.run(run())
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(app_module.HASH_RETRY_AFTER)
+    assert app_module._hash_jobs == 0
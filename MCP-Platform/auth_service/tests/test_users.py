@@ -0,0 +1,104 @@
+import pytest
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import DEFAULT_USERS, USER_INVALIDATION_CHANNEL, CachedUserRepository, SQLiteUserRepository, app
+
+def make_user(username, email=None, **fields):
+    return {"username": username, "email": email or f"{username}@example.com", "full_name": username.title(),
+            "hashed_password": "not-a-hash", "roles": ["user"], **fields}
+
+def login(client, username, password):
+    return client.post("/token", data={"username": username, "password": password})
+
+def test_sqlite_repository_crud():
+    repository = SQLiteUserRepository(":memory:")
+    assert repository.create(make_user("carol", roles=["analyst", "user"]))
+    assert repository.create(make_user("bob"))
+
+    assert repository.get("carol") == make_user("carol", roles=["analyst", "user"], disabled=False)
+    assert repository.get_by_email("bob@example.com")["username"] == "bob"
+    assert repository.get("nobody") is None
+    assert repository.count() == 2
+    assert [user["username"] for user in repository.list()] == ["bob", "carol"]
+    assert [user["username"] for user in repository.list(after="bob", limit=1)] == ["carol"]
+
+    assert repository.set_disabled("bob", True)
+    assert repository.get("bob")["disabled"] is True
+    assert not repository.set_disabled("nobody", True)
+
+def test_sqlite_repository_usernames_and_emails_are_unique():
+    repository = SQLiteUserRepository(":memory:")
+    assert repository.create(make_user("carol"))
+    assert not repository.create(make_user("carol", email="other@example.com"))
+    assert not repository.create(make_user("dave", email="carol@example.com"))
+    assert repository.count() == 1
+
+def test_store_is_seeded_from_users_file_once(tmp_path, monkeypatch):
+    users_file = tmp_path / "users.json"
+    users_file.write_text(json.dumps({"carol": make_user("carol")}))
+    monkeypatch.setattr(app_module, "USERS_FILE", str(users_file))
+    monkeypatch.setattr(app_module, "USER_DB_URL", f"sqlite:///{tmp_path}/db/users.db")
+    monkeypatch.setattr(app_module, "_user_repository", None)
+
+    repository = app_module.get_user_repository()
+    assert repository.get("carol")["email"] == "carol@example.com"
+    assert repository.get("admin") is None
+
+    # A store that already has users is left alone
+    users_file.write_text(json.dumps({"dave": make_user("dave")}))
+    monkeypatch.setattr(app_module, "_user_repository", None)
+    repository = app_module.get_user_repository()
+    assert repository.store.count() == 1
+    assert repository.get("dave") is None
+
+def test_cache_evicts_least_recently_used(store):
+    sqlite = SQLiteUserRepository(":memory:")
+    sqlite.seed(DEFAULT_USERS)
+    repository = CachedUserRepository(sqlite, size=2)
+    repository.get("admin")
+    repository.get("analyst")
+    repository.get("admin")
+    repository.get("user")
+    assert list(repository.cache) == ["admin", "user"]
+
+def test_writes_invalidate_every_replica(store):
+    sqlite = SQLiteUserRepository(":memory:")
+    sqlite.seed(DEFAULT_USERS)
+    writer = CachedUserRepository(sqlite)
+    reader = CachedUserRepository(sqlite)
+
+    async def run():
+        reader.start()
+        # Wait until the listener is subscribed, then cache a user on the reader
+        while not store.pubsub_numsub(USER_INVALIDATION_CHANNEL)[0][1]:
+            await asyncio.sleep(0.01)
+        assert reader.get("analyst")["disabled"] is False
+        writer.get("analyst")
+
+        writer.set_disabled("analyst", True)
+        assert "analyst" not in writer.cache
+        for _ in range(100):
+            if "analyst" not in reader.cache:
+                break
+            await asyncio.sleep(0.01)
+        await reader.stop()
+
+    asyncio.run(run())
+    assert "analyst" not in reader.cache
+    assert reader.get("analyst")["disabled"] is True
+
+def test_disabled_users_cannot_log_in(users, as_admin):
+    with TestClient(app) as client:
+        assert login(client, "analyst", "analyst").status_code == 200
+
+        assert client.post("/users/analyst/disable").status_code == 200
+        assert login(client, "analyst", "analyst").status_code == 401
+        assert int(app_module.redis_client.hget(app_module.GENERATIONS_KEY, "analyst")) == 1
+
+        assert client.post("/users/analyst/enable").status_code == 200
+        assert login(client, "analyst", "analyst").status_code == 200
+        assert client.post("/users/nobody/disable").status_code == 404
@@ -1,11 +1,17 @@
 from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import os
 import redis
+import redis.asyncio
 import json
 import logging
 import asyncio
+import threading
+import time
+import hashlib
+import uuid
+from collections.abc import MutableMapping
 from typing import List, Dict, Optional, Union, Any
 from datetime import datetime
 import httpx
@@ -19,22 +25,42 @@ import splunklib.client as splunk
 import tenable.io
 import rapid7.vm
 from abc import ABC, abstractmethod
+from prometheus_client import Histogram
+from codec import get_codec
+from mcp_common.auth import get_current_user, install_auth
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import LATENCY_BUCKETS, setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import setup_tracing, span
 
 app = FastAPI(title="Data Source Connectors Service")
+install_auth(app)
+setup_tracing(app, "data-connectors-service")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Redis client
+# Initialize Redis clients
+REDIS_HOST = os.getenv("MEMORY_URL", "redis://memory:6379").split("://")[1].split(":")[0]
+
 redis_client = redis.Redis(
-    host=os.getenv("MEMORY_URL", "redis://memory:6379").split("://")[1].split(":")[0],
+    host=REDIS_HOST,
     port=6379,
     decode_responses=True
 )
 
-# OAuth2 scheme for JWT validation
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
+# Binary-safe client for codec-encoded payloads
+redis_binary_client = redis.Redis(
+    host=REDIS_HOST,
+    port=6379
+)
+
+# Codec for everything this service stores in Redis (RESULT_CODEC, e.g. "msgpack+zstd")
+result_codec = get_codec()
 
 # Models
 class DataSourceConfig(BaseModel):
@@ -44,6 +70,8 @@ class DataSourceConfig(BaseModel):
     config: Dict[str, Any]
     description: Optional[str] = None
     tags: List[str] = []
+    health_check_interval: Optional[int] = None  # seconds, defaults to HEALTH_CHECK_INTERVAL
+    cache_ttl: Optional[int] = None  # seconds, defaults to QUERY_CACHE_TTL; 0 disables caching
 
 class DataSourceStatus(BaseModel):
     source_id: str
@@ -51,6 +79,8 @@ class DataSourceStatus(BaseModel):
     type: str
     status: str
     last_sync: Optional[str] = None
+    last_checked: Optional[str] = None
+    metrics_updated: Optional[str] = None
     error: Optional[str] = None
     metrics: Dict[str, Any] = {}
 
@@ -60,6 +90,7 @@ class DataQuery(BaseModel):
     parameters: Dict[str, Any]
     limit: int = 100
     timeout: int = 30
+    use_cache: bool = True
 
 class DataQueryResult(BaseModel):
     query_id: str
@@ -71,6 +102,10 @@ class DataQueryResult(BaseModel):
 
 # Abstract base class for data source connectors
 class DataSourceConnector(ABC):
+    # Set on connectors whose client library blocks (pymongo, psycopg2, ...) so
+    # queries and health probes run them off the event loop, one at a time.
+    blocking_io = False
+
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.client = None
@@ -78,6 +113,8 @@ class DataSourceConnector(ABC):
         self.last_sync = None
         self.error = None
         self.metrics = {}
+        # Held by whichever thread is using a blocking client
+        self.client_lock = threading.Lock()
 
     @abstractmethod
     async def connect(self) -> bool:
@@ -156,6 +193,22 @@ class ElasticsearchConnector(DataSourceConnector):
                     id=parameters["id"]
                 )
                 return [response["_source"]]
+            elif query_type == "export":
+                # Bounded by limit here; use the /export endpoint to stream everything
+                results = []
+                hits = self.export(parameters, timeout)
+                try:
+                    async for hit in hits:
+                        results.append(hit)
+                        if len(results) >= limit:
+                            break
+                finally:
+                    await hits.aclose()
+                return results
+            elif query_type == "aggregate":
+                return await self.aggregate(parameters, timeout)
+            elif query_type == "msearch":
+                return await self.msearch(parameters, limit, timeout)
             else:
                 raise ValueError(f"Unsupported query type: {query_type}")
         except Exception as e:
@@ -163,6 +216,119 @@ class ElasticsearchConnector(DataSourceConnector):
             logger.error(f"Failed to execute Elasticsearch query: {self.error}")
             return []
 
+    @staticmethod
+    def _query_clause(parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Accept either a query clause or a search body with a "query" key."""
+        query = parameters.get("query") or {"match_all": {}}
+        if isinstance(query.get("query"), dict):
+            return query["query"]
+        return query
+
+    async def export(self, parameters: Dict[str, Any], timeout: int = 30):
+        """Stream every matching hit using a point in time and search_after.
+
+        With "slices" > 1 the point in time is split into slices that are paged
+        in parallel; hits are yielded as they arrive, so order is not guaranteed.
+        """
+        keep_alive = parameters.get("keep_alive", "1m")
+        batch_size = parameters.get("batch_size", 1000)
+        slices = max(1, parameters.get("slices", 1))
+        query = self._query_clause(parameters)
+
+        pit = await self.client.open_point_in_time(index=parameters["index"], keep_alive=keep_alive)
+        pit_id = pit["id"]
+        queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size * slices)
+        done = object()
+
+        async def page_slice(slice_id: int):
+            # Elasticsearch may return a new id with each page; always send the latest
+            nonlocal pit_id
+            try:
+                search_after = None
+                while True:
+                    body = {
+                        "pit": {"id": pit_id, "keep_alive": keep_alive},
+                        "query": query,
+                        "size": batch_size,
+                        "sort": [{"_shard_doc": "asc"}],
+                        "timeout": f"{timeout}s"
+                    }
+                    if slices > 1:
+                        body["slice"] = {"id": slice_id, "max": slices}
+                    if search_after is not None:
+                        body["search_after"] = search_after
+                    response = await self.client.search(**body)
+                    pit_id = response.get("pit_id", pit_id)
+                    hits = response["hits"]["hits"]
+                    for hit in hits:
+                        await queue.put(hit["_source"])
+                    if len(hits) < batch_size:
+                        break
+                    search_after = hits[-1]["sort"]
+            except Exception as e:
+                await queue.put(e)
+            finally:
+                await queue.put(done)
+
+        tasks = [asyncio.create_task(page_slice(slice_id)) for slice_id in range(slices)]
+        try:
+            remaining = slices
+            while remaining:
+                item = await queue.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self.client.close_point_in_time(id=pit_id)
+            except Exception as e:
+                logger.warning(f"Failed to close Elasticsearch point in time: {str(e)}")
+
+    async def aggregate(self, parameters: Dict[str, Any], timeout: int = 30) -> List[Dict[str, Any]]:
+        """Run aggregations server side and return only their results, plus the hit count."""
+        response = await self.client.search(
+            index=parameters["index"],
+            query=self._query_clause(parameters),
+            aggs=parameters.get("aggs"),
+            size=0,
+            track_total_hits=True,
+            timeout=f"{timeout}s"
+        )
+        results = [{"aggregation": "_count", "value": response["hits"]["total"]["value"]}]
+        for name, value in response.get("aggregations", {}).items():
+            results.append({"aggregation": name, **value})
+        return results
+
+    async def msearch(self, parameters: Dict[str, Any], limit: int = 100, timeout: int = 30) -> List[Dict[str, Any]]:
+        """Run many small searches in one round trip. Returns one entry per search."""
+        searches = []
+        for search in parameters["searches"]:
+            searches.append({"index": search.get("index", parameters.get("index"))})
+            searches.append({
+                "query": self._query_clause(search),
+                "size": min(search.get("size", limit), limit),
+                "timeout": f"{timeout}s"
+            })
+
+        response = await self.client.msearch(searches=searches)
+        results = []
+        for position, item in enumerate(response["responses"]):
+            if "error" in item:
+                results.append({"search": position, "hits": [], "total": 0, "error": item["error"]})
+            else:
+                results.append({
+                    "search": position,
+                    "hits": [hit["_source"] for hit in item["hits"]["hits"]],
+                    "total": item["hits"]["total"]["value"]
+                })
+        return results
+
     async def get_metrics(self) -> Dict[str, Any]:
         try:
             stats = await self.client.cluster.stats()
@@ -179,6 +345,8 @@ class ElasticsearchConnector(DataSourceConnector):
 
 # MongoDB Connector
 class MongoDBConnector(DataSourceConnector):
+    blocking_io = True
+
     async def connect(self) -> bool:
         try:
             self.client = MongoClient(
@@ -259,6 +427,8 @@ class MongoDBConnector(DataSourceConnector):
 
 # PostgreSQL Connector
 class PostgreSQLConnector(DataSourceConnector):
+    blocking_io = True
+
     async def connect(self) -> bool:
         try:
             self.client = psycopg2.connect(
@@ -344,6 +514,8 @@ class PostgreSQLConnector(DataSourceConnector):
 
 # MySQL Connector
 class MySQLConnector(DataSourceConnector):
+    blocking_io = True
+
     async def connect(self) -> bool:
         try:
             self.client = mysql.connector.connect(
@@ -410,6 +582,8 @@ class MySQLConnector(DataSourceConnector):
 
 # Splunk Connector
 class SplunkConnector(DataSourceConnector):
+    blocking_io = True
+
     async def connect(self) -> bool:
         try:
             self.client = splunk.connect(
@@ -487,6 +661,8 @@ class SplunkConnector(DataSourceConnector):
 
 # Tenable.io Connector
 class TenableConnector(DataSourceConnector):
+    blocking_io = True
+
     async def connect(self) -> bool:
         try:
             self.client = tenable.io.TenableIO(
@@ -555,6 +731,8 @@ class TenableConnector(DataSourceConnector):
 
 # Rapid7 InsightVM Connector
 class Rapid7Connector(DataSourceConnector):
+    blocking_io = True
+
     async def connect(self) -> bool:
         try:
             self.client = rapid7.vm.Console(
@@ -648,18 +826,442 @@ def get_connector(source_type: str, config: Dict[str, Any]) -> DataSourceConnect
     
     return connectors[source_type](config)
 
+# Connector registry configuration
+DATASOURCE_TTL = 86400 * 30  # Expire source configurations after 30 days
+DATASOURCE_INDEX_KEY = "datasources"
+DATASOURCE_EVENTS_CHANNEL = "datasource:events"
+REGISTRY_RESUBSCRIBE_DELAY = 5
+
+class ConnectorRegistry(MutableMapping):
+    """Data sources known to this worker, kept in sync with Redis.
+
+    Maps source_id -> {"config": ..., "connector": ...}. Configurations are
+    persisted under datasource:{id} and indexed in the datasources set, so any
+    worker can rehydrate the registry at startup without connecting to anything.
+    Connectors are created and connected on first use. Creations and deletions
+    are broadcast on DATASOURCE_EVENTS_CHANNEL so other workers and replicas
+    pick them up.
+    """
+
+    def __init__(self):
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        self.instance_id = str(uuid.uuid4())
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def __getitem__(self, source_id: str) -> Dict[str, Any]:
+        return self.sources[source_id]
+
+    def __setitem__(self, source_id: str, source_data: Dict[str, Any]):
+        self.sources[source_id] = source_data
+
+    def __delitem__(self, source_id: str):
+        del self.sources[source_id]
+        self._locks.pop(source_id, None)
+
+    def __iter__(self):
+        return iter(self.sources)
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def connected_ids(self) -> List[str]:
+        """Sources with an open connector in this worker."""
+        return [source_id for source_id, source_data in self.sources.items() if source_data.get("connector")]
+
+    async def connector(self, source_id: str) -> DataSourceConnector:
+        """Return the source's connector, connecting it on first use."""
+        source_data = self.sources[source_id]
+        if source_data.get("connector") is None:
+            lock = self._locks.setdefault(source_id, asyncio.Lock())
+            async with lock:
+                if source_data.get("connector") is None:
+                    config = source_data["config"]
+                    connector = get_connector(config["type"], config["config"])
+                    if not await run_connector_call(connector, connector.connect):
+                        logger.warning(f"Lazy connect to data source {source_id} failed: {connector.error}")
+                    source_data["connector"] = connector
+        return source_data["connector"]
+
+    def add(self, source_id: str, config: Dict[str, Any], connector: Optional[DataSourceConnector] = None):
+        """Register a new source locally, persist it and tell the other workers."""
+        self.sources[source_id] = {"connector": connector, "config": config}
+        pipe = redis_binary_client.pipeline(transaction=False)
+        pipe.set(f"datasource:{source_id}", result_codec.encode(config), ex=DATASOURCE_TTL)
+        pipe.sadd(DATASOURCE_INDEX_KEY, source_id)
+        pipe.execute()
+        self._publish("created", source_id)
+
+    async def remove(self, source_id: str):
+        """Disconnect and forget a source everywhere."""
+        await self._drop(source_id)
+        pipe = redis_binary_client.pipeline(transaction=False)
+        pipe.delete(f"datasource:{source_id}")
+        pipe.srem(DATASOURCE_INDEX_KEY, source_id)
+        pipe.execute()
+        self._publish("deleted", source_id)
+
+    async def _drop(self, source_id: str):
+        source_data = self.sources.pop(source_id, None)
+        self._locks.pop(source_id, None)
+        health_monitor.forget(source_id)
+        if source_data and source_data.get("connector"):
+            connector = source_data["connector"]
+            await run_connector_call(connector, connector.disconnect)
+
+    def _publish(self, event: str, source_id: str):
+        try:
+            redis_binary_client.publish(
+                DATASOURCE_EVENTS_CHANNEL,
+                json.dumps({"event": event, "source_id": source_id, "origin": self.instance_id})
+            )
+        except Exception as e:
+            logger.warning(f"Failed to publish data source {event} event for {source_id}: {str(e)}")
+
+    def _load_configs(self, source_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        payloads = redis_binary_client.mget([f"datasource:{source_id}" for source_id in source_ids]) if source_ids else []
+        configs = {}
+        for source_id, payload in zip(source_ids, payloads):
+            if payload is not None:
+                configs[source_id] = result_codec.decode(payload)
+        return configs
+
+    async def sync(self):
+        """Reconcile the registry with Redis without opening any connections."""
+        source_ids = [member.decode() for member in redis_binary_client.smembers(DATASOURCE_INDEX_KEY)]
+        if not source_ids:
+            # Sources stored before the index existed
+            keys = [key.decode() for key in redis_binary_client.scan_iter(match="datasource:*")]
+            source_ids = [key.split(":", 1)[1] for key in keys if key.count(":") == 1]
+            if source_ids:
+                redis_binary_client.sadd(DATASOURCE_INDEX_KEY, *source_ids)
+
+        configs = self._load_configs(source_ids)
+        expired = [source_id for source_id in source_ids if source_id not in configs]
+        if expired:
+            redis_binary_client.srem(DATASOURCE_INDEX_KEY, *expired)
+
+        for source_id, config in configs.items():
+            if source_id not in self.sources:
+                self.sources[source_id] = {"connector": None, "config": config}
+        for source_id in [source_id for source_id in self.sources if source_id not in configs]:
+            await self._drop(source_id)
+
+        logger.info(f"Connector registry synced with {len(self.sources)} data sources")
+
+    async def _handle_event(self, event: Dict[str, Any]):
+        if event.get("origin") == self.instance_id:
+            return
+        source_id = event["source_id"]
+        if event["event"] == "created" and source_id not in self.sources:
+            config = self._load_configs([source_id]).get(source_id)
+            if config:
+                self.sources[source_id] = {"connector": None, "config": config}
+        elif event["event"] == "deleted":
+            await self._drop(source_id)
+
+    async def listen(self):
+        """Apply other workers' changes, resyncing after every resubscribe."""
+        resubscribing = False
+        while True:
+            client = redis.asyncio.Redis(host=REDIS_HOST, port=6379)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(DATASOURCE_EVENTS_CHANNEL)
+                if resubscribing:
+                    # Events may have been missed while unsubscribed
+                    await self.sync()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self._handle_event(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Connector registry subscription failed: {str(e)}")
+                await asyncio.sleep(REGISTRY_RESUBSCRIBE_DELAY)
+            finally:
+                resubscribing = True
+                await pubsub.aclose()
+                await client.aclose()
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        for source_id in self.connected_ids():
+            connector = self.sources[source_id]["connector"]
+            await run_connector_call(connector, connector.disconnect)
+
 # Store active connectors
-active_connectors = {}
+active_connectors = ConnectorRegistry()
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        # In a real implementation, validate JWT token
-        return "user"  # Simplified for demo
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
+# Health monitor configuration
+HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "60"))
+HEALTH_CHECK_TIMEOUT = int(os.getenv("HEALTH_CHECK_TIMEOUT", "10"))
+HEALTH_MONITOR_TICK = 1
+
+async def run_connector_call(connector: DataSourceConnector, method, *args):
+    """Await a connector method, on a worker thread if its client blocks.
+
+    Blocking clients are not safe to share between threads, so the worker holds
+    the connector's client lock for as long as it uses the client. A probe or
+    query that times out stops waiting but keeps the lock until its thread is done.
+    """
+    if getattr(connector, "blocking_io", False):
+        def call():
+            with connector.client_lock:
+                return asyncio.run(method(*args))
+        return await asyncio.to_thread(call)
+    return await method(*args)
+
+class HealthMonitor:
+    """Probes active connectors on their own interval and caches the results."""
+
+    def __init__(self, interval: int = HEALTH_CHECK_INTERVAL, timeout: int = HEALTH_CHECK_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.cache: Dict[str, Dict[str, Any]] = {}
+        self.next_due: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def interval_for(self, source_id: str) -> int:
+        source_data = active_connectors.get(source_id)
+        if source_data and source_data["config"].get("health_check_interval"):
+            return source_data["config"]["health_check_interval"]
+        return self.interval
+
+    def record(self, source_id: str, connected: bool, metrics: Optional[Dict[str, Any]], error: Optional[str]) -> Dict[str, Any]:
+        """Store a probe outcome. Metrics of a failed probe keep the last known values."""
+        now = datetime.now().isoformat()
+        previous = self.cache.get(source_id, {})
+        entry = {
+            "status": "connected" if connected else "error",
+            "error": error,
+            "metrics": metrics if metrics is not None else previous.get("metrics", {}),
+            "metrics_updated": now if metrics is not None else previous.get("metrics_updated"),
+            "last_checked": now
+        }
+        self.cache[source_id] = entry
+        self.next_due[source_id] = time.monotonic() + self.interval_for(source_id)
+        return entry
+
+    def forget(self, source_id: str):
+        self.cache.pop(source_id, None)
+        self.next_due.pop(source_id, None)
+
+    def _schedule(self, source_id: str) -> asyncio.Task:
+        task = self._inflight.get(source_id)
+        if task is None:
+            task = asyncio.create_task(self._probe(source_id))
+            self._inflight[source_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(source_id, None))
+        return task
+
+    async def probe(self, source_id: str) -> Dict[str, Any]:
+        """Probe a source now. Concurrent probes of the same source share one check."""
+        return await self._schedule(source_id)
+
+    async def _probe(self, source_id: str) -> Dict[str, Any]:
+        connector = active_connectors[source_id]["connector"]
+        try:
+            connected, metrics = await asyncio.wait_for(self._check(connector), timeout=self.timeout)
+            error = None if connected else connector.error
+        except asyncio.TimeoutError:
+            connected, metrics = False, None
+            error = f"Health check timed out after {self.timeout}s"
+        except Exception as e:
+            connected, metrics, error = False, None, str(e)
+            logger.error(f"Health check failed for data source {source_id}: {error}")
+
+        if source_id not in active_connectors:
+            # Deleted while the probe was running
+            return {}
+        return self.record(source_id, connected, metrics, error)
+
+    async def _check(self, connector: DataSourceConnector):
+        connected = await run_connector_call(connector, connector.test_connection)
+        if not connected:
+            return False, None
+        return True, await run_connector_call(connector, connector.get_metrics)
+
+    async def refresh(self, source_ids: List[str]):
+        """Probe the given sources concurrently."""
+        await asyncio.gather(*(self.probe(source_id) for source_id in source_ids), return_exceptions=True)
+
+    async def run(self):
+        while True:
+            now = time.monotonic()
+            for source_id in active_connectors.connected_ids():
+                if self.next_due.get(source_id, 0) <= now:
+                    # Reschedule up front so a slow probe is not started twice
+                    self.next_due[source_id] = now + self.interval_for(source_id)
+                    self._schedule(source_id)
+            await asyncio.sleep(HEALTH_MONITOR_TICK)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+health_monitor = HealthMonitor()
+
+# Query metrics; result is hit, miss, bypass or error
+CONNECTOR_QUERY_LATENCY = Histogram("connector_query_duration_seconds", "Data source query latency",
+                                    ["source_type", "query_type", "result"], buckets=LATENCY_BUCKETS)
+
+# Query result cache configuration
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+QUERY_CACHE_EVICT_BATCH = 16
+
+class QueryCache:
+    """Caches encoded query results in Redis under a global byte cap with LRU eviction.
+
+    Entries live under querycache:{source_id}:{hash}. A sorted set of last access
+    times drives eviction and a hash of entry sizes keeps the byte total current.
+    """
+
+    LRU_KEY = "querycache:lru"
+    SIZES_KEY = "querycache:sizes"
+    BYTES_KEY = "querycache:bytes"
+
+    def __init__(self, max_bytes: int = QUERY_CACHE_MAX_BYTES, default_ttl: int = QUERY_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def make_key(source_id: str, query_type: str, parameters: Dict[str, Any], limit: int) -> str:
+        """Hash a canonical encoding so equivalent queries share a key regardless of dict order."""
+        canonical = json.dumps(
+            [source_id, query_type, parameters, limit],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str
         )
+        return f"querycache:{source_id}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+    def ttl_for(self, source_id: str) -> int:
+        source_data = active_connectors.get(source_id)
+        if source_data and source_data["config"].get("cache_ttl") is not None:
+            return source_data["config"]["cache_ttl"]
+        return self.default_ttl
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            payload = redis_binary_client.get(key)
+            if payload is None:
+                return None
+            redis_binary_client.zadd(self.LRU_KEY, {key: time.time()})
+            return result_codec.decode(payload)
+        except Exception as e:
+            logger.warning(f"Query cache read failed for {key}: {str(e)}")
+            return None
+
+    def set(self, key: str, results: List[Dict[str, Any]], ttl: int):
+        try:
+            payload = result_codec.encode({"results": results, "cached_at": time.time()})
+            if len(payload) > self.max_bytes:
+                return
+            previous_size = int(redis_binary_client.hget(self.SIZES_KEY, key) or 0)
+
+            pipe = redis_binary_client.pipeline(transaction=False)
+            pipe.set(key, payload, ex=ttl)
+            pipe.zadd(self.LRU_KEY, {key: time.time()})
+            pipe.hset(self.SIZES_KEY, key, len(payload))
+            pipe.incrby(self.BYTES_KEY, len(payload) - previous_size)
+            total = pipe.execute()[-1]
+
+            if total > self.max_bytes:
+                self._evict(total)
+        except Exception as e:
+            logger.warning(f"Query cache write failed for {key}: {str(e)}")
+
+    def _evict(self, total: int):
+        """Drop least recently used entries until the byte total fits under the cap."""
+        while total > self.max_bytes:
+            popped = redis_binary_client.zpopmin(self.LRU_KEY, QUERY_CACHE_EVICT_BATCH)
+            if not popped:
+                redis_binary_client.set(self.BYTES_KEY, 0)
+                return
+            keys = [key for key, _ in popped]
+            freed = sum(int(size or 0) for size in redis_binary_client.hmget(self.SIZES_KEY, keys))
+
+            pipe = redis_binary_client.pipeline(transaction=False)
+            pipe.delete(*keys)
+            pipe.hdel(self.SIZES_KEY, *keys)
+            pipe.decrby(self.BYTES_KEY, freed)
+            total = pipe.execute()[-1]
+
+    async def fetch(self, source_id: str, query: DataQuery, execute):
+        """Return (results, cache metadata), running execute() only on a miss.
+
+        Identical queries arriving while one is executing wait for its result
+        instead of hitting the backend again. Empty result sets are not cached
+        because connectors report failures as empty results.
+        """
+        ttl = self.ttl_for(source_id)
+        if not query.use_cache or ttl <= 0:
+            return await execute(), {"hit": False, "age": 0.0, "bypassed": True}
+
+        key = self.make_key(source_id, query.query_type, query.parameters, query.limit)
+        cached = self.get(key)
+        if cached is not None:
+            return cached["results"], {"hit": True, "age": round(time.time() - cached["cached_at"], 3)}
+
+        task = self._inflight.get(key)
+        if task is not None:
+            return await asyncio.shield(task), {"hit": False, "age": 0.0, "coalesced": True}
+
+        task = asyncio.create_task(execute())
+        self._inflight[key] = task
+        try:
+            results = await asyncio.shield(task)
+        finally:
+            self._inflight.pop(key, None)
+
+        if results:
+            self.set(key, results, ttl)
+        return results, {"hit": False, "age": 0.0}
+
+query_cache = QueryCache()
+
+def build_source_status(source_id: str) -> DataSourceStatus:
+    """Build a source's status from the health cache."""
+    source_data = active_connectors[source_id]
+    connector = source_data["connector"]
+    config = source_data["config"]
+    health = health_monitor.cache.get(source_id, {})
+
+    return DataSourceStatus(
+        source_id=source_id,
+        name=config["name"],
+        type=config["type"],
+        # Sources rehydrated from Redis stay idle until first used
+        status=health.get("status", "unknown" if connector else "idle"),
+        last_sync=connector.last_sync if connector else None,
+        last_checked=health.get("last_checked"),
+        metrics_updated=health.get("metrics_updated"),
+        error=health.get("error"),
+        metrics=health.get("metrics", {})
+    )
 
 @app.post("/sources", response_model=DataSourceStatus)
 async def create_data_source(
@@ -671,40 +1273,24 @@ async def create_data_source(
     """
     try:
         # Generate a unique source ID
-        import uuid
         source_id = str(uuid.uuid4())
         
         # Create the connector
         connector = get_connector(source.type, source.config)
         
         # Test the connection
-        connected = await connector.connect()
+        connected = await run_connector_call(connector, connector.connect)
         
-        # Store the connector
-        active_connectors[source_id] = {
-            "connector": connector,
-            "config": source.dict()
-        }
+        # Register the connector and persist its configuration
+        active_connectors.add(source_id, source.dict(), connector)
         
-        # Store the configuration in Redis
-        redis_client.set(
-            f"datasource:{source_id}",
-            json.dumps(source.dict()),
-            ex=86400 * 30  # Expire after 30 days
-        )
-        
-        # Get metrics
-        metrics = await connector.get_metrics()
+        # Get metrics and seed the health cache
+        metrics = await run_connector_call(connector, connector.get_metrics)
+        health_monitor.record(source_id, connected, metrics, connector.error)
         
-        return DataSourceStatus(
-            source_id=source_id,
-            name=source.name,
-            type=source.type,
-            status="connected" if connected else "error",
-            last_sync=datetime.now().isoformat(),
-            error=connector.error,
-            metrics=metrics
-        )
+        status_data = build_source_status(source_id)
+        status_data.last_sync = datetime.now().isoformat()
+        return status_data
         
     except Exception as e:
         logger.error(f"Error creating data source: {str(e)}")
@@ -714,34 +1300,19 @@ async def create_data_source(
         )
 
 @app.get("/sources", response_model=List[DataSourceStatus])
-async def list_data_sources(current_user: str = Depends(get_current_user)):
+async def list_data_sources(
+    refresh: bool = False,
+    current_user: str = Depends(get_current_user)
+):
     """
-    List all data source connectors.
+    List all data source connectors from the health cache.
     """
     try:
-        sources = []
-        
-        for source_id, source_data in active_connectors.items():
-            connector = source_data["connector"]
-            config = source_data["config"]
-            
-            # Test the connection
-            connected = await connector.test_connection()
-            
-            # Get metrics
-            metrics = await connector.get_metrics()
-            
-            sources.append(DataSourceStatus(
-                source_id=source_id,
-                name=config["name"],
-                type=config["type"],
-                status="connected" if connected else "error",
-                last_sync=connector.last_sync,
-                error=connector.error,
-                metrics=metrics
-            ))
+        if refresh:
+            # Only sources already in use; idle ones are not connected just to be listed
+            await health_monitor.refresh(active_connectors.connected_ids())
         
-        return sources
+        return [build_source_status(source_id) for source_id in list(active_connectors)]
         
     except Exception as e:
         logger.error(f"Error listing data sources: {str(e)}")
@@ -753,10 +1324,11 @@ async def list_data_sources(current_user: str = Depends(get_current_user)):
 @app.get("/sources/{source_id}", response_model=DataSourceStatus)
 async def get_data_source(
     source_id: str,
+    refresh: bool = False,
     current_user: str = Depends(get_current_user)
 ):
     """
-    Get a specific data source connector.
+    Get a specific data source connector from the health cache.
     """
     try:
         if source_id not in active_connectors:
@@ -765,25 +1337,12 @@ async def get_data_source(
                 detail="Data source not found"
             )
         
-        source_data = active_connectors[source_id]
-        connector = source_data["connector"]
-        config = source_data["config"]
-        
-        # Test the connection
-        connected = await connector.test_connection()
+        if refresh:
+            await active_connectors.connector(source_id)
+        if refresh or (active_connectors[source_id]["connector"] and source_id not in health_monitor.cache):
+            await health_monitor.probe(source_id)
         
-        # Get metrics
-        metrics = await connector.get_metrics()
-        
-        return DataSourceStatus(
-            source_id=source_id,
-            name=config["name"],
-            type=config["type"],
-            status="connected" if connected else "error",
-            last_sync=connector.last_sync,
-            error=connector.error,
-            metrics=metrics
-        )
+        return build_source_status(source_id)
         
     except HTTPException:
         raise
@@ -809,17 +1368,8 @@ async def delete_data_source(
                 detail="Data source not found"
             )
         
-        source_data = active_connectors[source_id]
-        connector = source_data["connector"]
-        
-        # Disconnect from the data source
-        await connector.disconnect()
-        
-        # Remove the connector
-        del active_connectors[source_id]
-        
-        # Remove the configuration from Redis
-        redis_client.delete(f"datasource:{source_id}")
+        # Disconnect and remove the data source from every worker
+        await active_connectors.remove(source_id)
         
         return {"message": "Data source deleted successfully"}
         
@@ -848,20 +1398,32 @@ async def query_data_source(
                 detail="Data source not found"
             )
         
-        source_data = active_connectors[source_id]
-        connector = source_data["connector"]
+        connector = await active_connectors.connector(source_id)
         
         # Generate a unique query ID
-        import uuid
         query_id = str(uuid.uuid4())
         
-        # Execute the query
-        results = await connector.query(
-            query.query_type,
-            query.parameters,
-            query.limit,
-            query.timeout
-        )
+        # Execute the query, or answer it from the result cache
+        source_type = active_connectors[source_id]["config"]["type"]
+        start = time.perf_counter()
+        result = "error"
+        try:
+            with span("data_source.query", source_id=source_id, query_type=query.query_type):
+                results, cache_info = await query_cache.fetch(
+                    source_id,
+                    query,
+                    lambda: run_connector_call(
+                        connector,
+                        connector.query,
+                        query.query_type,
+                        query.parameters,
+                        query.limit,
+                        query.timeout
+                    )
+                )
+            result = "bypass" if cache_info.get("bypassed") else "hit" if cache_info["hit"] else "miss"
+        finally:
+            CONNECTOR_QUERY_LATENCY.labels(source_type, query.query_type, result).observe(time.perf_counter() - start)
         
         # Store the query result in Redis
         query_result = {
@@ -873,14 +1435,15 @@ async def query_data_source(
                 "query_type": query.query_type,
                 "parameters": query.parameters,
                 "limit": query.limit,
-                "timeout": query.timeout
+                "timeout": query.timeout,
+                "cache": cache_info
             },
             "timestamp": datetime.now().isoformat()
         }
         
-        redis_client.set(
+        redis_binary_client.set(
             f"query:{query_id}",
-            json.dumps(query_result),
+            result_codec.encode(query_result),
             ex=3600  # Expire after 1 hour
         )
         
@@ -895,6 +1458,41 @@ async def query_data_source(
             detail=str(e)
         )
 
+@app.post("/sources/{source_id}/export")
+async def export_data_source(
+    source_id: str,
+    query: DataQuery,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Stream every result of a query as newline-delimited JSON.
+    """
+    if source_id not in active_connectors:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Data source not found"
+        )
+    
+    connector = await active_connectors.connector(source_id)
+    if not hasattr(connector, "export"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Data source does not support export"
+        )
+    
+    async def stream():
+        hits = connector.export(query.parameters, query.timeout)
+        try:
+            async for hit in hits:
+                yield json.dumps(hit, default=str) + "\n"
+        except Exception as e:
+            connector.error = str(e)
+            logger.error(f"Error exporting from data source {source_id}: {str(e)}")
+        finally:
+            await hits.aclose()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.get("/queries/{query_id}", response_model=DataQueryResult)
 async def get_query_result(
     query_id: str,
@@ -904,7 +1502,7 @@ async def get_query_result(
     Get the result of a query.
     """
     try:
-        query_data = redis_client.get(f"query:{query_id}")
+        query_data = redis_binary_client.get(f"query:{query_id}")
         
         if not query_data:
             raise HTTPException(
@@ -912,7 +1510,7 @@ async def get_query_result(
                 detail="Query result not found"
             )
         
-        return DataQueryResult(**json.loads(query_data))
+        return DataQueryResult(**result_codec.decode(query_data))
         
     except HTTPException:
         raise
@@ -923,6 +1521,21 @@ async def get_query_result(
             detail=str(e)
         )
 
+@app.on_event("startup")
+async def start_background_tasks():
+    # Rehydrate configurations only; connections open on first use
+    try:
+        await active_connectors.sync()
+    except Exception as e:
+        logger.error(f"Failed to rehydrate connector registry: {str(e)}")
+    active_connectors.start()
+    health_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await health_monitor.stop()
+    await active_connectors.stop()
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
@@ -0,0 +1,144 @@
+"""
+Compare result codecs on representative Elasticsearch and MongoDB result sets.
+
+Reports encode time, decode time and stored size for every codec available in
+this environment, against the json.dumps baseline the service used before.
+
+Usage:
+    python benchmarks/bench_codec.py [--docs 5000] [--repeat 5] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from codec import COMPRESSORS, SERIALIZERS, ResultCodec
+
+EVENT_TYPES = ["authentication_failure", "malware_detected", "network_connection", "file_modified", "process_created"]
+HOSTS = [f"host-{i:03d}" for i in range(50)]
+USERS = ["admin", "analyst", "svc-backup", "jdoe", "asmith", "root"]
+
+def generate_es_hits(count: int, rng: random.Random) -> list:
+    """Security events shaped like the _source of an ECS-style index."""
+    base = datetime(2024, 1, 1)
+    hits = []
+    for i in range(count):
+        hits.append({
+            "@timestamp": (base + timedelta(seconds=i * 7)).isoformat() + "Z",
+            "event": {
+                "kind": "alert",
+                "category": rng.choice(EVENT_TYPES),
+                "severity": rng.randint(1, 15),
+                "outcome": rng.choice(["success", "failure"])
+            },
+            "host": {"name": rng.choice(HOSTS), "ip": f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}"},
+            "source": {"ip": f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                       "port": rng.randint(1024, 65535)},
+            "user": {"name": rng.choice(USERS)},
+            "rule": {"id": str(rng.randint(100000, 100999)), "description": "Multiple authentication failures followed by success",
+                     "level": rng.randint(3, 12)},
+            "message": f"sshd[{rng.randint(1000, 9999)}]: Failed password for {rng.choice(USERS)} from port {rng.randint(1024, 65535)} ssh2",
+            "tags": rng.sample(["wazuh", "sshd", "pam", "syslog", "linux", "brute_force"], 3)
+        })
+    return hits
+
+def generate_mongo_docs(count: int, rng: random.Random) -> list:
+    """Case documents as returned by pymongo: ObjectId-like ids and native datetimes."""
+    base = datetime(2024, 1, 1)
+    docs = []
+    for i in range(count):
+        docs.append({
+            "_id": f"{rng.getrandbits(96):024x}",
+            "case_id": f"CASE-{i:06d}",
+            "created_at": base + timedelta(minutes=i),
+            "status": rng.choice(["open", "in_progress", "closed"]),
+            "assignee": rng.choice(USERS),
+            "indicators": [
+                {"type": "ip", "value": f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"},
+                {"type": "hash", "value": f"{rng.getrandbits(256):064x}"}
+            ],
+            "score": round(rng.random() * 100, 2),
+            "notes": "Escalated after correlation with threat intel feed"
+        })
+    return docs
+
+def query_result(results: list) -> dict:
+    """Wrap results the way query_data_source stores them."""
+    return {
+        "query_id": "00000000-0000-0000-0000-000000000000",
+        "source_id": "11111111-1111-1111-1111-111111111111",
+        "status": "completed",
+        "results": results,
+        "metadata": {"query_type": "search", "parameters": {"index": "security-events"}, "limit": len(results)},
+        "timestamp": datetime(2024, 1, 1).isoformat()
+    }
+
+def time_call(func, repeat: int) -> float:
+    """Best wall time of repeat calls, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def bench_baseline(payload: dict, repeat: int) -> dict:
+    encoded = json.dumps(payload, default=str)
+    return {
+        "codec": "json.dumps (legacy)",
+        "encode_ms": time_call(lambda: json.dumps(payload, default=str), repeat),
+        "decode_ms": time_call(lambda: json.loads(encoded), repeat),
+        "size_bytes": len(encoded.encode())
+    }
+
+def bench_codec(codec: ResultCodec, payload: dict, repeat: int) -> dict:
+    encoded = codec.encode(payload)
+    return {
+        "codec": codec.name,
+        "encode_ms": time_call(lambda: codec.encode(payload), repeat),
+        "decode_ms": time_call(lambda: codec.decode(encoded), repeat),
+        "size_bytes": len(encoded)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000, help="documents per result set")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repetitions per measurement")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    datasets = {
+        "elasticsearch": query_result(generate_es_hits(args.docs, rng)),
+        "mongodb": query_result(generate_mongo_docs(args.docs, rng))
+    }
+    codecs = [
+        ResultCodec(serializer, compressor)
+        for _, (serializer, _, _) in sorted(SERIALIZERS.items())
+        for _, (compressor, _, _) in sorted(COMPRESSORS.items())
+    ]
+
+    report = {}
+    for name, payload in datasets.items():
+        rows = [bench_baseline(payload, args.repeat)]
+        rows.extend(bench_codec(codec, payload, args.repeat) for codec in codecs)
+        report[name] = rows
+
+    if args.json:
+        print(json.dumps({"docs": args.docs, "repeat": args.repeat, "results": report}, indent=2))
+        return
+
+    for name, rows in report.items():
+        baseline = rows[0]["size_bytes"]
+        print(f"\n{name} ({args.docs} documents)")
+        print(f"{'codec':<22}{'encode ms':>12}{'decode ms':>12}{'size KiB':>12}{'ratio':>8}")
+        for row in rows:
+            print(f"{row['codec']:<22}{row['encode_ms']:>12.2f}{row['decode_ms']:>12.2f}"
+                  f"{row['size_bytes'] / 1024:>12.1f}{row['size_bytes'] / baseline:>8.2f}")
+
+if __name__ == "__main__":
+    main()
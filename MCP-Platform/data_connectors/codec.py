@@ -0,0 +1,156 @@
+"""
+Result codecs for payloads the connectors service stores in Redis.
+
+Every encoded value starts with a small envelope so the format can change
+without breaking entries that are already stored:
+
+    b"MCP" | version (1 byte) | serializer id (1 byte) | compressor id (1 byte) | body
+
+Values written before the envelope existed (plain JSON strings and the
+zlib-compressed JSON of the first query cache) are still decoded.
+"""
+import json
+import logging
+import os
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+MAGIC = b"MCP"
+ENVELOPE_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+# Payloads smaller than this are stored uncompressed
+MIN_COMPRESS_SIZE = int(os.getenv("RESULT_CODEC_MIN_COMPRESS_SIZE", "1024"))
+
+class CodecError(ValueError):
+    """Raised when a stored payload cannot be decoded."""
+
+# Serializers: id -> (name, dumps, loads). Ids are part of the stored format, never reuse them.
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, default=str, separators=(",", ":")).encode()
+
+def _orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+def _msgpack_dumps(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=str, use_bin_type=True)
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+SERIALIZERS: Dict[int, Tuple[str, Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    1: ("json", _json_dumps, json.loads),
+}
+if orjson is not None:
+    SERIALIZERS[2] = ("orjson", _orjson_dumps, orjson.loads)
+if msgpack is not None:
+    SERIALIZERS[3] = ("msgpack", _msgpack_dumps, _msgpack_loads)
+
+# Compressors: id -> (name, compress(data, level), decompress(data))
+def _zstd_compress(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+COMPRESSORS: Dict[int, Tuple[str, Callable[[bytes, int], bytes], Callable[[bytes], bytes]]] = {
+    0: ("none", lambda data, level: data, lambda data: data),
+    1: ("zlib", lambda data, level: zlib.compress(data, level), zlib.decompress),
+}
+if zstandard is not None:
+    COMPRESSORS[2] = ("zstd", _zstd_compress, _zstd_decompress)
+
+DEFAULT_LEVELS = {"zlib": 6, "zstd": 3}
+
+def _lookup(table: Dict[int, tuple], name: str) -> int:
+    for ident, entry in table.items():
+        if entry[0] == name:
+            return ident
+    raise ValueError(f"Codec component not available: {name}")
+
+class ResultCodec:
+    """Encodes values with one serializer and compressor, decodes any known envelope."""
+
+    def __init__(self, serializer: str = "json", compressor: str = "zlib", level: Optional[int] = None,
+                 min_compress_size: int = MIN_COMPRESS_SIZE):
+        self.serializer_id = _lookup(SERIALIZERS, serializer)
+        self.compressor_id = _lookup(COMPRESSORS, compressor)
+        self.level = level if level is not None else DEFAULT_LEVELS.get(compressor, 0)
+        self.min_compress_size = min_compress_size
+
+    @property
+    def name(self) -> str:
+        return f"{SERIALIZERS[self.serializer_id][0]}+{COMPRESSORS[self.compressor_id][0]}"
+
+    def encode(self, obj: Any) -> bytes:
+        body = SERIALIZERS[self.serializer_id][1](obj)
+        compressor_id = self.compressor_id
+        if len(body) < self.min_compress_size:
+            compressor_id = 0
+        else:
+            body = COMPRESSORS[compressor_id][1](body, self.level)
+        return MAGIC + bytes((ENVELOPE_VERSION, self.serializer_id, compressor_id)) + body
+
+    def decode(self, data: Any) -> Any:
+        return decode(data)
+
+def decode(data: Any) -> Any:
+    """Decode a stored value written by any codec version, or by the pre-codec service."""
+    if isinstance(data, str):
+        data = data.encode()
+    if not data:
+        raise CodecError("Empty payload")
+
+    if data[:len(MAGIC)] == MAGIC:
+        version, serializer_id, compressor_id = data[len(MAGIC):HEADER_SIZE]
+        if version != ENVELOPE_VERSION:
+            raise CodecError(f"Unsupported envelope version: {version}")
+        if serializer_id not in SERIALIZERS or compressor_id not in COMPRESSORS:
+            raise CodecError(f"Codec not available: serializer={serializer_id} compressor={compressor_id}")
+        body = COMPRESSORS[compressor_id][2](data[HEADER_SIZE:])
+        return SERIALIZERS[serializer_id][2](body)
+
+    # Legacy values: plain JSON, or zlib-compressed JSON
+    if data[:1] in (b"{", b"["):
+        return json.loads(data)
+    try:
+        return json.loads(zlib.decompress(data))
+    except zlib.error:
+        raise CodecError("Unrecognized payload format")
+
+def get_codec(spec: Optional[str] = None) -> ResultCodec:
+    """Build a codec from a "serializer+compressor" spec, e.g. "msgpack+zstd".
+
+    Components that are not installed fall back to json and zlib.
+    """
+    spec = spec or os.getenv("RESULT_CODEC", "orjson+zstd")
+    serializer, _, compressor = spec.partition("+")
+    compressor = compressor or "none"
+
+    available_serializers = {entry[0] for entry in SERIALIZERS.values()}
+    available_compressors = {entry[0] for entry in COMPRESSORS.values()}
+    if serializer not in available_serializers:
+        logger.warning(f"Serializer {serializer} not available, falling back to json")
+        serializer = "json"
+    if compressor not in available_compressors:
+        logger.warning(f"Compressor {compressor} not available, falling back to zlib")
+        compressor = "zlib"
+
+    return ResultCodec(serializer, compressor)
@@ -3,23 +3,25 @@ import os
 import sys
 from unittest.mock import patch
 
-# Add the parent directory to the path so we can import the app
+# Add the parent directory to the path so we can import the app, and the
+# repository root for the shared mcp_common package
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
 # Set environment variables for testing
 os.environ["REDIS_HOST"] = "localhost"
 os.environ["REDIS_PORT"] = "6379"
-os.environ["JWT_SECRET"] = "test_secret_key"
-os.environ["JWT_ALGORITHM"] = "HS256"
 
-# Mock Redis client for all tests
+# Mock Redis clients for all tests
 @pytest.fixture(autouse=True)
 def mock_redis():
-    with patch("app.redis_client") as mock:
+    with patch("app.redis_client") as mock, patch("app.redis_binary_client"):
         yield mock
 
-# Mock authentication for all tests
-@pytest.fixture(autouse=True)
+# Mock authentication for the tests that ask for it
+@pytest.fixture
 def mock_auth():
-    with patch("app.get_current_user", return_value="test-user"):
-        yield 
\ No newline at end of file
+    import app
+    app.app.dependency_overrides[app.get_current_user] = lambda: "test-user"
+    yield
+    app.app.dependency_overrides.pop(app.get_current_user, None) 
\ No newline at end of file
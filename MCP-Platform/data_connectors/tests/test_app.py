@@ -1,14 +1,18 @@
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
 import json
 import os
 import sys
+import threading
+import time
 from datetime import datetime
 
 # Add the parent directory to the path so we can import the app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from app import app, get_connector, DataSourceConfig, DataQuery
+import app as app_module
+from app import app, get_connector, DataSourceConfig, DataQuery, ElasticsearchConnector, MongoDBConnector, ConnectorRegistry, active_connectors, health_monitor, query_cache, QueryCache, run_connector_call
 
 client = TestClient(app)
 
@@ -81,6 +85,84 @@ class MockRedis:
             return 1
         return 0
 
+# Mock binary Redis client backing the query result cache and connector registry
+class MockBinaryRedis(MockRedis):
+    def __init__(self):
+        super().__init__()
+        self.zsets = {}
+        self.hashes = {}
+        self.sets = {}
+        self.published = []
+    
+    def delete(self, *keys):
+        return sum(super(MockBinaryRedis, self).delete(key) for key in keys)
+    
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+    
+    def scan_iter(self, match="*"):
+        prefix = match.rstrip("*")
+        return [key.encode() for key in self.data if key.startswith(prefix)]
+    
+    def sadd(self, name, *members):
+        self.sets.setdefault(name, set()).update(members)
+    
+    def srem(self, name, *members):
+        self.sets.get(name, set()).difference_update(members)
+    
+    def smembers(self, name):
+        return {member.encode() for member in self.sets.get(name, set())}
+    
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+    
+    def zadd(self, name, mapping):
+        self.zsets.setdefault(name, {}).update(mapping)
+    
+    def zpopmin(self, name, count=1):
+        zset = self.zsets.get(name, {})
+        popped = sorted(zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del zset[member]
+        return popped
+    
+    def hset(self, name, key, value):
+        self.hashes.setdefault(name, {})[key] = value
+    
+    def hget(self, name, key):
+        return self.hashes.get(name, {}).get(key)
+    
+    def hmget(self, name, keys):
+        return [self.hget(name, key) for key in keys]
+    
+    def hdel(self, name, *keys):
+        for key in keys:
+            self.hashes.get(name, {}).pop(key, None)
+    
+    def incrby(self, key, amount):
+        self.data[key] = int(self.data.get(key, 0)) + amount
+        return self.data[key]
+    
+    def decrby(self, key, amount):
+        return self.incrby(key, -amount)
+    
+    def pipeline(self, transaction=True):
+        return MockPipeline(self)
+
+class MockPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+    
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.client, name), args, kwargs))
+            return self
+        return queue
+    
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.calls]
+
 # Mock connector classes
 class MockElasticsearchConnector:
     def __init__(self, config):
@@ -151,10 +233,60 @@ class MockMongoDBConnector:
             "mem": {"resident": 1024}
         }
 
+# Fake AsyncElasticsearch client serving a fixed index through point in time paging
+class FakeElasticsearch:
+    def __init__(self, docs, rotate_pit=False):
+        self.docs = docs
+        self.rotate_pit = rotate_pit
+        self.searches = []
+        self.closed_pits = []
+        self.pit_id = None
+    
+    async def open_point_in_time(self, index, keep_alive):
+        self.pit_id = f"pit-{index}"
+        return {"id": self.pit_id}
+    
+    async def close_point_in_time(self, id):
+        self.closed_pits.append(id)
+    
+    async def search(self, **body):
+        self.searches.append(body)
+        if "aggs" in body:
+            return {
+                "hits": {"total": {"value": len(self.docs)}, "hits": []},
+                "aggregations": {"by_severity": {"buckets": [{"key": "high", "doc_count": len(self.docs)}]}}
+            }
+        docs = self.docs
+        if "slice" in body:
+            docs = [d for d in docs if d["id"] % body["slice"]["max"] == body["slice"]["id"]]
+        start = body.get("search_after", [-1])[0] + 1
+        page = [d for d in docs if d["id"] >= start][:body["size"]]
+        response = {"hits": {"hits": [{"_source": d, "sort": [d["id"]]} for d in page]}}
+        if "pit" in body:
+            if self.rotate_pit:
+                self.pit_id = f"{self.pit_id}+"
+            response["pit_id"] = self.pit_id
+        return response
+    
+    async def msearch(self, searches):
+        responses = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            if header["index"] == "missing":
+                responses.append({"error": {"type": "index_not_found_exception"}})
+            else:
+                hits = self.docs[:body["size"]]
+                responses.append({"hits": {"total": {"value": len(self.docs)}, "hits": [{"_source": d} for d in hits]}})
+        return {"responses": responses}
+
+def make_es_connector(doc_count, rotate_pit=False):
+    connector = ElasticsearchConnector({})
+    connector.client = FakeElasticsearch([{"id": i, "severity": "high"} for i in range(doc_count)], rotate_pit)
+    return connector
+
 # Tests
 @pytest.fixture
 def mock_redis():
-    with patch("app.redis_client", MockRedis()):
+    with patch("app.redis_client", MockRedis()), patch("app.redis_binary_client", MockBinaryRedis()):
         yield
 
 @pytest.fixture
@@ -168,8 +300,9 @@ def mock_connectors():
 
 @pytest.fixture
 def mock_auth():
-    with patch("app.get_current_user", return_value="test-user"):
-        yield
+    app.dependency_overrides[app_module.get_current_user] = lambda: "test-user"
+    yield
+    app.dependency_overrides.pop(app_module.get_current_user, None)
 
 def test_health_check():
     response = client.get("/health")
@@ -221,6 +354,96 @@ def test_list_data_sources(mock_redis, mock_connectors, mock_auth):
     assert data[0]["name"] == MOCK_ELASTICSEARCH_CONFIG["name"]
     assert data[0]["type"] == MOCK_ELASTICSEARCH_CONFIG["type"]
 
+def test_list_data_sources_served_from_cache(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post(
+        "/sources",
+        json=MOCK_ELASTICSEARCH_CONFIG,
+        headers=MOCK_HEADERS
+    )
+    source_id = create_response.json()["source_id"]
+    connector = active_connectors[source_id]["connector"]
+    connector.test_connection = AsyncMock(return_value=True)
+    connector.get_metrics = AsyncMock(return_value={})
+    
+    response = client.get("/sources", headers=MOCK_HEADERS)
+    assert response.status_code == 200
+    source = next(s for s in response.json() if s["source_id"] == source_id)
+    assert source["status"] == "connected"
+    assert source["last_checked"] is not None
+    assert source["metrics"]["cluster_name"] == "test-cluster"
+    connector.test_connection.assert_not_called()
+    connector.get_metrics.assert_not_called()
+
+def test_list_data_sources_refresh(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post(
+        "/sources",
+        json=MOCK_ELASTICSEARCH_CONFIG,
+        headers=MOCK_HEADERS
+    )
+    source_id = create_response.json()["source_id"]
+    connector = active_connectors[source_id]["connector"]
+    connector.test_connection = AsyncMock(return_value=False)
+    
+    response = client.get("/sources?refresh=true", headers=MOCK_HEADERS)
+    assert response.status_code == 200
+    source = next(s for s in response.json() if s["source_id"] == source_id)
+    assert source["status"] == "error"
+    # Metrics from the last successful probe are kept
+    assert source["metrics"]["cluster_name"] == "test-cluster"
+    connector.test_connection.assert_awaited()
+
+def test_delete_data_source_clears_health_cache(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post(
+        "/sources",
+        json=MOCK_ELASTICSEARCH_CONFIG,
+        headers=MOCK_HEADERS
+    )
+    source_id = create_response.json()["source_id"]
+    assert source_id in health_monitor.cache
+    
+    client.delete(f"/sources/{source_id}", headers=MOCK_HEADERS)
+    assert source_id not in health_monitor.cache
+
+# Blocking connector that records how many threads use its client at once
+class SlowBlockingConnector(MongoDBConnector):
+    def __init__(self):
+        super().__init__({})
+        self.active = 0
+        self.max_active = 0
+    
+    def use_client(self):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.1)
+        self.active -= 1
+    
+    async def connect(self):
+        self.connect_thread = threading.get_ident()
+        self.connected = True
+        return True
+    
+    async def test_connection(self):
+        self.use_client()
+        return True
+    
+    async def query(self, query_type, parameters, limit=100, timeout=30):
+        self.use_client()
+        return [{"_id": "1"}]
+
+def test_blocking_client_is_not_shared_between_probe_and_query():
+    connector = SlowBlockingConnector()
+    
+    async def run():
+        # The probe times out while its thread still holds the client
+        probe = asyncio.wait_for(run_connector_call(connector, connector.test_connection), timeout=0.01)
+        query = run_connector_call(connector, connector.query, "find", {})
+        return await asyncio.gather(probe, query, return_exceptions=True)
+    
+    probe_result, query_result = asyncio.run(run())
+    assert isinstance(probe_result, asyncio.TimeoutError)
+    assert query_result == [{"_id": "1"}]
+    assert connector.max_active == 1
+
 def test_get_data_source(mock_redis, mock_connectors, mock_auth):
     # First create a data source
     create_response = client.post(
@@ -311,6 +534,223 @@ def test_get_query_result(mock_redis, mock_connectors, mock_auth):
     assert "results" in data
     assert len(data["results"]) == 2
 
+def test_query_data_source_cached(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post(
+        "/sources",
+        json=MOCK_ELASTICSEARCH_CONFIG,
+        headers=MOCK_HEADERS
+    )
+    source_id = create_response.json()["source_id"]
+    connector = active_connectors[source_id]["connector"]
+    connector.query = AsyncMock(return_value=[{"id": "1", "severity": "high"}])
+    
+    query = MOCK_QUERY.copy()
+    query["source_id"] = source_id
+    
+    first = client.post(f"/sources/{source_id}/query", json=query, headers=MOCK_HEADERS)
+    assert first.json()["metadata"]["cache"]["hit"] is False
+    
+    second = client.post(f"/sources/{source_id}/query", json=query, headers=MOCK_HEADERS)
+    assert second.status_code == 200
+    assert second.json()["metadata"]["cache"]["hit"] is True
+    assert second.json()["metadata"]["cache"]["age"] >= 0
+    assert second.json()["results"] == [{"id": "1", "severity": "high"}]
+    assert connector.query.await_count == 1
+    
+    query["use_cache"] = False
+    client.post(f"/sources/{source_id}/query", json=query, headers=MOCK_HEADERS)
+    assert connector.query.await_count == 2
+
+def test_query_data_source_cache_disabled_per_source(mock_redis, mock_connectors, mock_auth):
+    config = {**MOCK_ELASTICSEARCH_CONFIG, "cache_ttl": 0}
+    create_response = client.post("/sources", json=config, headers=MOCK_HEADERS)
+    source_id = create_response.json()["source_id"]
+    connector = active_connectors[source_id]["connector"]
+    connector.query = AsyncMock(return_value=[{"id": "1"}])
+    
+    query = MOCK_QUERY.copy()
+    query["source_id"] = source_id
+    client.post(f"/sources/{source_id}/query", json=query, headers=MOCK_HEADERS)
+    client.post(f"/sources/{source_id}/query", json=query, headers=MOCK_HEADERS)
+    assert connector.query.await_count == 2
+
+def test_query_cache_key_is_canonical():
+    key = QueryCache.make_key("s1", "search", {"index": "a", "query": {"x": 1, "y": 2}}, 10)
+    assert key == QueryCache.make_key("s1", "search", {"query": {"y": 2, "x": 1}, "index": "a"}, 10)
+    assert key != QueryCache.make_key("s1", "search", {"index": "a", "query": {"x": 1, "y": 2}}, 20)
+    assert key != QueryCache.make_key("s2", "search", {"index": "a", "query": {"x": 1, "y": 2}}, 10)
+
+def test_query_cache_evicts_least_recently_used(mock_redis):
+    cache = QueryCache(max_bytes=200, default_ttl=60)
+    for i in range(10):
+        cache.set(f"querycache:s1:{i}", [{"id": i, "payload": "x" * 20}], 60)
+    
+    assert cache.get("querycache:s1:0") is None
+    assert cache.get("querycache:s1:9") is not None
+    assert int(app_module.redis_binary_client.get(QueryCache.BYTES_KEY)) <= 200
+
+def test_query_cache_coalesces_inflight_queries(mock_redis):
+    cache = QueryCache(max_bytes=1024 * 1024, default_ttl=60)
+    query = DataQuery(**MOCK_QUERY)
+    calls = []
+    
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [{"id": "1"}]
+    
+    async def run():
+        return await asyncio.gather(*(cache.fetch("unregistered-source", query, execute) for _ in range(5)))
+    
+    outcomes = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(results == [{"id": "1"}] for results, _ in outcomes)
+    assert sum(1 for _, info in outcomes if info.get("coalesced")) == 4
+
+@pytest.mark.parametrize("slices", [1, 3])
+def test_elasticsearch_export_streams_every_hit(slices):
+    connector = make_es_connector(2500)
+    
+    async def collect():
+        return [hit async for hit in connector.export({"index": "events", "batch_size": 1000, "slices": slices})]
+    
+    hits = asyncio.run(collect())
+    assert sorted(hit["id"] for hit in hits) == list(range(2500))
+    assert connector.client.closed_pits == ["pit-events"]
+    assert all("index" not in body for body in connector.client.searches)
+
+def test_elasticsearch_export_sends_the_latest_pit_id():
+    connector = make_es_connector(2500, rotate_pit=True)
+    
+    async def collect():
+        return [hit async for hit in connector.export({"index": "events", "batch_size": 1000})]
+    
+    hits = asyncio.run(collect())
+    assert len(hits) == 2500
+    sent = [body["pit"]["id"] for body in connector.client.searches]
+    assert sent == ["pit-events", "pit-events+", "pit-events++"]
+    assert connector.client.closed_pits == ["pit-events+++"]
+
+def test_elasticsearch_export_query_respects_limit():
+    connector = make_es_connector(2500)
+    results = asyncio.run(connector.query("export", {"index": "events", "batch_size": 100}, limit=150))
+    assert len(results) == 150
+    assert connector.client.closed_pits == ["pit-events"]
+
+def test_elasticsearch_aggregate_returns_only_buckets():
+    connector = make_es_connector(42)
+    results = asyncio.run(connector.query("aggregate", {
+        "index": "events",
+        "aggs": {"by_severity": {"terms": {"field": "severity"}}}
+    }))
+    assert results[0] == {"aggregation": "_count", "value": 42}
+    assert results[1]["aggregation"] == "by_severity"
+    assert results[1]["buckets"] == [{"key": "high", "doc_count": 42}]
+    assert connector.client.searches[0]["size"] == 0
+
+def test_elasticsearch_msearch():
+    connector = make_es_connector(10)
+    results = asyncio.run(connector.query("msearch", {
+        "index": "events",
+        "searches": [
+            {"query": {"term": {"source.ip": "1.2.3.4"}}, "size": 2},
+            {"index": "missing", "query": {"match_all": {}}}
+        ]
+    }, limit=5))
+    assert len(results) == 2
+    assert len(results[0]["hits"]) == 2
+    assert results[0]["total"] == 10
+    assert results[1]["error"]["type"] == "index_not_found_exception"
+
+def test_export_endpoint_streams_ndjson(mock_redis, mock_auth):
+    source_id = "export-source"
+    active_connectors[source_id] = {"connector": make_es_connector(1200), "config": MOCK_ELASTICSEARCH_CONFIG}
+    try:
+        query = {**MOCK_QUERY, "source_id": source_id, "query_type": "export", "parameters": {"index": "events", "slices": 2}}
+        response = client.post(f"/sources/{source_id}/export", json=query, headers=MOCK_HEADERS)
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 1200
+    finally:
+        del active_connectors[source_id]
+
+def test_export_endpoint_requires_export_support(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post("/sources", json=MOCK_MONGODB_CONFIG, headers=MOCK_HEADERS)
+    source_id = create_response.json()["source_id"]
+    query = {**MOCK_QUERY, "source_id": source_id, "query_type": "export"}
+    response = client.post(f"/sources/{source_id}/export", json=query, headers=MOCK_HEADERS)
+    assert response.status_code == 400
+
+def test_registry_rehydrates_without_connecting(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post("/sources", json=MOCK_ELASTICSEARCH_CONFIG, headers=MOCK_HEADERS)
+    source_id = create_response.json()["source_id"]
+    
+    # Simulate a restart: the worker only has what Redis remembers
+    active_connectors.sources.clear()
+    health_monitor.cache.clear()
+    mock_connectors.reset_mock()
+    asyncio.run(active_connectors.sync())
+    
+    assert source_id in active_connectors
+    assert active_connectors[source_id]["connector"] is None
+    mock_connectors.assert_not_called()
+    
+    response = client.get(f"/sources/{source_id}", headers=MOCK_HEADERS)
+    assert response.json()["status"] == "idle"
+    
+    # First query opens the connection
+    query = {**MOCK_QUERY, "source_id": source_id}
+    response = client.post(f"/sources/{source_id}/query", json=query, headers=MOCK_HEADERS)
+    assert response.status_code == 200
+    assert len(response.json()["results"]) == 2
+    assert mock_connectors.call_count == 1
+    assert active_connectors[source_id]["connector"].connected
+
+def test_registry_connects_blocking_connectors_off_the_event_loop(mock_redis):
+    registry = ConnectorRegistry()
+    registry["blocking-source"] = {"connector": None, "config": MOCK_MONGODB_CONFIG}
+    
+    async def connect():
+        return threading.get_ident(), await registry.connector("blocking-source")
+    
+    with patch("app.get_connector", lambda source_type, config: SlowBlockingConnector()):
+        loop_thread, connector = asyncio.run(connect())
+    assert connector.connected
+    assert connector.connect_thread != loop_thread
+
+def test_registry_sync_drops_sources_deleted_elsewhere(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post("/sources", json=MOCK_ELASTICSEARCH_CONFIG, headers=MOCK_HEADERS)
+    source_id = create_response.json()["source_id"]
+    
+    app_module.redis_binary_client.delete(f"datasource:{source_id}")
+    asyncio.run(active_connectors.sync())
+    assert source_id not in active_connectors
+    assert source_id not in app_module.redis_binary_client.sets["datasources"]
+
+def test_registry_publishes_changes(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post("/sources", json=MOCK_ELASTICSEARCH_CONFIG, headers=MOCK_HEADERS)
+    source_id = create_response.json()["source_id"]
+    client.delete(f"/sources/{source_id}", headers=MOCK_HEADERS)
+    
+    events = [(event["event"], event["source_id"]) for _, event in app_module.redis_binary_client.published]
+    assert events == [("created", source_id), ("deleted", source_id)]
+
+def test_registry_applies_events_from_other_workers(mock_redis, mock_connectors, mock_auth):
+    create_response = client.post("/sources", json=MOCK_ELASTICSEARCH_CONFIG, headers=MOCK_HEADERS)
+    source_id = create_response.json()["source_id"]
+    other_worker = ConnectorRegistry()
+    
+    asyncio.run(other_worker._handle_event({"event": "created", "source_id": source_id, "origin": "worker-a"}))
+    assert other_worker[source_id]["config"]["name"] == MOCK_ELASTICSEARCH_CONFIG["name"]
+    assert other_worker[source_id]["connector"] is None
+    
+    asyncio.run(other_worker._handle_event({"event": "deleted", "source_id": source_id, "origin": "worker-a"}))
+    assert source_id not in other_worker
+    
+    # Own events are ignored
+    asyncio.run(active_connectors._handle_event({"event": "deleted", "source_id": source_id, "origin": active_connectors.instance_id}))
+    assert source_id in active_connectors
+
 def test_unauthorized_access():
     # Try to access an endpoint without authentication
     response = client.get("/sources")
@@ -0,0 +1,67 @@
+import pytest
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+
+# Add the parent directory to the path so we can import the codec
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from codec import COMPRESSORS, SERIALIZERS, CodecError, ResultCodec, decode, get_codec
+
+MOCK_RESULT = {
+    "query_id": "test-query-id",
+    "source_id": "test-source-id",
+    "status": "completed",
+    "results": [{"id": str(i), "severity": "high", "message": "Failed password for root"} for i in range(100)],
+    "metadata": {"query_type": "search", "limit": 100},
+    "timestamp": "2024-01-01T00:00:00"
+}
+
+AVAILABLE_CODECS = [
+    (serializer, compressor)
+    for serializer, _, _ in SERIALIZERS.values()
+    for compressor, _, _ in COMPRESSORS.values()
+]
+
+@pytest.mark.parametrize("serializer,compressor", AVAILABLE_CODECS)
+def test_round_trip(serializer, compressor):
+    codec = ResultCodec(serializer, compressor, min_compress_size=0)
+    encoded = codec.encode(MOCK_RESULT)
+    assert encoded.startswith(b"MCP")
+    assert codec.decode(encoded) == MOCK_RESULT
+
+def test_small_payloads_are_not_compressed():
+    codec = ResultCodec("json", "zlib", min_compress_size=1024)
+    encoded = codec.encode({"status": "completed"})
+    assert encoded[5] == 0
+    assert decode(encoded) == {"status": "completed"}
+
+def test_non_json_values_are_stringified():
+    codec = ResultCodec("json", "none")
+    created_at = datetime(2024, 1, 1, 12, 30)
+    assert decode(codec.encode({"created_at": created_at})) == {"created_at": str(created_at)}
+
+def test_decode_legacy_json():
+    legacy = json.dumps(MOCK_RESULT)
+    assert decode(legacy) == MOCK_RESULT
+    assert decode(legacy.encode()) == MOCK_RESULT
+
+def test_decode_legacy_zlib_json():
+    legacy = zlib.compress(json.dumps({"results": [], "cached_at": 1.0}).encode())
+    assert decode(legacy) == {"results": [], "cached_at": 1.0}
+
+def test_decode_rejects_unknown_envelope_version():
+    encoded = bytearray(ResultCodec("json", "none").encode(MOCK_RESULT))
+    encoded[3] = 99
+    with pytest.raises(CodecError):
+        decode(bytes(encoded))
+
+def test_decode_rejects_garbage():
+    with pytest.raises(CodecError):
+        decode(b"not a payload")
+
+def test_get_codec_falls_back_when_unavailable():
+    codec = get_codec("doesnotexist+alsomissing")
+    assert codec.name == "json+zlib"
+    assert decode(codec.encode(MOCK_RESULT)) == MOCK_RESULT
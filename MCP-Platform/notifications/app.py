@@ -1,34 +1,57 @@
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import FastAPI, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
 import os
 import redis
+import redis.asyncio
 import httpx
 import json
-import smtplib
+import hashlib
+import aiosmtplib
+import random
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Tuple, Union
 import asyncio
 from datetime import datetime
 import logging
-from jinja2 import Environment, FileSystemLoader
+import socket
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+from prometheus_client import Counter
+from mcp_common.auth import get_current_user, install_auth
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import setup_tracing, span
 
 app = FastAPI(title="Notifications Service")
+install_auth(app)
+setup_tracing(app, "notifications-service")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Redis client
+# Initialize Redis clients
+REDIS_HOST = os.getenv("MEMORY_URL", "redis://memory:6379").split("://")[1].split(":")[0]
 redis_client = redis.Redis(
-    host=os.getenv("MEMORY_URL", "redis://memory:6379").split("://")[1].split(":")[0],
+    host=REDIS_HOST,
     port=6379,
     decode_responses=True
 )
 
-# OAuth2 scheme for JWT validation
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
+# Async client for the queue consumers, whose blocking reads must not stall the event loop
+stream_client = redis.asyncio.Redis(
+    host=REDIS_HOST,
+    port=6379,
+    decode_responses=True
+)
 
 # Email configuration
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -37,11 +60,61 @@ SMTP_USERNAME = os.getenv("SMTP_USERNAME", "")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
 EMAIL_FROM = os.getenv("EMAIL_FROM", "notifications@example.com")
 
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))  # persistent SMTP sessions
+SMTP_MAX_RECIPIENTS = int(os.getenv("SMTP_MAX_RECIPIENTS", "100"))  # envelope recipients per message
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
 # Slack configuration
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
 
+# Delivery retries
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "4"))
+DELIVERY_RETRY_BASE_DELAY = float(os.getenv("DELIVERY_RETRY_BASE_DELAY", "0.5"))  # seconds, doubled per attempt
+DELIVERY_RETRY_MAX_DELAY = float(os.getenv("DELIVERY_RETRY_MAX_DELAY", "10"))
+
+# Notification queue configuration
+NOTIFICATION_LANES = ["urgent", "high", "normal", "low"]  # one stream per priority, read in this order
+NOTIFICATION_STREAM_PREFIX = "notifications:stream"
+NOTIFICATION_DEAD_LETTER_STREAM = "notifications:dead"
+NOTIFICATION_STATS_KEY = "notifications:queue:stats"
+NOTIFICATION_GROUP = os.getenv("NOTIFICATION_GROUP", "notification-workers")
+NOTIFICATION_WORKERS = int(os.getenv("NOTIFICATION_WORKERS", "1"))  # consumers in this process; 0 for API-only pods
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "10"))
+NOTIFICATION_MAX_DELIVERIES = int(os.getenv("NOTIFICATION_MAX_DELIVERIES", "5"))
+NOTIFICATION_RETRY_IDLE_MS = int(os.getenv("NOTIFICATION_RETRY_IDLE_MS", "30000"))  # failed or orphaned entries are retried after this
+NOTIFICATION_STREAM_MAXLEN = int(os.getenv("NOTIFICATION_STREAM_MAXLEN", "100000"))
+NOTIFICATION_BLOCK_MS = 1000
+
+# Digest configuration
+DIGEST_WINDOW = int(os.getenv("DIGEST_WINDOW", "60"))  # seconds; 0 disables digesting
+DIGEST_PREFIX = "notifications:digest"
+DIGEST_DUE_KEY = "notifications:digest:due"
+DIGEST_FLUSH_INTERVAL = 1.0
+
+# Slack rate limits, per channel (incoming webhooks allow about one message per second)
+SLACK_RATE = float(os.getenv("SLACK_RATE", "1"))  # messages per second
+SLACK_BURST = int(os.getenv("SLACK_BURST", "3"))
+
+# Template configuration
+APP_ENV = os.getenv("APP_ENV", "production")
+TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")  # bytecode cache; defaults to a temp directory
+# Checking templates for changes stats the file on every render, so only do it outside production
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "false" if APP_ENV == "production" else "true").lower() == "true"
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+RENDER_OFFLOAD_ITEMS = int(os.getenv("RENDER_OFFLOAD_ITEMS", "200"))  # list items above which rendering leaves the event loop
+
 # Initialize Jinja2 environment for email templates
-env = Environment(loader=FileSystemLoader("templates"))
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+    auto_reload=TEMPLATE_AUTO_RELOAD,
+    cache_size=-1  # never evict compiled templates
+)
+
+# Compiled templates by name, filled by precompile_templates() when auto-reload is off
+compiled_templates: Dict[str, Template] = {}
 
 # Models
 class NotificationRequest(BaseModel):
@@ -52,6 +125,11 @@ class NotificationRequest(BaseModel):
     template_name: Optional[str] = None
     template_data: Optional[Dict] = None
     priority: str = "normal"  # low, normal, high, urgent
+    # Notifications with the same source, category and severity are collapsed into a digest
+    source: Optional[str] = None
+    category: Optional[str] = None
+    severity: Optional[str] = None
+    slack_channel: Optional[str] = None
 
 class NotificationResponse(BaseModel):
     notification_id: str
@@ -65,6 +143,8 @@ class NotificationStatus(BaseModel):
     sent_to: List[str]
     failed_to: List[str]
     timestamp: str
+    attempts: int = 0
+    digest_id: Optional[str] = None
 
 # Mock user database for demo purposes
 # In a real application, this would be fetched from a database
@@ -86,73 +166,256 @@ user_preferences = {
     }
 }
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        # In a real implementation, validate JWT token
-        return "user"  # Simplified for demo
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
+class TransientDeliveryError(Exception):
+    """A delivery failure worth retrying, e.g. a dropped connection or a 4xx reply."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+async def with_retries(func, *args, attempts: int = DELIVERY_MAX_ATTEMPTS):
+    """Call func, retrying transient failures with exponential backoff and jitter."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return await func(*args)
+        except TransientDeliveryError as e:
+            if attempt == attempts:
+                raise
+            delay = e.retry_after
+            if delay is None:
+                delay = min(DELIVERY_RETRY_BASE_DELAY * 2 ** (attempt - 1), DELIVERY_RETRY_MAX_DELAY)
+                delay *= random.uniform(0.5, 1.5)
+            logger.warning(f"Delivery attempt {attempt} failed ({str(e)}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+class SMTPConnectionPool:
+    """A small pool of logged-in SMTP sessions reused across notifications.
+
+    Sessions are opened lazily, up to size at once, and kept open between
+    sends. A session that errors is closed and replaced on next use.
+    """
+
+    def __init__(self, hostname: str = SMTP_SERVER, port: int = SMTP_PORT, username: Optional[str] = SMTP_USERNAME,
+                 password: Optional[str] = SMTP_PASSWORD, start_tls: bool = SMTP_STARTTLS, size: int = SMTP_POOL_SIZE,
+                 timeout: float = SMTP_TIMEOUT):
+        self.hostname = hostname
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            client = self._idle.pop()
+            if client.is_connected:
+                return client
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            timeout=self.timeout
         )
+        await client.connect()
+        return client
+
+    async def send(self, msg: MIMEMultipart, recipients: List[str]) -> Dict[str, str]:
+        """Send one message to all recipients in a single transaction.
+
+        Returns the recipients the server refused, mapped to its reply.
+        Raises TransientDeliveryError when the whole send should be retried.
+        """
+        async with self._slots:
+            client = None
+            try:
+                client = await self._acquire()
+                errors, _ = await client.send_message(msg, recipients=recipients)
+                self._idle.append(client)
+                return {recipient: str(response) for recipient, response in errors.items()}
+            except aiosmtplib.SMTPRecipientsRefused as e:
+                self._idle.append(client)
+                return {error.recipient: error.message for error in e.recipients}
+            except aiosmtplib.SMTPResponseException as e:
+                await self._discard(client)
+                if 400 <= e.code < 500:
+                    raise TransientDeliveryError(f"SMTP {e.code}: {e.message}")
+                raise
+            except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as e:
+                await self._discard(client)
+                raise TransientDeliveryError(f"SMTP connection error: {str(e)}")
+
+    async def _discard(self, client: Optional[aiosmtplib.SMTP]):
+        if client is not None and client.is_connected:
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for client in idle:
+            await self._discard(client)
+
+smtp_pool = SMTPConnectionPool()
 
-async def send_email(recipients: List[str], subject: str, body: str):
-    """Send an email to the specified recipients."""
-    if not SMTP_USERNAME or not SMTP_PASSWORD:
+def group_email_recipients(recipients: List[str]) -> List[List[str]]:
+    """Split recipients into sends: one shared send per SMTP_MAX_RECIPIENTS, and
+    an individual send for anyone whose preferences ask for separate emails."""
+    individual = [[r] for r in recipients if user_preferences.get(r, {}).get("individual_email", False)]
+    shared = [r for r in recipients if not user_preferences.get(r, {}).get("individual_email", False)]
+    return individual + [shared[i:i + SMTP_MAX_RECIPIENTS] for i in range(0, len(shared), SMTP_MAX_RECIPIENTS)]
+
+async def send_email(recipients: List[str], subject: str, body: str, pool: Optional[SMTPConnectionPool] = None) -> List[str]:
+    """Send an email to the specified recipients. Returns the recipients it could not be delivered to."""
+    if pool is None and (not SMTP_USERNAME or not SMTP_PASSWORD):
         logger.warning("SMTP credentials not configured, email sending simulated")
-        return True
-    
-    try:
+        return []
+    pool = pool or smtp_pool
+
+    async def send_group(group: List[str]) -> List[str]:
         msg = MIMEMultipart()
         msg["From"] = EMAIL_FROM
-        msg["To"] = ", ".join(recipients)
+        msg["To"] = ", ".join(group)
         msg["Subject"] = subject
-        
         msg.attach(MIMEText(body, "html"))
-        
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
-        
-        logger.info(f"Email sent to {recipients}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send email: {str(e)}")
-        return False
+        try:
+            with span("smtp.send", recipients=len(group)):
+                refused = await with_retries(pool.send, msg, group)
+        except Exception as e:
+            logger.error(f"Failed to send email to {len(group)} recipients: {str(e)}")
+            return group
+        for recipient, reason in refused.items():
+            logger.error(f"Email to {recipient} refused: {reason}")
+        return list(refused)
+
+    failures = await asyncio.gather(*(send_group(group) for group in group_email_recipients(recipients)))
+    failed = [recipient for group in failures for recipient in group]
+    logger.info(f"Email sent to {len(recipients) - len(failed)} of {len(recipients)} recipients")
+    return failed
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    # One pooled client, so webhook calls reuse keep-alive connections
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=10)
+    return _http_client
+
+class TokenBucket:
+    """Allows rate events per second on average, with bursts of up to burst."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
 
-async def send_slack_notification(message: str):
-    """Send a notification to Slack."""
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+slack_buckets: Dict[str, TokenBucket] = {}
+
+def slack_bucket(channel: Optional[str]) -> TokenBucket:
+    key = channel or "default"
+    if key not in slack_buckets:
+        slack_buckets[key] = TokenBucket(SLACK_RATE, SLACK_BURST)
+    return slack_buckets[key]
+
+async def post_slack_message(message: str, channel: Optional[str] = None):
+    await slack_bucket(channel).acquire()
+    payload = {"text": message}
+    if channel:
+        payload["channel"] = channel
+    response = await get_http_client().post(SLACK_WEBHOOK_URL, json=payload)
+    if response.status_code == 429 or response.status_code >= 500:
+        retry_after = response.headers.get("Retry-After")
+        raise TransientDeliveryError(
+            f"Slack returned {response.status_code}",
+            retry_after=float(retry_after) if retry_after else None
+        )
+    return response
+
+async def send_slack_notification(message: str, channel: Optional[str] = None):
+    """Send a notification to Slack, rate limited per channel."""
     if not SLACK_WEBHOOK_URL:
         logger.warning("Slack webhook URL not configured, Slack notification simulated")
         return True
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                SLACK_WEBHOOK_URL,
-                json={"text": message}
-            )
-            
-            if response.status_code == 200:
-                logger.info("Slack notification sent")
-                return True
-            else:
-                logger.error(f"Failed to send Slack notification: {response.text}")
-                return False
+        response = await with_retries(post_slack_message, message, channel)
+        
+        if response.status_code == 200:
+            logger.info("Slack notification sent")
+            return True
+        else:
+            logger.error(f"Failed to send Slack notification: {response.text}")
+            return False
     except Exception as e:
         logger.error(f"Failed to send Slack notification: {str(e)}")
         return False
 
+def precompile_templates() -> int:
+    """Compile every template once, so renders never touch the file system."""
+    compiled_templates.clear()
+    count = 0
+    for name in env.list_templates():
+        if name.endswith(".html"):
+            template = env.get_template(name)
+            count += 1
+            if not TEMPLATE_AUTO_RELOAD:
+                compiled_templates[name] = template
+    return count
+
 def render_template(template_name: str, data: Dict) -> str:
     """Render an email template with the provided data."""
     try:
-        template = env.get_template(f"{template_name}.html")
+        name = f"{template_name}.html"
+        template = compiled_templates.get(name) or env.get_template(name)
         return template.render(**data)
     except Exception as e:
         logger.error(f"Failed to render template: {str(e)}")
         return data.get("message", "Notification")
 
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, initializer=precompile_templates)
+    return _render_pool
+
+def render_size(data: Dict) -> int:
+    """Rough size of a payload: the number of items in its top-level lists."""
+    return sum(len(value) for value in data.values() if isinstance(value, (list, tuple, dict)))
+
+async def render_template_async(template_name: str, data: Dict) -> str:
+    """Render a template without blocking the event loop on large payloads.
+
+    Small payloads render inline; ones with more than RENDER_OFFLOAD_ITEMS
+    list items render in a process pool.
+    """
+    if RENDER_WORKERS <= 0 or render_size(data) <= RENDER_OFFLOAD_ITEMS:
+        return render_template(template_name, data)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_render_pool(), render_template, template_name, data)
+
+# Delivery outcomes per channel, counted per recipient for email
+NOTIFICATION_DELIVERIES = Counter("notification_deliveries_total", "Notification deliveries", ["channel", "outcome"])
+
 async def process_notification(
     notification_id: str,
     recipients: List[str],
@@ -161,31 +424,41 @@ async def process_notification(
     notification_type: str,
     template_name: Optional[str],
     template_data: Optional[Dict],
-    priority: str
+    priority: str,
+    slack_channel: Optional[str] = None
 ):
-    """Process a notification in the background."""
+    """Deliver a notification to its recipients and channels."""
     sent_to = []
     failed_to = []
     
-    # Render template if provided
+    # Render template if provided; Slack gets the plain message
+    body = message
     if template_name and template_data:
-        message = render_template(template_name, template_data)
+        body = await render_template_async(template_name, template_data)
     
-    # Send email notifications
-    if notification_type in ["email", "both"]:
-        for recipient in recipients:
-            if await send_email([recipient], subject, message):
-                sent_to.append(recipient)
-            else:
-                failed_to.append(recipient)
+    async def deliver_email():
+        failed = set(await send_email(recipients, subject, body))
+        sent_to.extend(r for r in recipients if r not in failed)
+        failed_to.extend(r for r in recipients if r in failed)
+        NOTIFICATION_DELIVERIES.labels("email", "failed").inc(sum(r in failed for r in recipients))
+        NOTIFICATION_DELIVERIES.labels("email", "sent").inc(sum(r not in failed for r in recipients))
     
-    # Send Slack notifications
-    if notification_type in ["slack", "both"]:
+    async def deliver_slack():
         slack_message = f"*{subject}*\n{message}"
-        if await send_slack_notification(slack_message):
+        if await send_slack_notification(slack_message, slack_channel):
             sent_to.append("slack")
+            NOTIFICATION_DELIVERIES.labels("slack", "sent").inc()
         else:
             failed_to.append("slack")
+            NOTIFICATION_DELIVERIES.labels("slack", "failed").inc()
+    
+    # Deliver to every channel concurrently
+    deliveries = []
+    if notification_type in ["email", "both"]:
+        deliveries.append(deliver_email())
+    if notification_type in ["slack", "both"]:
+        deliveries.append(deliver_slack())
+    await asyncio.gather(*deliveries)
     
     # Update notification status in Redis
     status = "completed" if not failed_to else "partial" if sent_to else "failed"
@@ -204,11 +477,365 @@ async def process_notification(
     )
     
     logger.info(f"Notification {notification_id} processed with status: {status}")
+    return notification_status
+
+def update_notification_status(notification_id: str, **changes):
+    """Merge changes into the stored status of a notification."""
+    key = f"notification:{notification_id}"
+    current = redis_client.get(key)
+    notification_status = json.loads(current) if current else {
+        "notification_id": notification_id, "sent_to": [], "failed_to": []
+    }
+    notification_status.update(changes, timestamp=datetime.now().isoformat())
+    redis_client.set(key, json.dumps(notification_status), ex=86400)
+
+class NotificationQueue:
+    """Durable notification queue on Redis Streams.
+
+    Each priority has its own stream, and every stream is read by the
+    NOTIFICATION_GROUP consumer group, so any number of worker processes can
+    share the load. Consumers always drain higher-priority lanes first.
+    Entries are acknowledged once delivered. Failed deliveries, and entries
+    held by a worker that died, stay pending and are reclaimed after
+    NOTIFICATION_RETRY_IDLE_MS. After NOTIFICATION_MAX_DELIVERIES attempts an
+    entry is moved to the dead-letter stream.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None, async_client: Optional[redis.asyncio.Redis] = None,
+                 group: str = NOTIFICATION_GROUP, max_deliveries: int = NOTIFICATION_MAX_DELIVERIES,
+                 retry_idle_ms: int = NOTIFICATION_RETRY_IDLE_MS):
+        self.client = client
+        self.async_client = async_client
+        self.group = group
+        self.max_deliveries = max_deliveries
+        self.retry_idle_ms = retry_idle_ms
+        self.consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._completed = deque(maxlen=10000)  # completion times, for throughput
+
+    def _client(self) -> redis.Redis:
+        return self.client or redis_client
+
+    def _async_client(self) -> redis.asyncio.Redis:
+        return self.async_client or stream_client
+
+    @staticmethod
+    def stream(lane: str) -> str:
+        return f"{NOTIFICATION_STREAM_PREFIX}:{lane}"
+
+    @staticmethod
+    def lane_for(priority: str) -> str:
+        return priority if priority in NOTIFICATION_LANES else "normal"
+
+    def enqueue(self, notification_id: str, request: Dict) -> str:
+        """Add a notification to the lane for its priority."""
+        lane = self.lane_for(request.get("priority", "normal"))
+        entry_id = self._client().xadd(
+            self.stream(lane),
+            {"notification_id": notification_id, "payload": json.dumps(request)},
+            maxlen=NOTIFICATION_STREAM_MAXLEN,
+            approximate=True
+        )
+        self._client().hincrby(NOTIFICATION_STATS_KEY, f"enqueued:{lane}", 1)
+        return entry_id
+
+    async def ensure_groups(self):
+        for lane in NOTIFICATION_LANES:
+            try:
+                await self._async_client().xgroup_create(self.stream(lane), self.group, id="0", mkstream=True)
+            except redis.exceptions.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def _read(self, consumer: str) -> List[Tuple[str, str, Dict, int]]:
+        """Read new entries, taking everything available from a lane before the next one."""
+        client = self._async_client()
+        for lane in NOTIFICATION_LANES:
+            response = await client.xreadgroup(self.group, consumer, {self.stream(lane): ">"}, count=NOTIFICATION_BATCH_SIZE)
+            if response:
+                return [(lane, entry_id, fields, 1) for entry_id, fields in response[0][1]]
+
+        # Nothing waiting: block on every lane until something arrives
+        response = await client.xreadgroup(
+            self.group, consumer, {self.stream(lane): ">" for lane in NOTIFICATION_LANES},
+            count=NOTIFICATION_BATCH_SIZE, block=NOTIFICATION_BLOCK_MS
+        )
+        lanes = {self.stream(lane): lane for lane in NOTIFICATION_LANES}
+        return [
+            (lanes[stream], entry_id, fields, 1)
+            for stream, entries in sorted(response or [], key=lambda item: NOTIFICATION_LANES.index(lanes[item[0]]))
+            for entry_id, fields in entries
+        ]
+
+    async def _reclaim(self, consumer: str) -> List[Tuple[str, str, Dict, int]]:
+        """Take over entries that have been pending longer than retry_idle_ms."""
+        client = self._async_client()
+        reclaimed = []
+        for lane in NOTIFICATION_LANES:
+            stream = self.stream(lane)
+            response = await client.xautoclaim(stream, self.group, consumer, self.retry_idle_ms,
+                                               start_id="0-0", count=NOTIFICATION_BATCH_SIZE)
+            for entry_id, fields in response[1]:
+                if not fields:
+                    # Trimmed from the stream while pending
+                    await client.xack(stream, self.group, entry_id)
+                    continue
+                pending = await client.xpending_range(stream, self.group, min=entry_id, max=entry_id, count=1)
+                deliveries = pending[0]["times_delivered"] if pending else 1
+                reclaimed.append((lane, entry_id, fields, deliveries))
+        return reclaimed
+
+    async def _dead_letter(self, lane: str, entry_id: str, fields: Dict, reason: str):
+        client = self._async_client()
+        await client.xadd(NOTIFICATION_DEAD_LETTER_STREAM, {**fields, "lane": lane, "entry_id": entry_id, "reason": reason},
+                          maxlen=NOTIFICATION_STREAM_MAXLEN, approximate=True)
+        await client.xack(self.stream(lane), self.group, entry_id)
+        await client.hincrby(NOTIFICATION_STATS_KEY, f"dead_lettered:{lane}", 1)
+        update_notification_status(fields["notification_id"], status="dead_lettered")
+        logger.error(f"Notification {fields['notification_id']} dead-lettered: {reason}")
+
+    async def _handle(self, lane: str, entry_id: str, fields: Dict, deliveries: int):
+        notification_id = fields["notification_id"]
+        if deliveries > self.max_deliveries:
+            await self._dead_letter(lane, entry_id, fields, f"Failed after {deliveries - 1} delivery attempts")
+            return
+
+        try:
+            request = json.loads(fields["payload"])
+            update_notification_status(notification_id, status="processing", attempts=deliveries)
+            result = await process_notification(
+                notification_id,
+                request["recipients"],
+                request["subject"],
+                request["message"],
+                request.get("notification_type", "email"),
+                request.get("template_name"),
+                request.get("template_data"),
+                request.get("priority", "normal"),
+                request.get("slack_channel")
+            )
+        except Exception as e:
+            logger.error(f"Error processing notification {notification_id}: {str(e)}")
+            result = {"status": "failed"}
+
+        client = self._async_client()
+        if result["status"] == "failed":
+            # Leave the entry pending; it is reclaimed and retried after retry_idle_ms
+            await client.hincrby(NOTIFICATION_STATS_KEY, f"failed:{lane}", 1)
+            if deliveries >= self.max_deliveries:
+                await self._dead_letter(lane, entry_id, fields, f"Failed after {deliveries} delivery attempts")
+            else:
+                update_notification_status(notification_id, status="retrying", attempts=deliveries)
+            return
+
+        await client.xack(self.stream(lane), self.group, entry_id)
+        await client.hincrby(NOTIFICATION_STATS_KEY, f"delivered:{lane}", 1)
+        update_notification_status(notification_id, attempts=deliveries)
+        self._completed.append(time.time())
+
+    async def consume(self, consumer: str):
+        """Process entries until cancelled."""
+        await self.ensure_groups()
+        next_reclaim = 0.0
+        while True:
+            try:
+                entries = []
+                if time.monotonic() >= next_reclaim:
+                    entries = await self._reclaim(consumer)
+                    next_reclaim = time.monotonic() + self.retry_idle_ms / 2000
+                entries = entries or await self._read(consumer)
+                await asyncio.gather(*(self._handle(*entry) for entry in entries))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification consumer {consumer} error: {str(e)}")
+                await asyncio.sleep(1)
+
+    def start(self, workers: int = NOTIFICATION_WORKERS):
+        for index in range(workers):
+            consumer = f"{self.consumer_prefix}-{index}"
+            self._tasks.append(asyncio.create_task(self.consume(consumer)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict:
+        """Per-lane backlog, pending entries and lag, plus delivery counters and throughput."""
+        client = self._client()
+        lanes = {}
+        for lane in NOTIFICATION_LANES:
+            stream = self.stream(lane)
+            lane_stats = {"length": client.xlen(stream), "pending": 0, "lag": None, "oldest_pending_ms": 0}
+            try:
+                group = next((g for g in client.xinfo_groups(stream) if g["name"] == self.group), None)
+            except redis.exceptions.ResponseError:
+                group = None  # stream not created yet
+            if group:
+                lane_stats["pending"] = group["pending"]
+                lane_stats["lag"] = group.get("lag")  # entries not yet read by the group (Redis 7+)
+                if group["pending"]:
+                    oldest = client.xpending_range(stream, self.group, min="-", max="+", count=1)
+                    lane_stats["oldest_pending_ms"] = oldest[0]["time_since_delivered"] if oldest else 0
+            lanes[lane] = lane_stats
+
+        counters = {}
+        for field, count in client.hgetall(NOTIFICATION_STATS_KEY).items():
+            outcome, _, lane = field.partition(":")
+            counters.setdefault(outcome, {})[lane] = int(count)
+
+        now = time.time()
+        return {
+            "lanes": lanes,
+            "dead_letter_length": client.xlen(NOTIFICATION_DEAD_LETTER_STREAM),
+            "counters": counters,
+            "delivered_per_minute": sum(1 for completed in self._completed if completed > now - 60)
+        }
+
+notification_queue = NotificationQueue()
+
+PRIORITY_RANK = {"low": 0, "normal": 1, "high": 2, "urgent": 3}
+
+class NotificationDigester:
+    """Collapses bursts of similar notifications into one digest.
+
+    Notifications sharing (source, category, severity) and addressed to the
+    same recipients and Slack channel are collected in a Redis list for DIGEST_WINDOW seconds from the first one, then sent as a
+    single notification rendered with the investigation_report template. A
+    notification that turns out to be alone in its window is sent as it was.
+    Urgent notifications, and ones without a digest key, are not held back.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None, window: int = DIGEST_WINDOW):
+        self.client = client
+        self.window = window
+        self._task: Optional[asyncio.Task] = None
+
+    def _client(self) -> redis.Redis:
+        return self.client or redis_client
+
+    @staticmethod
+    def digest_key(request: Dict) -> Optional[str]:
+        parts = (request.get("source"), request.get("category"), request.get("severity"))
+        if not any(parts):
+            return None
+        # A digest only goes to the audience every item in it was addressed to
+        audience = json.dumps([sorted(set(request.get("recipients", []))), request.get("slack_channel")])
+        return ":".join(part or "-" for part in parts) + ":" + hashlib.sha256(audience.encode()).hexdigest()[:12]
+
+    def should_digest(self, request: Dict) -> bool:
+        return self.window > 0 and request.get("priority") != "urgent" and self.digest_key(request) is not None
+
+    def add(self, notification_id: str, request: Dict):
+        """Hold a notification for the digest of its key; the first one opens the window."""
+        key = self.digest_key(request)
+        pipe = self._client().pipeline()
+        pipe.rpush(f"{DIGEST_PREFIX}:{key}", json.dumps({"notification_id": notification_id, **request}))
+        pipe.zadd(DIGEST_DUE_KEY, {key: time.time() + self.window}, nx=True)
+        pipe.execute()
+
+    def _take(self, key: str) -> List[Dict]:
+        """Atomically remove and return the notifications held for a key."""
+        pipe = self._client().pipeline(transaction=True)
+        pipe.lrange(f"{DIGEST_PREFIX}:{key}", 0, -1)
+        pipe.delete(f"{DIGEST_PREFIX}:{key}")
+        items, _ = pipe.execute()
+        return [json.loads(item) for item in items]
+
+    def build(self, key: str, items: List[Dict]) -> Dict:
+        """Build one notification request summarizing items."""
+        first = items[0]
+        source, category, severity = first.get("source"), first.get("category"), first.get("severity")
+        digest_id = str(uuid.uuid4())
+        recipients = first["recipients"]
+        channels = {item.get("notification_type", "email") for item in items}
+        notification_type = channels.pop() if len(channels) == 1 else "both"
+        priority = max((item.get("priority", "normal") for item in items), key=lambda p: PRIORITY_RANK.get(p, 1))
+        subject = f"[Digest] {len(items)} {severity or ''} {category or ''} notifications from {source or 'multiple sources'}"
+        subject = " ".join(subject.split())
+        timestamps = [item.get("queued_at", time.time()) for item in items]
+        return {
+            "digest_id": digest_id,
+            "recipients": recipients,
+            "subject": subject,
+            "message": "\n".join(f"- {item['subject']}" for item in items),
+            "notification_type": notification_type,
+            "template_name": "investigation_report",
+            "template_data": {
+                "report_id": digest_id,
+                "alert_id": f"{len(items)} notifications",
+                "timestamp": datetime.now().isoformat(),
+                "investigator": "MCP Platform",
+                "duration": f"{max(timestamps) - min(timestamps):.0f}s",
+                "status": f"Digest of {source or '-'} / {category or '-'} / {severity or '-'}",
+                "findings": [item["subject"] for item in items],
+                "evidence": [
+                    {"type": item.get("category") or "notification", "description": item["message"],
+                     "source": item.get("source")}
+                    for item in items
+                ],
+                "conclusion": f"{len(items)} similar notifications were received within {self.window}s "
+                              f"and have been combined into this digest.",
+                "recommendations": []
+            },
+            "priority": priority,
+            "source": source,
+            "category": category,
+            "severity": severity,
+            "slack_channel": first.get("slack_channel")
+        }
+
+    def flush_due(self, now: Optional[float] = None) -> List[str]:
+        """Send digests whose window has closed. Returns the ids of the notifications queued."""
+        client = self._client()
+        sent = []
+        for key in client.zrangebyscore(DIGEST_DUE_KEY, "-inf", now or time.time()):
+            # Only the worker whose ZREM succeeds sends this digest
+            if not client.zrem(DIGEST_DUE_KEY, key):
+                continue
+            items = self._take(key)
+            if not items:
+                continue
+            if len(items) == 1:
+                # Nothing to collapse: deliver the notification unchanged
+                request = {k: v for k, v in items[0].items() if k not in ("notification_id", "queued_at")}
+                notification_queue.enqueue(items[0]["notification_id"], request)
+                sent.append(items[0]["notification_id"])
+                continue
+            digest = self.build(key, items)
+            digest_id = digest.pop("digest_id")
+            update_notification_status(digest_id, status="pending", sent_to=[], failed_to=[], attempts=0)
+            notification_queue.enqueue(digest_id, digest)
+            for item in items:
+                update_notification_status(item["notification_id"], status="digested", digest_id=digest_id)
+            logger.info(f"Sent digest {digest_id} of {len(items)} notifications for {key}")
+            sent.append(digest_id)
+        return sent
+
+    async def run(self):
+        while True:
+            try:
+                self.flush_due()
+            except Exception as e:
+                logger.error(f"Error flushing notification digests: {str(e)}")
+            await asyncio.sleep(DIGEST_FLUSH_INTERVAL)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+notification_digester = NotificationDigester()
 
 @app.post("/notify", response_model=NotificationResponse)
 async def send_notification(
     request: NotificationRequest,
-    background_tasks: BackgroundTasks,
     current_user: str = Depends(get_current_user)
 ):
     """
@@ -216,29 +843,16 @@ async def send_notification(
     """
     try:
         # Generate a unique notification ID
-        import uuid
         notification_id = str(uuid.uuid4())
         
-        # Add notification to background tasks
-        background_tasks.add_task(
-            process_notification,
-            notification_id,
-            request.recipients,
-            request.subject,
-            request.message,
-            request.notification_type,
-            request.template_name,
-            request.template_data,
-            request.priority
-        )
-        
         # Store initial notification status
         initial_status = {
             "notification_id": notification_id,
             "status": "pending",
             "sent_to": [],
             "failed_to": [],
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "attempts": 0
         }
         
         redis_client.set(
@@ -247,6 +861,21 @@ async def send_notification(
             ex=86400  # Expire after 24 hours
         )
         
+        request_data = request.dict()
+        
+        # Hold similar non-urgent notifications for a digest
+        if notification_digester.should_digest(request_data):
+            notification_digester.add(notification_id, {**request_data, "queued_at": time.time()})
+            return NotificationResponse(
+                notification_id=notification_id,
+                status="pending",
+                message=f"Notification held for digest of {notification_digester.digest_key(request_data)}",
+                timestamp=datetime.now().isoformat()
+            )
+        
+        # Queue the notification for the delivery workers
+        notification_queue.enqueue(notification_id, request_data)
+        
         return NotificationResponse(
             notification_id=notification_id,
             status="pending",
@@ -309,6 +938,38 @@ async def list_templates(current_user: str = Depends(get_current_user)):
             detail=str(e)
         )
 
+@app.get("/queue/stats")
+async def get_queue_stats(current_user: str = Depends(get_current_user)):
+    """
+    Get notification queue backlog, lag and throughput.
+    """
+    try:
+        return notification_queue.stats()
+    except Exception as e:
+        logger.error(f"Error getting queue stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@app.on_event("startup")
+async def start_workers():
+    count = precompile_templates()
+    logger.info(f"Precompiled {count} templates (auto-reload {'on' if TEMPLATE_AUTO_RELOAD else 'off'})")
+    notification_queue.start()
+    if NOTIFICATION_WORKERS > 0:
+        notification_digester.start()
+
+@app.on_event("shutdown")
+async def close_clients():
+    await notification_digester.stop()
+    await notification_queue.stop()
+    await smtp_pool.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+    if _render_pool is not None:
+        _render_pool.shutdown(cancel_futures=True)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
@@ -0,0 +1,140 @@
+"""
+Benchmark email delivery against a local SMTP sink.
+
+Compares the previous delivery path (a new blocking smtplib session per
+recipient, one after another) with the pooled async engine, both sending one
+message per recipient and grouping recipients into shared sends. The sink
+(aiosmtpd, needed only for this benchmark) adds a fixed latency to every
+message to stand in for a remote relay.
+
+Usage:
+    python benchmarks/bench_delivery.py [--recipients 500] [--latency-ms 5] [--pool-size 4] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import smtplib
+import socket
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from aiosmtpd.controller import Controller
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(SERVICE_DIR))
+sys.path.append(SERVICE_DIR)
+sys.path.append(REPO_ROOT)  # for mcp_common
+
+BODY = "<html><body><h1>Security alert</h1><p>Suspicious login from 203.0.113.7</p></body></html>"
+
+class SinkHandler:
+    """Accepts every message, counting messages and envelope recipients."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages = 0
+        self.recipients = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.messages += 1
+        self.recipients += len(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+    def reset(self):
+        self.messages = 0
+        self.recipients = 0
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def legacy_send(port: int, recipients: list, subject: str) -> list:
+    """The pre-pool implementation: a fresh SMTP session per recipient, sequentially."""
+    failed = []
+    for recipient in recipients:
+        try:
+            msg = MIMEMultipart()
+            msg["From"] = "notifications@example.com"
+            msg["To"] = recipient
+            msg["Subject"] = subject
+            msg.attach(MIMEText(BODY, "html"))
+            with smtplib.SMTP("127.0.0.1", port) as server:
+                server.send_message(msg)
+        except Exception:
+            failed.append(recipient)
+    return failed
+
+async def pooled_send(port: int, recipients: list, subject: str, pool_size: int, individual: bool) -> list:
+    import app
+
+    for recipient in recipients:
+        app.user_preferences[recipient] = {"email": True, "individual_email": individual}
+    pool = app.SMTPConnectionPool(hostname="127.0.0.1", port=port, username=None, password=None,
+                                  start_tls=False, size=pool_size)
+    try:
+        return await app.send_email(recipients, subject, BODY, pool=pool)
+    finally:
+        await pool.close()
+
+def measure(mode: str, handler: SinkHandler, recipients: list, send) -> dict:
+    handler.reset()
+    start = time.perf_counter()
+    failed = send()
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "recipients_per_second": len(recipients) / elapsed,
+        "messages": handler.messages,
+        "delivered": handler.recipients,
+        "failed": len(failed)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=500, help="recipients per notification")
+    parser.add_argument("--latency-ms", type=float, default=5, help="sink latency per message")
+    parser.add_argument("--pool-size", type=int, default=4, help="SMTP sessions in the pool")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    port = free_port()
+    handler = SinkHandler(args.latency_ms / 1000)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+
+    recipients = [f"analyst{i:04d}@example.com" for i in range(args.recipients)]
+    subject = "Security alert: suspicious login"
+    try:
+        results = [
+            measure("per-recipient sessions (legacy)", handler, recipients,
+                    lambda: legacy_send(port, recipients, subject)),
+            measure("pooled, one per recipient", handler, recipients,
+                    lambda: asyncio.run(pooled_send(port, recipients, subject, args.pool_size, True))),
+            measure("pooled, grouped", handler, recipients,
+                    lambda: asyncio.run(pooled_send(port, recipients, subject, args.pool_size, False)))
+        ]
+    finally:
+        controller.stop()
+
+    report = {"recipients": args.recipients, "latency_ms": args.latency_ms, "pool_size": args.pool_size,
+              "results": results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['recipients']} recipients, sink latency {report['latency_ms']} ms, pool size {report['pool_size']}")
+    print(f"{'mode':<34}{'seconds':>10}{'rcpt/s':>10}{'messages':>10}{'delivered':>11}{'failed':>8}")
+    for row in results:
+        print(f"{row['mode']:<34}{row['seconds']:>10.2f}{row['recipients_per_second']:>10.0f}"
+              f"{row['messages']:>10}{row['delivered']:>11}{row['failed']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark rendering investigation_report.html with a large digest payload.
+
+Compares the previous per-render get_template() on an auto-reloading
+environment (a file system stat per render) with precompiled templates, and
+measures how long the event loop stalls while a batch of large renders runs
+inline versus through render_template_async's process pool.
+
+Usage:
+    python benchmarks/bench_templates.py [--findings 1000] [--renders 200] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from jinja2 import Environment, FileSystemLoader
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(SERVICE_DIR))
+sys.path.append(SERVICE_DIR)
+sys.path.append(REPO_ROOT)  # for mcp_common
+
+def report_payload(findings: int) -> dict:
+    return {
+        "report_id": "bench-report",
+        "alert_id": f"{findings} notifications",
+        "timestamp": "2024-01-01T00:00:00",
+        "investigator": "MCP Platform",
+        "duration": "300s",
+        "status": "Digest of siem / authentication / high",
+        "findings": [f"Failed password for root from 203.0.113.{i % 255} port {1024 + i} ssh2" for i in range(findings)],
+        "evidence": [
+            {"type": "authentication", "description": f"sshd brute force attempt #{i}", "source": "siem"}
+            for i in range(findings)
+        ],
+        "conclusion": "Repeated authentication failures consistent with a brute force campaign.",
+        "recommendations": ["Block source addresses", "Enforce key-based SSH authentication"]
+    }
+
+def renders_per_second(render, data: dict, renders: int) -> float:
+    start = time.perf_counter()
+    for _ in range(renders):
+        render(data)
+    return renders / (time.perf_counter() - start)
+
+async def loop_stall(render_batch) -> tuple:
+    """Run render_batch while a ticker measures the longest gap between event loop ticks."""
+    worst = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal worst
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst = max(worst, now - last - 0.001)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await render_batch()
+    elapsed = time.perf_counter() - start
+    running = False
+    await task
+    return elapsed, worst * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--findings", type=int, default=1000, help="findings and evidence items in the payload")
+    parser.add_argument("--renders", type=int, default=200, help="renders per measurement")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    os.environ.setdefault("APP_ENV", "production")
+    logging.disable(logging.WARNING)
+    import app
+
+    data = report_payload(args.findings)
+    legacy_env = Environment(loader=FileSystemLoader(app.TEMPLATE_DIR))
+    app.precompile_templates()
+
+    results = {
+        "get_template per render (legacy)": renders_per_second(
+            lambda d: legacy_env.get_template("investigation_report.html").render(**d), data, args.renders),
+        "precompiled": renders_per_second(
+            lambda d: app.render_template("investigation_report", d), data, args.renders)
+    }
+
+    batch = max(args.renders // 10, 1)
+
+    async def inline_batch():
+        for _ in range(batch):
+            app.render_template("investigation_report", data)
+
+    async def pooled_batch():
+        await asyncio.gather(*(app.render_template_async("investigation_report", data) for _ in range(batch)))
+
+    async def measure_stalls():
+        # Warm the pool so worker start-up is not counted
+        await app.render_template_async("investigation_report", data)
+        return await loop_stall(inline_batch), await loop_stall(pooled_batch)
+
+    (inline_seconds, inline_stall), (pooled_seconds, pooled_stall) = asyncio.run(measure_stalls())
+    app.get_render_pool().shutdown()
+
+    report = {
+        "findings": args.findings,
+        "renders": args.renders,
+        "render_workers": app.RENDER_WORKERS,
+        "renders_per_second": results,
+        "event_loop": {
+            "batch": batch,
+            "inline": {"seconds": inline_seconds, "max_stall_ms": inline_stall},
+            "process_pool": {"seconds": pooled_seconds, "max_stall_ms": pooled_stall}
+        }
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"investigation_report.html with {args.findings} findings, {args.renders} renders")
+    for mode, rate in results.items():
+        print(f"  {mode:<36}{rate:>10.1f} renders/s")
+    print(f"\nevent loop during {batch} concurrent renders ({app.RENDER_WORKERS} render workers)")
+    for mode, row in (("inline", report["event_loop"]["inline"]), ("process pool", report["event_loop"]["process_pool"])):
+        print(f"  {mode:<36}{row['seconds']:>8.2f} s   longest stall {row['max_stall_ms']:>8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import pytest
+import os
+import sys
+
+import fakeredis
+import fakeredis.aioredis
+
+# Add the parent directory to the path so we can import the app, and the
+# repository root for the shared mcp_common package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+os.environ.setdefault("MEMORY_URL", "redis://localhost:6379")
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+@pytest.fixture
+def store(server, monkeypatch):
+    """A fake Redis behind the service's sync client; async clients come from async_store()."""
+    store = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr("app.redis_client", store)
+    return store
+
+@pytest.fixture
+def async_store(server):
+    """Makes async clients on the fake Redis; create them inside the event loop that uses them."""
+    return lambda: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
@@ -0,0 +1,143 @@
+import pytest
+import asyncio
+import socket
+
+from aiosmtpd.controller import Controller
+
+import app as app_module
+from app import SMTPConnectionPool, send_email
+
+class SinkHandler:
+    """Accepts messages, recording the client port of each session. Replies with queued errors first."""
+
+    def __init__(self):
+        self.peers = []
+        self.recipients = []
+        self.data_replies = []
+        self.rejected_peers = []
+        self.refused = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refused:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.data_replies:
+            self.rejected_peers.append(session.peer[1])
+            return self.data_replies.pop(0)
+        self.peers.append(session.peer[1])
+        self.recipients.extend(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+@pytest.fixture
+def sink():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    handler = SinkHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield handler, controller
+    controller.stop()
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(app_module, "DELIVERY_RETRY_BASE_DELAY", 0.01)
+
+def make_pool(controller, size=2):
+    return SMTPConnectionPool(hostname="127.0.0.1", port=controller.port, username=None, password=None,
+                              start_tls=False, size=size)
+
+def deliver(pool, *batches):
+    async def run():
+        try:
+            return [await send_email(recipients, "Security alert", "<p>details</p>", pool=pool) for recipients in batches]
+        finally:
+            await pool.close()
+    return asyncio.run(run())
+
+def test_sessions_are_reused_across_sends(sink):
+    handler, controller = sink
+    failed = deliver(make_pool(controller), ["a@example.com"], ["b@example.com", "c@example.com"], ["d@example.com"])
+
+    assert failed == [[], [], []]
+    assert handler.recipients == ["a@example.com", "b@example.com", "c@example.com", "d@example.com"]
+    assert len(handler.peers) == 3
+    assert len(set(handler.peers)) == 1
+
+def test_refused_recipients_fail_without_retrying_the_rest(sink):
+    handler, controller = sink
+    handler.refused.add("gone@example.com")
+    [failed] = deliver(make_pool(controller), ["a@example.com", "gone@example.com"])
+
+    assert failed == ["gone@example.com"]
+    assert handler.recipients == ["a@example.com"]
+
+def test_session_is_discarded_after_a_transient_error(sink):
+    handler, controller = sink
+    handler.data_replies.append("421 Service shutting down")
+    pool = make_pool(controller)
+
+    async def run():
+        try:
+            first = await send_email(["a@example.com"], "Security alert", "<p>details</p>", pool=pool)
+            idle = list(pool._idle)
+            second = await send_email(["b@example.com"], "Security alert", "<p>details</p>", pool=pool)
+            return first, second, idle
+        finally:
+            await pool.close()
+
+    first, second, idle = asyncio.run(run())
+    assert first == [] and second == []
+    assert handler.recipients == ["a@example.com", "b@example.com"]
+    # The retry went out on a new session, which was then kept for the next send
+    assert len(idle) == 1
+    assert handler.rejected_peers[0] != handler.peers[0]
+    assert handler.peers[0] == handler.peers[1]
+
+def test_disconnected_idle_session_is_replaced(sink):
+    handler, controller = sink
+    pool = make_pool(controller)
+
+    async def run():
+        try:
+            await send_email(["a@example.com"], "Security alert", "<p>details</p>", pool=pool)
+            pool._idle[0].close()  # the server dropped it while idle
+            return await send_email(["b@example.com"], "Security alert", "<p>details</p>", pool=pool)
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == []
+    assert handler.recipients == ["a@example.com", "b@example.com"]
+    assert len(set(handler.peers)) == 2
+
+def test_email_and_slack_are_delivered_concurrently(store, monkeypatch):
+    started = []
+
+    async def slow_email(recipients, subject, body):
+        started.append("email")
+        await asyncio.sleep(0.2)
+        return []
+
+    async def slow_slack(message, channel=None):
+        started.append("slack")
+        await asyncio.sleep(0.2)
+        return True
+
+    monkeypatch.setattr(app_module, "send_email", slow_email)
+    monkeypatch.setattr(app_module, "send_slack_notification", slow_slack)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await app_module.process_notification("n-1", ["a@example.com"], "Security alert", "details",
+                                                       "both", None, None, "normal")
+        return result, loop.time() - start
+
+    result, elapsed = asyncio.run(run())
+    assert sorted(started) == ["email", "slack"]
+    assert elapsed < 0.35
+    assert result["status"] == "completed"
+    assert sorted(result["sent_to"]) == ["a@example.com", "slack"]
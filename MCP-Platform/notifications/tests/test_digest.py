@@ -0,0 +1,95 @@
+import pytest
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import NotificationDigester, NotificationQueue, TokenBucket, app
+
+def request(subject="Brute force on vpn-01", priority="normal", **fields):
+    return {"recipients": ["analyst@example.com"], "subject": subject, "message": "details",
+            "notification_type": "email", "template_name": "alert", "template_data": {"alert_id": subject},
+            "priority": priority, "source": "siem", "category": "authentication", "severity": "medium",
+            "slack_channel": None, **fields}
+
+def queued(store, lane="normal"):
+    return [(fields["notification_id"], json.loads(fields["payload"]))
+            for _, fields in store.xrange(NotificationQueue.stream(lane))]
+
+def status_of(store, notification_id):
+    return json.loads(store.get(f"notification:{notification_id}"))
+
+@pytest.fixture
+def client(store):
+    app.dependency_overrides[app_module.get_current_user] = lambda: "test-user"
+    yield TestClient(app)
+    app.dependency_overrides.pop(app_module.get_current_user, None)
+
+def test_similar_notifications_are_held_until_the_window_closes(store):
+    digester = NotificationDigester(window=60)
+    for index in range(3):
+        digester.add(f"n-{index}", {**request(f"Brute force on vpn-0{index}"), "queued_at": time.time()})
+
+    assert digester.flush_due() == []
+    assert queued(store) == []
+    [digest_id] = digester.flush_due(now=time.time() + 61)
+    [(queued_id, digest)] = queued(store)
+    assert queued_id == digest_id
+    assert digest["subject"] == "[Digest] 3 medium authentication notifications from siem"
+    assert digest["recipients"] == ["analyst@example.com"]
+    assert digest["template_name"] == "investigation_report"
+    assert digest["template_data"]["findings"] == [f"Brute force on vpn-0{index}" for index in range(3)]
+    assert [status_of(store, f"n-{index}")["digest_id"] for index in range(3)] == [digest_id] * 3
+    assert status_of(store, "n-0")["status"] == "digested"
+    assert digester.flush_due(now=time.time() + 120) == []
+
+def test_single_held_notification_is_sent_unchanged(store):
+    digester = NotificationDigester(window=60)
+    digester.add("n-1", {**request(), "queued_at": time.time()})
+
+    assert digester.flush_due(now=time.time() + 61) == ["n-1"]
+    assert queued(store) == [("n-1", request())]
+
+def test_digests_are_not_shared_across_recipients(store):
+    digester = NotificationDigester(window=60)
+    digester.add("n-1", {**request(), "queued_at": time.time()})
+    digester.add("n-2", {**request(recipients=["soc@example.com"]), "queued_at": time.time()})
+    digester.add("n-3", {**request(), "queued_at": time.time()})
+
+    digester.flush_due(now=time.time() + 61)
+    sent = {tuple(payload["recipients"]): (notification_id, payload) for notification_id, payload in queued(store)}
+    assert sent.keys() == {("analyst@example.com",), ("soc@example.com",)}
+    assert sent[("analyst@example.com",)][1]["subject"].startswith("[Digest] 2 ")
+    assert sent[("soc@example.com",)][0] == "n-2"
+
+def test_notify_holds_similar_notifications_and_sends_urgent_ones_at_once(store, client):
+    held = client.post("/notify", json=request())
+    urgent = client.post("/notify", json=request(priority="urgent"))
+    unkeyed = client.post("/notify", json=request(source=None, category=None, severity=None))
+
+    assert held.json()["message"].startswith("Notification held for digest of siem:authentication:medium:")
+    assert [notification_id for notification_id, _ in queued(store, "urgent")] == [urgent.json()["notification_id"]]
+    assert [notification_id for notification_id, _ in queued(store)] == [unkeyed.json()["notification_id"]]
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=20, burst=3)
+
+    async def run():
+        start = time.monotonic()
+        times = []
+        for _ in range(5):
+            await bucket.acquire()
+            times.append(time.monotonic() - start)
+        return times
+
+    times = asyncio.run(run())
+    assert times[2] < 0.02
+    assert 0.08 <= times[4] < 0.3
+
+def test_slack_buckets_are_per_channel(monkeypatch):
+    monkeypatch.setattr(app_module, "slack_buckets", {})
+    assert app_module.slack_bucket("#soc") is app_module.slack_bucket("#soc")
+    assert app_module.slack_bucket("#soc") is not app_module.slack_bucket("#incidents")
+    assert app_module.slack_bucket(None) is app_module.slack_bucket(None)
@@ -0,0 +1,126 @@
+import pytest
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import NOTIFICATION_DEAD_LETTER_STREAM, NOTIFICATION_STATS_KEY, NotificationQueue, app
+
+def request(priority="normal", **fields):
+    return {"recipients": ["analyst@example.com"], "subject": f"{priority} alert", "message": "details",
+            "notification_type": "email", "priority": priority, **fields}
+
+@pytest.fixture
+def deliveries(monkeypatch):
+    """Replaces delivery with a recorder that fails while outcomes[0] is "failed"."""
+    calls = []
+    outcomes = []
+
+    async def process_notification(notification_id, recipients, subject, *args):
+        calls.append((notification_id, subject))
+        return {"status": outcomes.pop(0) if outcomes else "completed"}
+
+    monkeypatch.setattr(app_module, "process_notification", process_notification)
+    return calls, outcomes
+
+def status_of(store, notification_id):
+    return json.loads(store.get(f"notification:{notification_id}"))
+
+def test_higher_priority_lanes_are_read_first(store, async_store):
+    async def run():
+        queue = NotificationQueue(client=store, async_client=async_store())
+        for priority in ["low", "normal", "urgent", "unknown", "high"]:
+            queue.enqueue(f"{priority}-1", request(priority))
+        await queue.ensure_groups()
+        reads = []
+        while True:
+            entries = await queue._read("worker")
+            if not entries:
+                return reads
+            reads.append([(lane, fields["notification_id"]) for lane, _, fields, _ in entries])
+
+    assert asyncio.run(run()) == [
+        [("urgent", "urgent-1")],
+        [("high", "high-1")],
+        [("normal", "normal-1"), ("normal", "unknown-1")],
+        [("low", "low-1")]
+    ]
+
+def test_failed_delivery_is_retried_then_acknowledged(store, async_store, deliveries):
+    calls, outcomes = deliveries
+    outcomes.append("failed")
+
+    async def run():
+        queue = NotificationQueue(client=store, async_client=async_store(), retry_idle_ms=0)
+        queue.enqueue("n-1", request())
+        await queue.ensure_groups()
+        for entry in await queue._read("worker"):
+            await queue._handle(*entry)
+        assert status_of(store, "n-1")["status"] == "retrying"
+        retried = await queue._reclaim("worker")
+        assert [count for _, _, _, count in retried] == [2]
+        for entry in retried:
+            await queue._handle(*entry)
+        return queue
+
+    queue = asyncio.run(run())
+    assert calls == [("n-1", "normal alert"), ("n-1", "normal alert")]
+    assert status_of(store, "n-1")["attempts"] == 2
+    assert queue.stats()["lanes"]["normal"]["pending"] == 0
+    assert store.hgetall(NOTIFICATION_STATS_KEY) == {"enqueued:normal": "1", "failed:normal": "1", "delivered:normal": "1"}
+
+def test_dead_lettered_after_max_deliveries(store, async_store, deliveries):
+    calls, outcomes = deliveries
+    outcomes.extend(["failed", "failed"])
+
+    async def run():
+        queue = NotificationQueue(client=store, async_client=async_store(), max_deliveries=2, retry_idle_ms=0)
+        queue.enqueue("n-1", request("high"))
+        await queue.ensure_groups()
+        for entry in await queue._read("worker"):
+            await queue._handle(*entry)
+        for entry in await queue._reclaim("worker"):
+            await queue._handle(*entry)
+        assert await queue._reclaim("worker") == []
+        return queue
+
+    queue = asyncio.run(run())
+    assert len(calls) == 2
+    [(_, dead)] = store.xrange(NOTIFICATION_DEAD_LETTER_STREAM)
+    assert dead["notification_id"] == "n-1"
+    assert dead["lane"] == "high"
+    assert dead["reason"] == "Failed after 2 delivery attempts"
+    assert status_of(store, "n-1")["status"] == "dead_lettered"
+    assert queue.stats()["lanes"]["high"]["pending"] == 0
+    assert queue.stats()["dead_letter_length"] == 1
+
+def test_entries_orphaned_past_max_deliveries_are_not_redelivered(store, async_store, deliveries):
+    calls, _ = deliveries
+
+    async def run():
+        queue = NotificationQueue(client=store, async_client=async_store(), max_deliveries=1, retry_idle_ms=0)
+        queue.enqueue("n-1", request())
+        await queue.ensure_groups()
+        # Read by a worker that died before handling it
+        await queue._read("dead-worker")
+        for entry in await queue._reclaim("worker"):
+            await queue._handle(*entry)
+
+    asyncio.run(run())
+    assert calls == []
+    assert store.xrange(NOTIFICATION_DEAD_LETTER_STREAM)[0][1]["reason"] == "Failed after 1 delivery attempts"
+
+def test_notify_queues_in_the_lane_for_its_priority(store):
+    app.dependency_overrides[app_module.get_current_user] = lambda: "test-user"
+    try:
+        response = TestClient(app).post("/notify", json=request("urgent"))
+    finally:
+        app.dependency_overrides.pop(app_module.get_current_user, None)
+
+    assert response.status_code == 200
+    notification_id = response.json()["notification_id"]
+    assert status_of(store, notification_id)["status"] == "pending"
+    [(_, entry)] = store.xrange(NotificationQueue.stream("urgent"))
+    assert entry["notification_id"] == notification_id
+    assert json.loads(entry["payload"])["subject"] == "urgent alert"
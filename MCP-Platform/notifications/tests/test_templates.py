@@ -0,0 +1,36 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import app as app_module
+from app import precompile_templates, render_template, render_template_async
+
+def report(findings):
+    return {"report_id": "r-1", "alert_id": "a-1", "timestamp": "now", "investigator": "MCP Platform",
+            "duration": "1s", "status": "done", "findings": [f"finding {i}" for i in range(findings)],
+            "evidence": [], "conclusion": "contained", "recommendations": []}
+
+def test_templates_are_precompiled_when_auto_reload_is_off(monkeypatch):
+    monkeypatch.setattr(app_module, "TEMPLATE_AUTO_RELOAD", False)
+    assert precompile_templates() == 3
+    assert set(app_module.compiled_templates) == {"investigation_report.html", "remediation_status.html",
+                                                  "security_alert.html"}
+    assert "finding 1" in render_template("investigation_report", report(2))
+
+def test_missing_template_falls_back_to_the_message():
+    assert render_template("no_such_template", {"message": "plain text"}) == "plain text"
+
+def test_only_large_payloads_are_rendered_off_the_event_loop(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    offloaded = []
+    monkeypatch.setattr(app_module, "RENDER_OFFLOAD_ITEMS", 10)
+    monkeypatch.setattr(app_module, "get_render_pool", lambda: offloaded.append(True) or pool)
+
+    try:
+        small = asyncio.run(render_template_async("investigation_report", report(5)))
+        assert offloaded == []
+        large = asyncio.run(render_template_async("investigation_report", report(50)))
+        assert offloaded == [True]
+    finally:
+        pool.shutdown()
+    assert "finding 4" in small
+    assert "finding 49" in large
@@ -1,14 +1,25 @@
 from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import os
 import redis
 import httpx
 from typing import Optional, List, Dict
 import json
-from datetime import datetime
+import uuid
+from mcp_common import event_bus
+from mcp_common.auth import get_current_user, install_auth, oauth2_scheme
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import ALERT_ID_HEADER, set_alert_id, setup_tracing
 
 app = FastAPI(title="Agent Manager")
+install_auth(app)
+setup_tracing(app, "agent-manager")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
 
 # Initialize Redis client
 redis_client = redis.Redis(
@@ -17,8 +28,12 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
-# OAuth2 scheme for JWT validation
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
+# Downstream services
+TRIAGE_AGENT_URL = os.getenv("TRIAGE_AGENT_URL", "http://triage-agent:8000")
+THREAT_INTEL_AGENT_URL = os.getenv("THREAT_INTEL_AGENT_URL", "http://threat-intel-agent:8000")
+INVESTIGATION_AGENT_URL = os.getenv("INVESTIGATION_AGENT_URL", "http://investigation-agent:8000")
+REMEDIATION_AGENT_URL = os.getenv("REMEDIATION_AGENT_URL", "http://remediation-agent:8000")
+NOTIFICATIONS_SERVICE_URL = os.getenv("NOTIFICATIONS_SERVICE_URL", "http://notifications:8000")
 
 class Alert(BaseModel):
     source: str
@@ -31,22 +46,13 @@ class TriageResult(BaseModel):
     severity: str
     indicators: List[dict]
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        # In a real implementation, validate JWT token
-        return "user"  # Simplified for demo
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
-
-async def call_triage_agent(alert: Alert) -> TriageResult:
+async def call_triage_agent(alert: Alert, headers: Optional[Dict] = None) -> TriageResult:
     """Call the Triage Agent to classify an alert."""
     async with httpx.AsyncClient() as client:
         response = await client.post(
-            "http://triage-agent:8000/triage",
-            json=alert.dict()
+            f"{TRIAGE_AGENT_URL}/triage",
+            json=alert.dict(),
+            headers=headers
         )
         if response.status_code != 200:
             raise HTTPException(
@@ -55,106 +61,180 @@ async def call_triage_agent(alert: Alert) -> TriageResult:
             )
         return TriageResult(**response.json())
 
-async def call_threat_intel(indicators: List[dict]) -> dict:
+async def call_threat_intel(indicators: List[dict], headers: Optional[Dict] = None) -> dict:
     """Call the Threat Intel Agent to enrich indicators."""
     if not indicators:
         return {}
     
     async with httpx.AsyncClient() as client:
         response = await client.post(
-            "http://threat-intel-agent:8000/enrich",
-            json={"indicators": indicators}
+            f"{THREAT_INTEL_AGENT_URL}/enrich",
+            json={"indicators": indicators},
+            headers=headers
         )
         if response.status_code != 200:
             return {}  # Return empty if threat intel fails
         return response.json()
 
-async def call_investigation(alert: Alert, triage: TriageResult, threat_intel: dict) -> dict:
+async def call_investigation(alert: Alert, triage: TriageResult, threat_intel: dict, headers: Optional[Dict] = None) -> dict:
     """Call the Investigation Agent for deeper analysis."""
     async with httpx.AsyncClient() as client:
         response = await client.post(
-            "http://investigation-agent:8000/investigate",
+            f"{INVESTIGATION_AGENT_URL}/investigate",
             json={
                 "alert": alert.dict(),
                 "triage": triage.dict(),
                 "threat_intel": threat_intel
-            }
+            },
+            headers=headers
         )
         if response.status_code != 200:
             return {"error": "Investigation failed"}
         return response.json()
 
-async def call_remediation(alert: Alert, investigation: dict) -> dict:
+async def call_remediation(alert: Alert, investigation: dict, headers: Optional[Dict] = None) -> dict:
     """Call the Remediation Agent for response actions."""
     async with httpx.AsyncClient() as client:
         response = await client.post(
-            "http://remediation-agent:8000/remediate",
+            f"{REMEDIATION_AGENT_URL}/remediate",
             json={
                 "alert": alert.dict(),
                 "investigation": investigation
-            }
+            },
+            headers=headers
         )
         if response.status_code != 200:
             return {"error": "Remediation failed"}
         return response.json()
 
-async def send_notification(message: str, channels: List[str] = ["slack", "email"]):
-    """Send notification via the Notifications service."""
+# Notification configuration
+NOTIFICATION_RECIPIENTS = [r for r in os.getenv("NOTIFICATION_RECIPIENTS", "analyst@example.com").split(",") if r]
+# High severity is urgent so that it is delivered at once rather than held for a digest
+SEVERITY_PRIORITY = {"high": "urgent", "medium": "normal", "low": "low"}
+
+async def send_notification(
+    message: str,
+    channels: List[str] = ["slack", "email"],
+    subject: str = "Security alert",
+    priority: str = "normal",
+    source: Optional[str] = None,
+    category: Optional[str] = None,
+    severity: Optional[str] = None,
+    headers: Optional[Dict] = None
+):
+    """Send notification via the Notifications service.
+
+    Notifications with the same source, category and severity are collapsed
+    into digests by the Notifications service unless priority is urgent.
+    """
     async with httpx.AsyncClient() as client:
         try:
             await client.post(
-                "http://notifications:8000/notify",
-                json={"message": message, "channels": channels}
+                f"{NOTIFICATIONS_SERVICE_URL}/notify",
+                json={
+                    "recipients": NOTIFICATION_RECIPIENTS,
+                    "subject": subject,
+                    "message": message,
+                    "notification_type": "both" if len(channels) > 1 else channels[0],
+                    "priority": priority,
+                    "source": source,
+                    "category": category,
+                    "severity": severity
+                },
+                headers=headers
             )
         except Exception:
             # Log error but don't fail the workflow
             pass
 
+async def notify_processed(alert: Alert, triage_result: TriageResult, investigation: dict, headers: Optional[Dict] = None):
+    """Notify analysts of a processed alert."""
+    notification = f"""
+    New Security Alert Processed:
+    - Source: {alert.source}
+    - Type: {alert.event_type}
+    - Severity: {triage_result.severity}
+    - Category: {triage_result.category}
+    
+    Investigation Findings:
+    {investigation.get('summary', 'No summary available')}
+    
+    Recommended Actions:
+    {investigation.get('recommended_actions', ['No actions recommended'])}
+    """
+    await send_notification(
+        notification,
+        subject=f"Security alert: {alert.event_type} from {alert.source}",
+        priority=SEVERITY_PRIORITY.get(triage_result.severity, "normal"),
+        source=alert.source,
+        category=triage_result.category,
+        severity=triage_result.severity,
+        headers=headers
+    )
+
+async def notify_failure(alert: Alert, error: str, headers: Optional[Dict] = None):
+    """Notify analysts that an alert could not be processed."""
+    await send_notification(
+        f"Error processing alert from {alert.source}: {error}",
+        channels=["slack"],  # Only notify on Slack for errors
+        subject=f"Error processing alert from {alert.source}",
+        priority="urgent",
+        source=alert.source,
+        category="processing_error",
+        headers=headers
+    )
+
 @app.post("/alert")
 async def process_alert(
     alert: Alert,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_current_user),
+    token: str = Depends(oauth2_scheme)
 ):
     """
     Process a new security alert through the workflow.
+    
+    With the event bus enabled the alert is queued for the triage stage and
+    its progress can be followed on /alert/{alert_id}.
     """
+    # Every agent records its results under the same alert id; the trace id
+    # travels in the traceparent header added by the httpx instrumentation
+    alert_id = uuid.uuid4().hex
+    set_alert_id(alert_id)
+    # Downstream services verify the caller's token themselves
+    headers = {"Authorization": f"Bearer {token}", ALERT_ID_HEADER: alert_id}
     try:
         # Store alert in memory
-        alert_id = f"alert:{datetime.now().timestamp()}"
-        redis_client.set(alert_id, json.dumps(alert.dict()))
+        alert_key = f"alert:{alert_id}"
+        redis_client.set(alert_key, json.dumps(alert.dict()))
+        
+        if event_bus.EVENT_BUS_ENABLED:
+            await event_bus.publish("triage", alert_id, {"alert": alert.dict()}, token)
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={"alert_id": alert_id, "status": "queued"}
+            )
         
         # Step 1: Triage
-        triage_result = await call_triage_agent(alert)
-        redis_client.set(f"{alert_id}:triage", json.dumps(triage_result.dict()))
+        triage_result = await call_triage_agent(alert, headers)
+        redis_client.set(f"{alert_key}:triage", json.dumps(triage_result.dict()))
         
         # Step 2: Threat Intelligence (if indicators found)
-        threat_intel = await call_threat_intel(triage_result.indicators)
+        threat_intel = await call_threat_intel(triage_result.indicators, headers)
         if threat_intel:
-            redis_client.set(f"{alert_id}:threat_intel", json.dumps(threat_intel))
+            redis_client.set(f"{alert_key}:threat_intel", json.dumps(threat_intel))
         
         # Step 3: Investigation
-        investigation = await call_investigation(alert, triage_result, threat_intel)
-        redis_client.set(f"{alert_id}:investigation", json.dumps(investigation))
+        investigation = await call_investigation(alert, triage_result, threat_intel, headers)
+        redis_client.set(f"{alert_key}:investigation", json.dumps(investigation))
         
         # Step 4: Remediation
-        remediation = await call_remediation(alert, investigation)
-        redis_client.set(f"{alert_id}:remediation", json.dumps(remediation))
-        
-        # Send notification
-        notification = f"""
-        New Security Alert Processed:
-        - Source: {alert.source}
-        - Type: {alert.event_type}
-        - Severity: {triage_result.severity}
-        - Category: {triage_result.category}
+        remediation = await call_remediation(alert, investigation, headers)
+        redis_client.set(f"{alert_key}:remediation", json.dumps(remediation))
         
-        Investigation Findings:
-        {investigation.get('summary', 'No summary available')}
+        redis_client.set(event_bus.status_key(alert_id), "completed")
         
-        Recommended Actions:
-        {remediation.get('recommended_actions', ['No actions recommended'])}
-        """
-        await send_notification(notification)
+        # Send notification
+        await notify_processed(alert, triage_result, investigation, headers)
         
         return {
             "alert_id": alert_id,
@@ -166,10 +246,7 @@ async def process_alert(
         
     except Exception as e:
         # Send notification about failure
-        await send_notification(
-            f"Error processing alert from {alert.source}: {str(e)}",
-            channels=["slack"]  # Only notify on Slack for errors
-        )
+        await notify_failure(alert, str(e), headers)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -184,20 +261,26 @@ async def get_alert_status(
     Get the status and results of a processed alert.
     """
     try:
-        # Get all components from memory
-        alert_data = redis_client.get(alert_id)
+        # Get all components from memory; ids are accepted with or without the alert: prefix
+        alert_id = alert_id.removeprefix("alert:")
+        alert_key = f"alert:{alert_id}"
+        alert_data = redis_client.get(alert_key)
         if not alert_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Alert not found"
             )
             
-        triage_data = redis_client.get(f"{alert_id}:triage")
-        threat_intel_data = redis_client.get(f"{alert_id}:threat_intel")
-        investigation_data = redis_client.get(f"{alert_id}:investigation")
-        remediation_data = redis_client.get(f"{alert_id}:remediation")
+        triage_data = redis_client.get(f"{alert_key}:triage")
+        threat_intel_data = redis_client.get(f"{alert_key}:threat_intel")
+        investigation_data = redis_client.get(f"{alert_key}:investigation")
+        remediation_data = redis_client.get(f"{alert_key}:remediation")
+        # The stage the alert is waiting for, completed or failed
+        alert_status = redis_client.get(event_bus.status_key(alert_id))
         
         return {
+            "status": alert_status,
+            "error": redis_client.get(f"{alert_key}:error"),
             "alert": json.loads(alert_data),
             "triage": json.loads(triage_data) if triage_data else None,
             "threat_intel": json.loads(threat_intel_data) if threat_intel_data else None,
@@ -211,6 +294,33 @@ async def get_alert_status(
             detail=str(e)
         )
 
+@app.get("/pipeline/stats")
+async def get_pipeline_stats(current_user: str = Depends(get_current_user)):
+    """
+    Get the event bus backlog, pending entries and lag of every stage.
+    """
+    try:
+        return await event_bus.stats()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+# Event bus: notify once the last stage has run, or an alert has been dead-lettered
+async def handle_completed_event(alert_id: str, event: Dict, token: Optional[str]) -> Dict:
+    alert = Alert(**event["alert"])
+    headers = {ALERT_ID_HEADER: alert_id}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    if "error" in event:
+        await notify_failure(alert, event["error"], headers)
+    else:
+        await notify_processed(alert, TriageResult(**event["triage"]), event["investigation"], headers)
+    return {}
+
+event_bus.setup_event_stage(app, event_bus.COMPLETED, handle_completed_event)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
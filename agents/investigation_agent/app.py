@@ -1,13 +1,23 @@
 from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 import os
 import redis
 import httpx
 from typing import List, Optional, Dict
 import json
+from mcp_common.auth import get_current_user, install_auth, oauth2_scheme
+from mcp_common.event_bus import setup_event_stage
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import ALERT_ID_HEADER, get_alert_id, setup_tracing
 
 app = FastAPI(title="Investigation Agent")
+install_auth(app)
+setup_tracing(app, "investigation-agent")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
 
 # Initialize Redis client
 redis_client = redis.Redis(
@@ -16,9 +26,6 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
-# OAuth2 scheme for JWT validation
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
-
 class Alert(BaseModel):
     source: str
     event_type: str
@@ -35,23 +42,22 @@ class InvestigationRequest(BaseModel):
     triage: TriageResult
     threat_intel: Optional[Dict] = None
 
+class RecommendedAction(BaseModel):
+    action: str  # action type, e.g. "block_ip"; the remediation agent dispatches on it
+    target: Optional[str] = None
+    indicator_type: Optional[str] = None
+    priority: str = "medium"  # high, medium or low
+    parameters: Dict = {}
+    description: str
+
 class InvestigationResult(BaseModel):
     summary: str
     findings: List[Dict]
     confidence: float
     recommended_actions: List[str]
+    action_plan: List[RecommendedAction] = []
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        # In a real implementation, validate JWT token
-        return "user"  # Simplified for demo
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
-
-async def query_llm_orchestrator(prompt: str) -> str:
+async def query_llm_orchestrator(prompt: str, headers: Optional[Dict] = None) -> str:
     """Query the LLM Orchestrator for analysis."""
     llm_url = os.getenv("LLM_ORCHESTRATOR_URL", "http://llm_orchestrator:8000")
     
@@ -59,7 +65,8 @@ async def query_llm_orchestrator(prompt: str) -> str:
         try:
             response = await client.post(
                 f"{llm_url}/ask",
-                json={"prompt": prompt}
+                json={"prompt": prompt},
+                headers=headers
             )
             if response.status_code == 200:
                 return response.json()["response"]
@@ -92,87 +99,136 @@ def analyze_indicators(indicators: List[dict], threat_intel: Optional[Dict] = No
     
     return findings
 
-def generate_recommended_actions(findings: List[Dict], severity: str) -> List[str]:
-    """Generate recommended actions based on findings and severity."""
+# Action used to contain a high-risk indicator of each type
+BLOCK_ACTIONS = {
+    "ip": "block_ip",
+    "domain": "block_domain",
+    "url": "block_url",
+    "hash": "block_hash",
+    "user": "reset_password"
+}
+
+def generate_recommended_actions(findings: List[Dict], severity: str, host: Optional[str] = None) -> List[RecommendedAction]:
+    """Generate an action plan based on findings and severity."""
     actions = []
     
     # Add severity-based actions
     if severity == "high":
-        actions.append("Escalate to security team immediately")
-        actions.append("Initiate incident response plan")
+        actions.append(RecommendedAction(action="escalate", priority="high",
+                                         description="Escalate to security team immediately"))
+        actions.append(RecommendedAction(action="incident_response", priority="high",
+                                         description="Initiate incident response plan"))
+        if host:
+            actions.append(RecommendedAction(action="isolate_host", target=host, indicator_type="host", priority="high",
+                                             description=f"Isolate host: {host}"))
     elif severity == "medium":
-        actions.append("Review and analyze in detail")
-        actions.append("Monitor for similar events")
+        actions.append(RecommendedAction(action="review", priority="medium",
+                                         description="Review and analyze in detail"))
+        actions.append(RecommendedAction(action="monitor_events", priority="medium",
+                                         description="Monitor for similar events"))
+        if host:
+            actions.append(RecommendedAction(action="run_scan", target=host, indicator_type="host", priority="medium",
+                                             description=f"Run security scan on host: {host}"))
     
     # Add indicator-based actions
     for finding in findings:
+        indicator = finding["indicator"]
         if finding["risk_level"] == "high":
-            actions.append(f"Block indicator: {finding['indicator']['value']}")
+            actions.append(RecommendedAction(
+                action=BLOCK_ACTIONS.get(indicator["type"], "block_indicator"),
+                target=indicator["value"],
+                indicator_type=indicator["type"],
+                priority="high",
+                description=f"Block indicator: {indicator['value']}"
+            ))
         elif finding["risk_level"] == "medium":
-            actions.append(f"Monitor indicator: {finding['indicator']['value']}")
+            actions.append(RecommendedAction(
+                action="monitor_indicator",
+                target=indicator["value"],
+                indicator_type=indicator["type"],
+                priority="medium",
+                description=f"Monitor indicator: {indicator['value']}"
+            ))
     
     # Add general actions
-    actions.append("Update security documentation")
-    actions.append("Review and update detection rules")
+    actions.append(RecommendedAction(action="update_documentation", priority="low",
+                                     description="Update security documentation"))
+    actions.append(RecommendedAction(action="update_detection_rules", priority="low",
+                                     description="Review and update detection rules"))
     
-    return list(set(actions))  # Remove duplicates
+    # Remove duplicates, keeping the first occurrence
+    unique = {}
+    for action in actions:
+        unique.setdefault((action.action, action.target), action)
+    return list(unique.values())
+
+async def investigate(request: InvestigationRequest, headers: Dict, alert_id: Optional[str] = None) -> InvestigationResult:
+    """Analyse an alert with the LLM and its indicators, plan the response and store the result."""
+    # Prepare data for LLM analysis
+    alert_data = request.alert.dict()
+    triage_data = request.triage.dict()
+    threat_intel_data = request.threat_intel or {}
+
+    # Create a prompt for the LLM
+    prompt = f"""
+    Analyze this security alert and provide a detailed investigation:
+
+    Alert: {json.dumps(alert_data)}
+    Triage: {json.dumps(triage_data)}
+    Threat Intelligence: {json.dumps(threat_intel_data)}
+
+    Provide a concise summary of the investigation findings.
+    """
+
+    # Get LLM analysis
+    llm_summary = await query_llm_orchestrator(prompt, headers)
+
+    # Analyze indicators
+    findings = analyze_indicators(request.triage.indicators, request.threat_intel)
+
+    # Generate the action plan
+    host = request.alert.details.get("host") or request.alert.details.get("hostname")
+    action_plan = generate_recommended_actions(findings, request.triage.severity, host)
+
+    # Calculate confidence based on available data
+    confidence = 0.7  # Base confidence
+    if request.threat_intel:
+        confidence += 0.2  # Increase confidence if threat intel is available
+    if len(findings) > 0:
+        confidence += 0.1  # Increase confidence if indicators were found
+
+    # Create investigation result
+    investigation_result = InvestigationResult(
+        summary=llm_summary,
+        findings=findings,
+        confidence=min(confidence, 1.0),  # Cap at 1.0
+        recommended_actions=[action.description for action in action_plan],
+        action_plan=action_plan
+    )
+
+    # Store in Redis for potential future reference
+    redis_client.set(
+        f"investigation:{alert_id or f'{request.alert.source}:{request.alert.timestamp}'}",
+        json.dumps(investigation_result.dict())
+    )
+
+    return investigation_result
 
 @app.post("/investigate", response_model=InvestigationResult)
 async def investigate_alert(
     request: InvestigationRequest,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_current_user),
+    alert_id: Optional[str] = Depends(get_alert_id),
+    token: str = Depends(oauth2_scheme)
 ):
     """
     Investigate a security alert with triage results and threat intelligence.
     """
     try:
-        # Prepare data for LLM analysis
-        alert_data = request.alert.dict()
-        triage_data = request.triage.dict()
-        threat_intel_data = request.threat_intel or {}
-        
-        # Create a prompt for the LLM
-        prompt = f"""
-        Analyze this security alert and provide a detailed investigation:
-        
-        Alert: {json.dumps(alert_data)}
-        Triage: {json.dumps(triage_data)}
-        Threat Intelligence: {json.dumps(threat_intel_data)}
-        
-        Provide a concise summary of the investigation findings.
-        """
-        
-        # Get LLM analysis
-        llm_summary = await query_llm_orchestrator(prompt)
-        
-        # Analyze indicators
-        findings = analyze_indicators(request.triage.indicators, request.threat_intel)
-        
-        # Generate recommended actions
-        recommended_actions = generate_recommended_actions(findings, request.triage.severity)
-        
-        # Calculate confidence based on available data
-        confidence = 0.7  # Base confidence
-        if request.threat_intel:
-            confidence += 0.2  # Increase confidence if threat intel is available
-        if len(findings) > 0:
-            confidence += 0.1  # Increase confidence if indicators were found
-        
-        # Create investigation result
-        investigation_result = InvestigationResult(
-            summary=llm_summary,
-            findings=findings,
-            confidence=min(confidence, 1.0),  # Cap at 1.0
-            recommended_actions=recommended_actions
-        )
-        
-        # Store in Redis for potential future reference
-        redis_client.set(
-            f"investigation:{request.alert.source}:{request.alert.timestamp}",
-            json.dumps(investigation_result.dict())
-        )
-        
-        return investigation_result
+        headers = {"Authorization": f"Bearer {token}"}
+        if alert_id:
+            headers[ALERT_ID_HEADER] = alert_id
+        return await investigate(request, headers, alert_id)
         
     except Exception as e:
         raise HTTPException(
@@ -180,6 +236,16 @@ async def investigate_alert(
             detail=str(e)
         )
 
+# Event bus stage
+async def handle_investigation_event(alert_id: str, event: Dict, token: Optional[str]) -> Dict:
+    request = InvestigationRequest(alert=event["alert"], triage=event["triage"], threat_intel=event.get("threat_intel"))
+    headers = {ALERT_ID_HEADER: alert_id}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return (await investigate(request, headers, alert_id)).dict()
+
+setup_event_stage(app, "investigation", handle_investigation_event)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
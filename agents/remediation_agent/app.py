@@ -1,15 +1,36 @@
 from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 import os
 import redis
 import httpx
-import paramiko
+import asyncssh
 import json
-from typing import List, Dict, Optional
+import asyncio
+import ipaddress
+import bisect
+import functools
+import hashlib
+import logging
+from typing import List, Dict, Optional, Callable, Tuple
 import time
+import uuid
+from mcp_common.auth import get_current_user, install_auth
+from mcp_common.event_bus import setup_event_stage
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import get_alert_id, setup_tracing, span
 
 app = FastAPI(title="Remediation Agent")
+install_auth(app)
+setup_tracing(app, "remediation-agent")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 # Initialize Redis client
 redis_client = redis.Redis(
@@ -18,20 +39,26 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
-# OAuth2 scheme for JWT validation
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
-
 class Alert(BaseModel):
     source: str
     event_type: str
     timestamp: float
     details: dict
 
+class RecommendedAction(BaseModel):
+    action: str
+    target: Optional[str] = None
+    indicator_type: Optional[str] = None
+    priority: str = "medium"
+    parameters: Dict = {}
+    description: str = ""
+
 class InvestigationResult(BaseModel):
     summary: str
     findings: List[Dict]
     confidence: float
     recommended_actions: List[str]
+    action_plan: List[RecommendedAction] = []
 
 class RemediationRequest(BaseModel):
     alert: Alert
@@ -43,18 +70,226 @@ class RemediationResult(BaseModel):
     message: str
     timestamp: float
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        # In a real implementation, validate JWT token
-        return "user"  # Simplified for demo
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
+# Firewall batching configuration
+FIREWALL_BATCH_WINDOW = float(os.getenv("FIREWALL_BATCH_WINDOW", "0.05"))  # seconds
+FIREWALL_BATCH_SIZE = int(os.getenv("FIREWALL_BATCH_SIZE", "500"))
+FIREWALL_BLOCKED_KEY = "firewall:blocked_at"  # sorted set of address -> time it was blocked
+FIREWALL_BLOCKED_TTL = int(os.getenv("FIREWALL_BLOCKED_TTL", "3600"))  # seconds a block is assumed to still be in place
+
+def aggregate_networks(ips: List[str]) -> List[str]:
+    """Collapse addresses into the smallest list of covering CIDR blocks."""
+    addresses = [ipaddress.ip_address(ip) for ip in ips]
+    networks = []
+    for version in (4, 6):
+        networks.extend(ipaddress.collapse_addresses(
+            ipaddress.ip_network(address) for address in addresses if address.version == version
+        ))
+    return [str(network) for network in networks]
+
+class BulkUnsupported(Exception):
+    """Raised when the firewall has no bulk block endpoint."""
+
+class FirewallBlocker:
+    """Batches IP blocks from concurrent remediations into bulk firewall requests.
+
+    Calls to block() made within FIREWALL_BATCH_WINDOW of each other are
+    collected, checked against the addresses blocked in the last
+    FIREWALL_BLOCKED_TTL seconds, collapsed
+    into CIDR blocks and submitted to {FIREWALL_API_URL}/block/bulk in chunks of
+    FIREWALL_BATCH_SIZE. Each caller gets the outcome for its own address.
+    Firewalls that answer the bulk endpoint with 404 or 405 get one
+    {FIREWALL_API_URL}/block request per address from then on.
+    """
+
+    def __init__(self, window: float = FIREWALL_BATCH_WINDOW, batch_size: int = FIREWALL_BATCH_SIZE,
+                 blocked_store: Optional[redis.Redis] = None, dedupe: bool = True,
+                 blocked_ttl: int = FIREWALL_BLOCKED_TTL):
+        self.window = window
+        self.batch_size = batch_size
+        self.blocked_store = blocked_store
+        self.dedupe = dedupe
+        self.blocked_ttl = blocked_ttl
+        self.bulk_supported = True
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: set = set()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _store(self) -> redis.Redis:
+        return self.blocked_store or redis_client
+
+    def _http_client(self) -> httpx.AsyncClient:
+        # One pooled client, so bulk requests reuse keep-alive connections
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=ACTION_TIMEOUT)
+        return self._client
+
+    async def block(self, ip: str) -> Dict:
+        future = self._pending.get(ip)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[ip] = future
+            if len(self._pending) >= self.batch_size:
+                self._schedule_flush(0)
+            elif self._flush_handle is None:
+                self._schedule_flush(self.window)
+        return dict(await asyncio.shield(future))
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        # Keep a reference until the flush is done, or the task could be collected mid-flight
+        task = asyncio.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """Submit everything collected so far."""
+        self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        try:
+            results = await self._submit(list(batch))
+        except Exception as e:
+            results = {ip: ("error", f"Error blocking IP: {str(e)}") for ip in batch}
+        for ip, future in batch.items():
+            if not future.done():
+                status, message = results[ip]
+                future.set_result({"action": "block_ip", "target": ip, "status": status, "message": message})
+
+    def _already_blocked(self, ips: List[str]) -> List[str]:
+        if not self.dedupe:
+            return []
+        try:
+            # Rules can be removed or expire on the firewall, so older blocks are submitted again
+            cutoff = time.time() - self.blocked_ttl
+            blocked_at = self._store().zmscore(FIREWALL_BLOCKED_KEY, ips)
+            return [ip for ip, score in zip(ips, blocked_at) if score is not None and score > cutoff]
+        except Exception as e:
+            logger.warning(f"Blocked address lookup failed, submitting all addresses: {str(e)}")
+            return []
+
+    async def _submit(self, ips: List[str]) -> Dict[str, Tuple[str, str]]:
+        results = {}
+
+        valid = []
+        for ip in ips:
+            try:
+                ipaddress.ip_address(ip)
+                valid.append(ip)
+            except ValueError:
+                results[ip] = ("failed", f"Invalid IP address: {ip}")
+
+        already_blocked = set(self._already_blocked(valid))
+        for ip in already_blocked:
+            results[ip] = ("success", "IP already blocked")
+        to_block = [ip for ip in valid if ip not in already_blocked]
+        if not to_block:
+            return results
+
+        if self.bulk_supported:
+            try:
+                results.update(await self._submit_bulk(to_block))
+            except BulkUnsupported:
+                logger.warning("Firewall has no bulk block endpoint, blocking addresses one at a time")
+                self.bulk_supported = False
+        if not self.bulk_supported:
+            results.update(await self._submit_each(to_block))
+
+        blocked = [ip for ip in to_block if results[ip][0] == "success"]
+        if blocked and self.dedupe:
+            try:
+                now = time.time()
+                pipe = self._store().pipeline()
+                pipe.zremrangebyscore(FIREWALL_BLOCKED_KEY, "-inf", now - self.blocked_ttl)
+                pipe.zadd(FIREWALL_BLOCKED_KEY, {ip: now for ip in blocked})
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to record blocked addresses: {str(e)}")
+        return results
+
+    async def _submit_bulk(self, ips: List[str]) -> Dict[str, Tuple[str, str]]:
+        """Block addresses as CIDR blocks through {FIREWALL_API_URL}/block/bulk."""
+        firewall_url = os.getenv("FIREWALL_API_URL")
+        firewall_key = os.getenv("FIREWALL_API_KEY")
+        networks = aggregate_networks(ips)
+        network_results = {}
+        client = self._http_client()
+        for offset in range(0, len(networks), self.batch_size):
+            chunk = networks[offset:offset + self.batch_size]
+            try:
+                response = await client.post(
+                    f"{firewall_url}/block/bulk",
+                    json={"ips": chunk},
+                    headers={"Authorization": f"Bearer {firewall_key}"}
+                )
+                if response.status_code in (404, 405) and offset == 0:
+                    raise BulkUnsupported()
+                if response.status_code == 200:
+                    failed = response.json().get("failed", {})
+                    for network in chunk:
+                        if network in failed:
+                            network_results[network] = ("failed", f"Failed to block IP: {failed[network]}")
+                        else:
+                            network_results[network] = ("success", f"IP blocked successfully as part of {network}")
+                else:
+                    for network in chunk:
+                        network_results[network] = ("failed", f"Failed to block IP: {response.text}")
+            except BulkUnsupported:
+                raise
+            except Exception as e:
+                for network in chunk:
+                    network_results[network] = ("error", f"Error blocking IP: {str(e)}")
+
+        # Fan results back out: find each address's covering block by binary search
+        # over the sorted, non-overlapping networks
+        starts = {4: [], 6: []}
+        names = {4: [], 6: []}
+        for network in networks:
+            parsed = ipaddress.ip_network(network)
+            starts[parsed.version].append(int(parsed.network_address))
+            names[parsed.version].append(network)
+        results = {}
+        for ip in ips:
+            address = ipaddress.ip_address(ip)
+            position = bisect.bisect_right(starts[address.version], int(address)) - 1
+            results[ip] = network_results[names[address.version][position]]
+        return results
+
+    async def _submit_each(self, ips: List[str]) -> Dict[str, Tuple[str, str]]:
+        """Block addresses one request each through {FIREWALL_API_URL}/block, for firewalls without bulk blocking."""
+        firewall_url = os.getenv("FIREWALL_API_URL")
+        firewall_key = os.getenv("FIREWALL_API_KEY")
+        client = self._http_client()
+
+        async def block_one(ip: str) -> Tuple[str, str]:
+            try:
+                response = await client.post(
+                    f"{firewall_url}/block",
+                    json={"ip": ip},
+                    headers={"Authorization": f"Bearer {firewall_key}"}
+                )
+                if response.status_code == 200:
+                    return "success", "IP blocked successfully"
+                return "failed", f"Failed to block IP: {response.text}"
+            except Exception as e:
+                return "error", f"Error blocking IP: {str(e)}"
+
+        return dict(zip(ips, await asyncio.gather(*(block_one(ip) for ip in ips))))
+
+    async def close(self):
+        await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+
+firewall_blocker = FirewallBlocker()
 
 async def block_ip_firewall(ip: str) -> Dict:
-    """Block an IP address in the firewall."""
+    """Block an IP address in the firewall, batched with concurrent blocks."""
     firewall_url = os.getenv("FIREWALL_API_URL")
     firewall_key = os.getenv("FIREWALL_API_KEY")
     
@@ -66,35 +301,7 @@ async def block_ip_firewall(ip: str) -> Dict:
             "message": "Firewall API not configured"
         }
     
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{firewall_url}/block",
-                json={"ip": ip},
-                headers={"Authorization": f"Bearer {firewall_key}"}
-            )
-            
-            if response.status_code == 200:
-                return {
-                    "action": "block_ip",
-                    "target": ip,
-                    "status": "success",
-                    "message": "IP blocked successfully"
-                }
-            else:
-                return {
-                    "action": "block_ip",
-                    "target": ip,
-                    "status": "failed",
-                    "message": f"Failed to block IP: {response.text}"
-                }
-    except Exception as e:
-        return {
-            "action": "block_ip",
-            "target": ip,
-            "status": "error",
-            "message": f"Error blocking IP: {str(e)}"
-        }
+    return await firewall_blocker.block(ip)
 
 async def block_domain_dns(domain: str) -> Dict:
     """Block a domain in DNS."""
@@ -140,13 +347,164 @@ async def run_scan(host: str) -> Dict:
         "message": "Security scan completed successfully (simulated)"
     }
 
-async def execute_ssh_command(host: str, command: str) -> Dict:
-    """Execute a command via SSH."""
+# SSH configuration
+SSH_PORT = int(os.getenv("SSH_PORT", "22"))
+SSH_KNOWN_HOSTS = os.getenv("SSH_KNOWN_HOSTS")  # path to a known_hosts file; unset uses ~/.ssh/known_hosts
+SSH_INSECURE_NO_HOST_KEY_CHECK = os.getenv("SSH_INSECURE_NO_HOST_KEY_CHECK", "false").lower() == "true"  # trusts any host key
+SSH_CONNECT_TIMEOUT = float(os.getenv("SSH_CONNECT_TIMEOUT", "10"))
+SSH_COMMAND_TIMEOUT = float(os.getenv("SSH_COMMAND_TIMEOUT", "25"))
+SSH_KEEPALIVE_INTERVAL = int(os.getenv("SSH_KEEPALIVE_INTERVAL", "30"))
+SSH_MAX_CHANNELS_PER_HOST = int(os.getenv("SSH_MAX_CHANNELS_PER_HOST", "8"))  # keep below sshd MaxSessions
+SSH_MAX_OUTPUT = int(os.getenv("SSH_MAX_OUTPUT", str(64 * 1024)))  # characters kept per stream
+SSH_READ_CHUNK = 8192
+
+class _PooledSSHClient(asyncssh.SSHClient):
+    """Drops a connection from the pool as soon as it is lost."""
+
+    def __init__(self, pool: "SSHConnectionPool", host: str):
+        self.pool = pool
+        self.host = host
+
+    def connection_made(self, conn: asyncssh.SSHClientConnection):
+        self.conn = conn
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.pool.discard(self.host, self.conn)
+
+class SSHConnectionPool:
+    """Keeps one keep-alive SSH connection per host and multiplexes commands over it.
+
+    Each command runs on its own channel of the host's connection, up to
+    SSH_MAX_CHANNELS_PER_HOST at once. Commands on different hosts run in
+    parallel. Output is read as it arrives and capped at SSH_MAX_OUTPUT per
+    stream, and every command has a timeout. Host keys are checked against
+    known_hosts unless check_host_keys is False.
+    """
+
+    def __init__(self, username: Optional[str] = None, key_path: Optional[str] = None, port: int = SSH_PORT,
+                 known_hosts: Optional[str] = SSH_KNOWN_HOSTS, max_channels: int = SSH_MAX_CHANNELS_PER_HOST,
+                 check_host_keys: bool = not SSH_INSECURE_NO_HOST_KEY_CHECK):
+        self.username = username
+        self.key_path = key_path
+        self.port = port
+        self.known_hosts = known_hosts
+        self.check_host_keys = check_host_keys
+        self.max_channels = max_channels
+        self._connections: Dict[str, asyncssh.SSHClientConnection] = {}
+        self._connect_locks: Dict[str, asyncio.Lock] = {}
+        self._channels: Dict[str, asyncio.Semaphore] = {}
+
+    def discard(self, host: str, conn: asyncssh.SSHClientConnection):
+        if self._connections.get(host) is conn:
+            del self._connections[host]
+
+    async def _connection(self, host: str) -> asyncssh.SSHClientConnection:
+        conn = self._connections.get(host)
+        if conn is not None:
+            return conn
+        async with self._connect_locks.setdefault(host, asyncio.Lock()):
+            conn = self._connections.get(host)
+            if conn is None:
+                # Without a known_hosts option asyncssh checks ~/.ssh/known_hosts; None disables checking
+                host_keys = {}
+                if not self.check_host_keys:
+                    host_keys["known_hosts"] = None
+                elif self.known_hosts:
+                    host_keys["known_hosts"] = self.known_hosts
+                conn, _ = await asyncio.wait_for(
+                    asyncssh.create_connection(
+                        lambda: _PooledSSHClient(self, host),
+                        host,
+                        port=self.port,
+                        username=self.username or os.getenv("SSH_USER"),
+                        client_keys=[self.key_path or os.getenv("SSH_KEY")],
+                        keepalive_interval=SSH_KEEPALIVE_INTERVAL,
+                        **host_keys
+                    ),
+                    timeout=SSH_CONNECT_TIMEOUT
+                )
+                self._connections[host] = conn
+            return conn
+
+    @staticmethod
+    async def _capture(stream, limit: int) -> Tuple[str, bool]:
+        """Read a stream to EOF, keeping at most limit characters.
+
+        Output past the limit is still drained so the remote side never blocks
+        on a full channel window.
+        """
+        chunks = []
+        kept = 0
+        truncated = False
+        while True:
+            chunk = await stream.read(SSH_READ_CHUNK)
+            if not chunk:
+                return "".join(chunks), truncated
+            room = limit - kept
+            if len(chunk) > room:
+                truncated = True
+                chunk = chunk[:room]
+            if chunk:
+                chunks.append(chunk)
+                kept += len(chunk)
+
+    async def run(self, host: str, command: str, timeout: float = SSH_COMMAND_TIMEOUT,
+                  max_output: int = SSH_MAX_OUTPUT) -> Dict:
+        """Run a command on a host. Returns exit status, captured output and truncation flags."""
+        channels = self._channels.setdefault(host, asyncio.Semaphore(self.max_channels))
+        async with channels:
+            for attempt in range(2):
+                conn = await self._connection(host)
+                try:
+                    process = await conn.create_process(command)
+                    break
+                except (asyncssh.ChannelOpenError, asyncssh.ConnectionLost, BrokenPipeError):
+                    # Stale pooled connection; reconnect once
+                    self.discard(host, conn)
+                    conn.close()
+                    if attempt:
+                        raise
+            try:
+                # process.wait() would buffer all output itself, so read the streams and wait for close
+                (stdout, stdout_truncated), (stderr, stderr_truncated), _ = await asyncio.wait_for(
+                    asyncio.gather(
+                        self._capture(process.stdout, max_output),
+                        self._capture(process.stderr, max_output),
+                        process.wait_closed()
+                    ),
+                    timeout=timeout
+                )
+            finally:
+                process.close()
+        return {
+            "exit_status": process.exit_status,
+            "stdout": stdout,
+            "stderr": stderr,
+            "stdout_truncated": stdout_truncated,
+            "stderr_truncated": stderr_truncated
+        }
+
+    async def run_many(self, hosts: List[str], command: str, timeout: float = SSH_COMMAND_TIMEOUT) -> List[Dict]:
+        """Run the same command on many hosts in parallel."""
+        return await asyncio.gather(*(execute_ssh_command(host, command, timeout, pool=self) for host in hosts))
+
+    async def close(self):
+        connections = list(self._connections.values())
+        self._connections.clear()
+        for conn in connections:
+            conn.close()
+        await asyncio.gather(*(conn.wait_closed() for conn in connections), return_exceptions=True)
+
+ssh_pool = SSHConnectionPool()
+
+async def execute_ssh_command(host: str, command: str, timeout: float = SSH_COMMAND_TIMEOUT,
+                              pool: Optional[SSHConnectionPool] = None) -> Dict:
+    """Execute a command via SSH over a pooled connection."""
     ssh_host = os.getenv("SSH_HOST")
     ssh_user = os.getenv("SSH_USER")
     ssh_key = os.getenv("SSH_KEY")
     
-    if not all([ssh_host, ssh_user, ssh_key]):
+    if pool is None and not all([ssh_host, ssh_user, ssh_key]):
         return {
             "action": "ssh_command",
             "target": host,
@@ -155,37 +513,32 @@ async def execute_ssh_command(host: str, command: str) -> Dict:
         }
     
     try:
-        # Create SSH client
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        # Connect to the host
-        ssh.connect(host, username=ssh_user, key_filename=ssh_key)
-        
-        # Execute the command
-        stdin, stdout, stderr = ssh.exec_command(command)
+        with span("ssh.run", host=host):
+            result = await (pool or ssh_pool).run(host, command, timeout)
         
-        # Get the output
-        output = stdout.read().decode()
-        error = stderr.read().decode()
-        
-        # Close the connection
-        ssh.close()
-        
-        if error:
+        if result["exit_status"] != 0:
             return {
                 "action": "ssh_command",
                 "target": host,
                 "status": "failed",
-                "message": f"Command failed: {error}"
+                "message": f"Command failed with exit status {result['exit_status']}: {result['stderr']}",
+                **result
             }
         else:
             return {
                 "action": "ssh_command",
                 "target": host,
                 "status": "success",
-                "message": f"Command executed successfully: {output}"
+                "message": f"Command executed successfully: {result['stdout']}",
+                **result
             }
+    except asyncio.TimeoutError:
+        return {
+            "action": "ssh_command",
+            "target": host,
+            "status": "error",
+            "message": f"SSH command timed out after {timeout}s"
+        }
     except Exception as e:
         return {
             "action": "ssh_command",
@@ -194,96 +547,435 @@ async def execute_ssh_command(host: str, command: str) -> Dict:
             "message": f"SSH error: {str(e)}"
         }
 
+# Action executor configuration
+ACTION_TIMEOUT = float(os.getenv("ACTION_TIMEOUT", "30"))
+DEFAULT_ACTION_CONCURRENCY = 5
+
+# Maximum number of actions of each type running at once, overridable with
+# e.g. BLOCK_IP_CONCURRENCY=50
+ACTION_CONCURRENCY = {
+    "block_ip": 1000,  # batched into bulk firewall requests by FirewallBlocker
+    "block_domain": 20,
+    "isolate_host": 10,
+    "reset_password": 5,
+    "run_scan": 4,
+    "ssh_command": 10
+}
+
+# Remediation ledger configuration
+LEDGER_TTL = int(os.getenv("REMEDIATION_LEDGER_TTL", "86400"))  # how long an applied action suppresses repeats
+LEDGER_LEASE = int(os.getenv("REMEDIATION_LEDGER_LEASE", str(int(ACTION_TIMEOUT) + 10)))  # in-progress claim expiry
+LEDGER_POLL_INTERVAL = float(os.getenv("REMEDIATION_LEDGER_POLL_INTERVAL", "0.1"))
+LEDGER_AUDIT_MAX = int(os.getenv("REMEDIATION_LEDGER_AUDIT_MAX", "10000"))
+LEDGER_AUDIT_KEY = "remediation:ledger:audit"
+LEDGER_STATS_KEY = "remediation:ledger:stats"
+
+class RemediationLedger:
+    """Records which (action, target) pairs have been applied so duplicates are not re-run.
+
+    Each pair has one key, remediation:ledger:{action}:{target}, so checking it
+    is a single Redis lookup. Actions with parameters, such as the command of
+    an ssh_command, add a hash of the parameters to the key so that different
+    commands on the same host are different pairs. Before dispatch an action claims its key with
+    SET NX and an in-progress lease; on success the entry is kept for
+    LEDGER_TTL, on failure it is removed so the action can be retried.
+    Duplicates of an applied action are suppressed, duplicates of an
+    in-flight action wait for it and share its outcome. Every outcome is
+    appended to an audit list and counted in a stats hash.
+    """
+
+    def __init__(self, store: Optional[redis.Redis] = None, ttl: int = LEDGER_TTL, lease: int = LEDGER_LEASE,
+                 poll_interval: float = LEDGER_POLL_INTERVAL):
+        self.store = store
+        self.ttl = ttl
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}  # ledger key -> outcome of the local run
+
+    def _store(self) -> redis.Redis:
+        return self.store or redis_client
+
+    @staticmethod
+    def key(action_type: str, target: str, parameters: Optional[Dict] = None) -> str:
+        if not parameters:
+            return f"remediation:ledger:{action_type}:{target}"
+        canonical = json.dumps(parameters, sort_keys=True, separators=(",", ":"), default=str)
+        return f"remediation:ledger:{action_type}:{target}:{hashlib.sha256(canonical.encode()).hexdigest()[:16]}"
+
+    def get(self, action_type: str, target: str, parameters: Optional[Dict] = None) -> Optional[Dict]:
+        entry = self._store().get(self.key(action_type, target, parameters))
+        return json.loads(entry) if entry else None
+
+    def _claim(self, action_type: str, target: str, alert_id: Optional[str],
+               parameters: Optional[Dict] = None) -> Tuple[Optional[str], Optional[Dict]]:
+        """Try to take ownership of a pair. Returns (claim, None) if claimed, else (None, existing entry)."""
+        claim = json.dumps({
+            "action": action_type,
+            "target": target,
+            "parameters": parameters or {},
+            "status": "in_progress",
+            "owner": uuid.uuid4().hex,
+            "alert_id": alert_id,
+            "started_at": time.time()
+        })
+        if self._store().set(self.key(action_type, target, parameters), claim, nx=True, ex=self.lease):
+            return claim, None
+        entry = self.get(action_type, target, parameters)
+        if entry is None:
+            # Expired or released between the two calls
+            return self._claim(action_type, target, alert_id, parameters)
+        return None, entry
+
+    def _release(self, action_type: str, target: str, claim: str, result: Dict, parameters: Optional[Dict] = None):
+        """Keep the entry if the action was applied, drop it otherwise so it can be retried."""
+        key = self.key(action_type, target, parameters)
+        store = self._store()
+        if store.get(key) != claim:
+            # Our lease expired and someone else owns the pair now
+            return
+        if result.get("status") == "success":
+            entry = {**json.loads(claim), "status": "applied", "completed_at": time.time(),
+                     "result": {k: v for k, v in result.items() if k != "ledger"}}
+            store.set(key, json.dumps(entry), ex=self.ttl)
+        else:
+            store.delete(key)
+
+    def _record(self, action_type: str, target: str, outcome: str, status: str, alert_id: Optional[str]):
+        try:
+            pipe = self._store().pipeline()
+            pipe.lpush(LEDGER_AUDIT_KEY, json.dumps({
+                "action": action_type,
+                "target": target,
+                "outcome": outcome,
+                "status": status,
+                "alert_id": alert_id,
+                "timestamp": time.time()
+            }))
+            pipe.ltrim(LEDGER_AUDIT_KEY, 0, LEDGER_AUDIT_MAX - 1)
+            pipe.hincrby(LEDGER_STATS_KEY, f"{outcome}:{action_type}", 1)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record ledger audit entry: {str(e)}")
+
+    @staticmethod
+    def _suppressed(result: Dict, reason: str) -> Dict:
+        return {**result, "suppressed": reason}
+
+    async def apply(self, action_type: str, target: str, execute: Callable, alert_id: Optional[str] = None,
+                    parameters: Optional[Dict] = None) -> Dict:
+        """Run execute() unless the pair was already applied or is being applied elsewhere."""
+        pair = self.key(action_type, target, parameters)
+        while True:
+            inflight = self._inflight.get(pair)
+            if inflight is not None:
+                result = await asyncio.shield(inflight)
+                self._record(action_type, target, "coalesced", result.get("status"), alert_id)
+                return self._suppressed(result, "in_flight")
+
+            try:
+                claim, entry = self._claim(action_type, target, alert_id, parameters)
+            except Exception as e:
+                # The ledger is an optimization; never block remediation on it
+                logger.warning(f"Remediation ledger unavailable, running {action_type} on {target}: {str(e)}")
+                return await execute()
+
+            if claim is not None:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[pair] = future
+                result = {"action": action_type, "target": target, "status": "error", "message": "Action cancelled"}
+                try:
+                    result = await execute()
+                    return result
+                finally:
+                    del self._inflight[pair]
+                    future.set_result(result)
+                    try:
+                        self._release(action_type, target, claim, result, parameters)
+                    except Exception as e:
+                        logger.warning(f"Failed to update remediation ledger: {str(e)}")
+                    self._record(action_type, target, "executed", result.get("status"), alert_id)
+
+            if entry["status"] == "applied":
+                self._record(action_type, target, "suppressed", "success", alert_id)
+                return self._suppressed({
+                    **entry["result"],
+                    "message": f"Already applied at {entry['completed_at']}: {entry['result'].get('message', '')}"
+                }, "applied")
+
+            # Another worker holds the claim; wait until it finishes or its lease expires
+            await asyncio.sleep(self.poll_interval)
+
+    def audit(self, limit: int = 100) -> List[Dict]:
+        return [json.loads(entry) for entry in self._store().lrange(LEDGER_AUDIT_KEY, 0, limit - 1)]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Counts of executed, suppressed and coalesced actions by action type."""
+        stats = {"executed": {}, "suppressed": {}, "coalesced": {}}
+        for field, count in self._store().hgetall(LEDGER_STATS_KEY).items():
+            outcome, _, action_type = field.partition(":")
+            stats.setdefault(outcome, {})[action_type] = int(count)
+        return stats
+
+remediation_ledger = RemediationLedger()
+
+class ActionExecutor:
+    """Runs remediation actions concurrently.
+
+    Parallelism is bounded per action type, actions on the same target run one
+    at a time in submission order, and every action gets a timeout. Each result
+    is annotated with when it started and how long it took.
+    """
+
+    def __init__(self, timeout: float = ACTION_TIMEOUT, ledger: Optional[RemediationLedger] = None):
+        self.timeout = timeout
+        self.ledger = ledger
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._target_locks: Dict[str, List] = {}  # target -> [lock, users]
+
+    def _semaphore(self, action_type: str) -> asyncio.Semaphore:
+        if action_type not in self._semaphores:
+            limit = int(os.getenv(
+                f"{action_type.upper()}_CONCURRENCY",
+                ACTION_CONCURRENCY.get(action_type, DEFAULT_ACTION_CONCURRENCY)
+            ))
+            self._semaphores[action_type] = asyncio.Semaphore(limit)
+        return self._semaphores[action_type]
+
+    async def run(self, action_type: str, target: str, func: Callable, *args, alert_id: Optional[str] = None,
+                  parameters: Optional[Dict] = None) -> Dict:
+        """Run one action, skipping it if the ledger shows it was already applied with the same parameters."""
+        if self.ledger is None:
+            return await self._execute(action_type, target, func, args)
+        return await self.ledger.apply(
+            action_type, target, lambda: self._execute(action_type, target, func, args), alert_id, parameters
+        )
+
+    async def _execute(self, action_type: str, target: str, func: Callable, args: tuple) -> Dict:
+        """Run one action, waiting for earlier actions on the same target."""
+        entry = self._target_locks.setdefault(target, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._semaphore(action_type):
+                started_at = time.time()
+                start = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(func(*args), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    result = {
+                        "action": action_type,
+                        "target": target,
+                        "status": "error",
+                        "message": f"Action timed out after {self.timeout}s"
+                    }
+                except Exception as e:
+                    result = {
+                        "action": action_type,
+                        "target": target,
+                        "status": "error",
+                        "message": f"Action failed: {str(e)}"
+                    }
+                result["started_at"] = started_at
+                result["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                return result
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._target_locks[target]
+
+    async def run_all(self, actions: List[Tuple[str, str, Callable, tuple, Dict]],
+                      alert_id: Optional[str] = None) -> List[Dict]:
+        """Run (action_type, target, func, args, parameters) tuples, returning results in the same order."""
+        return await asyncio.gather(*(
+            self.run(action_type, target, func, *args, alert_id=alert_id, parameters=parameters)
+            for action_type, target, func, args, parameters in actions
+        ))
+
+action_executor = ActionExecutor(ledger=remediation_ledger)
+
+# Handlers for each action type in an investigation's action plan. Each is
+# called with the action's target and its parameters as keyword arguments.
+ACTION_HANDLERS: Dict[str, Callable] = {
+    "block_ip": block_ip_firewall,
+    "block_domain": block_domain_dns,
+    "isolate_host": isolate_host,
+    "reset_password": reset_password,
+    "run_scan": run_scan,
+    "ssh_command": execute_ssh_command
+}
+
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+def plan_actions(action_plan: List[Dict]) -> Tuple[List[Tuple[int, RecommendedAction, tuple]], Dict[int, Dict]]:
+    """Match each action in a plan to its handler.
+
+    Returns the runnable actions as (position, action, executor tuple), high
+    priority first, and the results of skipped actions keyed by position.
+    """
+    planned_actions = []
+    skipped_actions = {}
+    for position, item in enumerate(action_plan):
+        try:
+            action = RecommendedAction(**item)
+        except Exception as e:
+            skipped_actions[position] = {"action": "unknown", "status": "skipped", "message": f"Invalid action: {str(e)}"}
+            continue
+        
+        handler = ACTION_HANDLERS.get(action.action)
+        if handler is None:
+            skipped_actions[position] = {
+                "action": action.action,
+                "target": action.target,
+                "status": "skipped",
+                "message": "No automated handler for this action"
+            }
+        elif not action.target:
+            skipped_actions[position] = {
+                "action": action.action,
+                "status": "skipped",
+                "message": "Action has no target"
+            }
+        else:
+            func = functools.partial(handler, **action.parameters) if action.parameters else handler
+            planned_actions.append(
+                (position, action, (action.action, action.target, func, (action.target,), action.parameters))
+            )
+    
+    # Start high-priority actions first so they are ahead in each type's queue
+    planned_actions.sort(key=lambda planned: PRIORITY_ORDER.get(planned[1].priority, len(PRIORITY_ORDER)))
+    return planned_actions, skipped_actions
+
+async def remediate(request: RemediationRequest, alert_id: Optional[str] = None) -> RemediationResult:
+    """Run the investigation's action plan and store the result."""
+    # Look up the handler for each action in the investigation's plan
+    action_plan = request.investigation.get("action_plan", [])
+    planned_actions, skipped_actions = plan_actions(action_plan)
+
+    # Run independent actions concurrently; results keep the recommendation order
+    alert_id = alert_id or f"{request.alert.source}:{request.alert.timestamp}"
+    results = await action_executor.run_all([planned for _, _, planned in planned_actions], alert_id=alert_id)
+    results_by_position = dict(zip([position for position, _, _ in planned_actions], results))
+    results_by_position.update(skipped_actions)
+    actions_taken = [results_by_position[position] for position in range(len(action_plan))]
+
+    # Determine overall status
+    if not actions_taken:
+        status = "skipped"
+        message = "No remediation actions were taken"
+    elif all(a["status"] == "success" for a in actions_taken):
+        status = "success"
+        message = "All remediation actions completed successfully"
+    elif any(a["status"] == "error" for a in actions_taken):
+        status = "error"
+        message = "Some remediation actions failed with errors"
+    else:
+        status = "partial"
+        message = "Some remediation actions were skipped or failed"
+
+    # Create remediation result
+    result = RemediationResult(
+        actions_taken=actions_taken,
+        status=status,
+        message=message,
+        timestamp=time.time()
+    )
+
+    # Store in Redis for potential future reference
+    redis_client.set(
+        f"remediation:{alert_id}",
+        json.dumps(result.dict())
+    )
+
+    return result
+
 @app.post("/remediate", response_model=RemediationResult)
 async def remediate_alert(
     request: RemediationRequest,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_current_user),
+    alert_id: Optional[str] = Depends(get_alert_id)
 ):
     """
     Remediate a security alert based on investigation results.
     """
     try:
-        actions_taken = []
-        
-        # Extract recommended actions from investigation
-        recommended_actions = request.investigation.get("recommended_actions", [])
-        
-        # Process each recommended action
-        for action in recommended_actions:
-            action_result = {"action": "unknown", "status": "skipped", "message": "Action not implemented"}
-            
-            # Block IP action
-            if action.startswith("Block indicator: ") and "ip" in action.lower():
-                ip = action.split(": ")[1]
-                action_result = await block_ip_firewall(ip)
-            
-            # Block domain action
-            elif action.startswith("Block indicator: ") and "domain" in action.lower():
-                domain = action.split(": ")[1]
-                action_result = await block_domain_dns(domain)
-            
-            # Isolate host action
-            elif "isolate" in action.lower() and "host" in action.lower():
-                # Extract host from the action or use a default
-                host = "target-host"  # In a real implementation, extract from action or alert
-                action_result = await isolate_host(host)
-            
-            # Reset password action
-            elif "reset" in action.lower() and "password" in action.lower():
-                # Extract username from the action or use a default
-                username = "target-user"  # In a real implementation, extract from action or alert
-                action_result = await reset_password(username)
-            
-            # Run scan action
-            elif "scan" in action.lower():
-                # Extract host from the action or use a default
-                host = "target-host"  # In a real implementation, extract from action or alert
-                action_result = await run_scan(host)
-            
-            # Generic command execution
-            elif "execute" in action.lower() and "command" in action.lower():
-                # Extract command from the action or use a default
-                command = "ls -la"  # In a real implementation, extract from action
-                host = "target-host"  # In a real implementation, extract from alert
-                action_result = await execute_ssh_command(host, command)
-            
-            actions_taken.append(action_result)
+        return await remediate(request, alert_id)
         
-        # Determine overall status
-        if not actions_taken:
-            status = "skipped"
-            message = "No remediation actions were taken"
-        elif all(a["status"] == "success" for a in actions_taken):
-            status = "success"
-            message = "All remediation actions completed successfully"
-        elif any(a["status"] == "error" for a in actions_taken):
-            status = "error"
-            message = "Some remediation actions failed with errors"
-        else:
-            status = "partial"
-            message = "Some remediation actions were skipped or failed"
-        
-        # Create remediation result
-        result = RemediationResult(
-            actions_taken=actions_taken,
-            status=status,
-            message=message,
-            timestamp=time.time()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
         )
-        
-        # Store in Redis for potential future reference
-        redis_client.set(
-            f"remediation:{request.alert.source}:{request.alert.timestamp}",
-            json.dumps(result.dict())
+
+# Event bus stage
+async def handle_remediation_event(alert_id: str, event: Dict, token: Optional[str]) -> Dict:
+    request = RemediationRequest(alert=event["alert"], investigation=event["investigation"])
+    return (await remediate(request, alert_id)).dict()
+
+setup_event_stage(app, "remediation", handle_remediation_event)
+
+@app.get("/ledger")
+async def get_ledger_audit(
+    limit: int = 100,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Get the most recent remediation ledger outcomes, newest first.
+    """
+    try:
+        return {"entries": remediation_ledger.audit(limit)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
         )
-        
-        return result
-        
+
+@app.get("/ledger/stats")
+async def get_ledger_stats(current_user: str = Depends(get_current_user)):
+    """
+    Get counts of executed, suppressed and coalesced actions by action type.
+    """
+    try:
+        return remediation_ledger.stats()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@app.get("/ledger/{action_type}/{target}")
+async def get_ledger_entry(
+    action_type: str,
+    target: str,
+    parameters: Optional[str] = None,
+    current_user: str = Depends(get_current_user)
+):
+    """
+    Get the ledger entry for an action on a target. For actions with
+    parameters, pass them JSON-encoded in parameters.
+    """
+    try:
+        entry = remediation_ledger.get(action_type, target, json.loads(parameters) if parameters else None)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No ledger entry for {action_type} on {target}"
+        )
+    return entry
+
+@app.on_event("startup")
+async def warn_insecure_settings():
+    if not ssh_pool.check_host_keys:
+        logger.warning("SSH_INSECURE_NO_HOST_KEY_CHECK is set: SSH host keys are not verified, "
+                       "so remediation commands can be sent to an impersonated host")
+
+@app.on_event("shutdown")
+async def close_clients():
+    await firewall_blocker.close()
+    await ssh_pool.close()
 
 if __name__ == "__main__":
     import uvicorn
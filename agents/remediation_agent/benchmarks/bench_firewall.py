@@ -0,0 +1,151 @@
+"""
+Benchmark IP blocking throughput against the local mock firewall.
+
+Compares the previous one-request-per-address blocking with FirewallBlocker,
+which batches concurrent blocks and collapses adjacent addresses into CIDR
+blocks. The mock firewall is started as a subprocess on a free port.
+
+Usage:
+    python benchmarks/bench_firewall.py [--ips 2000] [--concurrency 200] [--latency-ms 20] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(SERVICE_DIR))
+sys.path.append(SERVICE_DIR)
+sys.path.append(REPO_ROOT)  # for mcp_common
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_mock_firewall(port: int, latency_ms: float) -> subprocess.Popen:
+    """Run the mock firewall in its own process so it does not share our event loop or GIL."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "mock_firewall:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=SERVICE_DIR,
+        env={**os.environ, "MOCK_FIREWALL_LATENCY_MS": str(latency_ms)}
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Mock firewall did not start")
+
+def generate_ips(count: int, rng: random.Random) -> list:
+    """Half scattered addresses, half clustered in a few /24s as in a scanning campaign."""
+    scattered = {f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+                 for _ in range(count // 2)}
+    clustered = {f"185.220.{rng.randint(100, 103)}.{rng.randint(0, 255)}" for _ in range(count - len(scattered))}
+    ips = list(scattered | clustered)
+    rng.shuffle(ips)
+    return ips
+
+async def legacy_block(url: str, key: str, ip: str) -> bool:
+    """The pre-batching implementation: a fresh client and one request per address."""
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(f"{url}/block", json={"ip": ip}, headers={"Authorization": f"Bearer {key}"})
+            return response.status_code == 200
+    except Exception:
+        return False
+
+async def run_concurrently(ips: list, concurrency: int, block) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(ip):
+        async with semaphore:
+            return await block(ip)
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(one(ip) for ip in ips))
+    return time.perf_counter() - start, outcomes
+
+async def firewall_stats(url: str, reset: bool = False) -> dict:
+    async with httpx.AsyncClient() as client:
+        stats = (await client.get(f"{url}/stats")).json()
+        if reset:
+            await client.post(f"{url}/reset")
+        return stats
+
+async def bench(args) -> dict:
+    from app import FirewallBlocker
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    url = os.environ["FIREWALL_API_URL"]
+    key = os.environ["FIREWALL_API_KEY"]
+    ips = generate_ips(args.ips, random.Random(42))
+    report = {"ips": len(ips), "concurrency": args.concurrency, "latency_ms": args.latency_ms, "results": []}
+
+    elapsed, outcomes = await run_concurrently(ips, args.concurrency, lambda ip: legacy_block(url, key, ip))
+    stats = await firewall_stats(url, reset=True)
+    report["results"].append({
+        "mode": "per-address (legacy)",
+        "seconds": elapsed,
+        "blocks_per_second": len(ips) / elapsed,
+        "requests": stats["requests"],
+        "firewall_entries": stats["entries"],
+        "succeeded": sum(outcomes)
+    })
+
+    blocker = FirewallBlocker(dedupe=False)
+    elapsed, outcomes = await run_concurrently(ips, args.concurrency, blocker.block)
+    await blocker.close()
+    stats = await firewall_stats(url, reset=True)
+    report["results"].append({
+        "mode": "batched + CIDR",
+        "seconds": elapsed,
+        "blocks_per_second": len(ips) / elapsed,
+        "requests": stats["requests"],
+        "firewall_entries": stats["entries"],
+        "succeeded": sum(1 for outcome in outcomes if outcome["status"] == "success")
+    })
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ips", type=int, default=2000, help="addresses to block")
+    parser.add_argument("--concurrency", type=int, default=200, help="concurrent block calls")
+    parser.add_argument("--latency-ms", type=float, default=20, help="mock firewall latency per request")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    port = free_port()
+    os.environ["FIREWALL_API_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["FIREWALL_API_KEY"] = "benchmark"
+    server = start_mock_firewall(port, args.latency_ms)
+    try:
+        report = asyncio.run(bench(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['ips']} addresses, concurrency {report['concurrency']}, firewall latency {report['latency_ms']} ms")
+    print(f"{'mode':<24}{'seconds':>10}{'blocks/s':>12}{'requests':>10}{'entries':>10}{'ok':>8}")
+    for row in report["results"]:
+        print(f"{row['mode']:<24}{row['seconds']:>10.2f}{row['blocks_per_second']:>12.0f}"
+              f"{row['requests']:>10}{row['firewall_entries']:>10}{row['succeeded']:>8}")
+
+if __name__ == "__main__":
+    main()
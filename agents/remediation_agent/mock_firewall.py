@@ -0,0 +1,69 @@
+"""
+Local mock of the firewall API used by the remediation agent.
+
+Implements the single-address and bulk block endpoints with a configurable
+per-request latency, and counts what it receives so benchmarks can report
+requests sent and addresses blocked.
+
+Usage:
+    MOCK_FIREWALL_LATENCY_MS=20 uvicorn mock_firewall:app --port 9000
+"""
+from fastapi import FastAPI, Header, HTTPException, status
+from pydantic import BaseModel
+import asyncio
+import ipaddress
+import os
+from typing import List, Optional
+
+app = FastAPI(title="Mock Firewall API")
+
+LATENCY = float(os.getenv("MOCK_FIREWALL_LATENCY_MS", "20")) / 1000
+
+stats = {"requests": 0, "bulk_requests": 0, "entries": 0}
+blocked = set()
+
+class BlockRequest(BaseModel):
+    ip: str
+
+class BulkBlockRequest(BaseModel):
+    ips: List[str]
+
+def check_auth(authorization: Optional[str]):
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing API key")
+
+@app.post("/block")
+async def block(request: BlockRequest, authorization: Optional[str] = Header(None)):
+    check_auth(authorization)
+    await asyncio.sleep(LATENCY)
+    stats["requests"] += 1
+    stats["entries"] += 1
+    blocked.add(request.ip)
+    return {"blocked": [request.ip]}
+
+@app.post("/block/bulk")
+async def block_bulk(request: BulkBlockRequest, authorization: Optional[str] = Header(None)):
+    check_auth(authorization)
+    await asyncio.sleep(LATENCY)
+    stats["requests"] += 1
+    stats["bulk_requests"] += 1
+    failed = {}
+    for entry in request.ips:
+        try:
+            ipaddress.ip_network(entry)
+        except ValueError:
+            failed[entry] = "invalid address"
+            continue
+        stats["entries"] += 1
+        blocked.add(entry)
+    return {"blocked": [entry for entry in request.ips if entry not in failed], "failed": failed}
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "blocked": len(blocked)}
+
+@app.post("/reset")
+async def reset():
+    stats.update(requests=0, bulk_requests=0, entries=0)
+    blocked.clear()
+    return {"status": "reset"}
@@ -0,0 +1,97 @@
+import pytest
+import os
+import sys
+
+# Add the parent directory to the path so we can import the app, and the
+# repository root for the shared mcp_common package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+
+os.environ.setdefault("MEMORY_URL", "redis://localhost:6379")
+
+class MockRedis:
+    """In-memory stand-in for the subset of redis-py the agent uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.lists = {}
+        self.hashes = {}
+        self.sets = {}
+        self.zsets = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, xx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        if xx and key not in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def lpush(self, key, *values):
+        self.lists.setdefault(key, [])[:0] = reversed(values)
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:end + 1]
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:end + 1]
+
+    def hincrby(self, key, field, amount=1):
+        fields = self.hashes.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    def smismember(self, key, members):
+        return [int(member in self.sets.get(key, set())) for member in members]
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zmscore(self, key, members):
+        return [self.zsets.get(key, {}).get(member) for member in members]
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    def pipeline(self):
+        return MockPipeline(self)
+
+class MockPipeline:
+    def __init__(self, store):
+        self.store = store
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        return [getattr(self.store, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+@pytest.fixture
+def store(monkeypatch):
+    store = MockRedis()
+    monkeypatch.setattr("app.redis_client", store)
+    return store
+
+@pytest.fixture(autouse=True)
+def mock_auth():
+    import app
+    app.app.dependency_overrides[app.get_current_user] = lambda: "test-user"
+    yield
+    app.app.dependency_overrides.pop(app.get_current_user, None)
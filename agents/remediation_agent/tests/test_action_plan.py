@@ -0,0 +1,74 @@
+import pytest
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import app
+
+ALERT = {"source": "siem", "event_type": "malware_detected", "timestamp": 1700000000.0, "details": {}}
+HEADERS = {"Authorization": "Bearer test"}
+
+@pytest.fixture
+def dispatched(store, monkeypatch):
+    """Replace the action handlers with recorders."""
+    calls = []
+
+    def recorder(action_type):
+        async def handler(target, **parameters):
+            calls.append((action_type, target, parameters))
+            return {"action": action_type, "target": target, "status": "success", "message": "done"}
+        return handler
+
+    monkeypatch.setattr(app_module, "ACTION_HANDLERS", {
+        action_type: recorder(action_type) for action_type in app_module.ACTION_HANDLERS
+    })
+    return calls
+
+def remediate(action_plan):
+    client = TestClient(app)
+    response = client.post("/remediate", headers=HEADERS, json={
+        "alert": ALERT,
+        "investigation": {"action_plan": action_plan}
+    })
+    assert response.status_code == 200
+    return response.json()
+
+def test_plan_is_dispatched_by_action_type(dispatched):
+    result = remediate([
+        {"action": "block_ip", "target": "203.0.113.7", "indicator_type": "ip", "priority": "high"},
+        {"action": "block_domain", "target": "evil.example", "indicator_type": "domain", "priority": "high"},
+        {"action": "ssh_command", "target": "web-01", "parameters": {"command": "uptime"}}
+    ])
+    assert sorted(dispatched) == [
+        ("block_domain", "evil.example", {}),
+        ("block_ip", "203.0.113.7", {}),
+        ("ssh_command", "web-01", {"command": "uptime"})
+    ]
+    assert [action["action"] for action in result["actions_taken"]] == ["block_ip", "block_domain", "ssh_command"]
+    assert result["status"] == "success"
+
+def test_manual_and_untargeted_actions_are_skipped(dispatched):
+    result = remediate([
+        {"action": "escalate", "priority": "high", "description": "Escalate to security team immediately"},
+        {"action": "isolate_host", "priority": "high"},
+        {"action": "isolate_host", "target": "web-01", "priority": "high"}
+    ])
+    assert dispatched == [("isolate_host", "web-01", {})]
+    assert [action["status"] for action in result["actions_taken"]] == ["skipped", "skipped", "success"]
+    assert result["status"] == "partial"
+
+def test_high_priority_actions_start_first(dispatched):
+    remediate([
+        {"action": "run_scan", "target": "web-01", "priority": "low"},
+        {"action": "block_ip", "target": "203.0.113.7", "priority": "high"}
+    ])
+    assert [call[0] for call in dispatched] == ["block_ip", "run_scan"]
+
+def test_free_text_recommendations_are_not_parsed(dispatched):
+    client = TestClient(app)
+    response = client.post("/remediate", headers=HEADERS, json={
+        "alert": ALERT,
+        "investigation": {"recommended_actions": ["Block indicator: 203.0.113.7"]}
+    })
+    assert response.json()["status"] == "skipped"
+    assert dispatched == []
@@ -0,0 +1,87 @@
+import pytest
+import asyncio
+import time
+
+from app import ActionExecutor
+
+def recording_action(events, action_type, delay=0.0, fail=False):
+    async def action(target):
+        events.append(("start", action_type, target))
+        await asyncio.sleep(delay)
+        events.append(("end", action_type, target))
+        if fail:
+            raise RuntimeError("firewall unreachable")
+        return {"action": action_type, "target": target, "status": "success", "message": "done"}
+    return action
+
+def test_actions_on_one_target_run_in_submission_order():
+    events = []
+    executor = ActionExecutor()
+    actions = [
+        ("isolate_host", "web-01", recording_action(events, "isolate_host", delay=0.05), ("web-01",), {}),
+        ("run_scan", "web-01", recording_action(events, "run_scan", delay=0.01), ("web-01",), {}),
+        ("ssh_command", "web-01", recording_action(events, "ssh_command"), ("web-01",), {})
+    ]
+
+    asyncio.run(executor.run_all(actions))
+    assert events == [
+        ("start", "isolate_host", "web-01"), ("end", "isolate_host", "web-01"),
+        ("start", "run_scan", "web-01"), ("end", "run_scan", "web-01"),
+        ("start", "ssh_command", "web-01"), ("end", "ssh_command", "web-01")
+    ]
+    assert executor._target_locks == {}
+
+def test_actions_on_different_targets_run_concurrently():
+    events = []
+    executor = ActionExecutor()
+    actions = [
+        ("isolate_host", f"web-{i:02d}", recording_action(events, "isolate_host", delay=0.1), (f"web-{i:02d}",), {})
+        for i in range(10)
+    ]
+
+    start = time.perf_counter()
+    results = asyncio.run(executor.run_all(actions))
+    assert time.perf_counter() - start < 0.5
+    assert [result["target"] for result in results] == [f"web-{i:02d}" for i in range(10)]
+    assert [kind for kind, _, _ in events[:10]] == ["start"] * 10
+
+def test_concurrency_is_bounded_per_action_type(monkeypatch):
+    monkeypatch.setenv("RUN_SCAN_CONCURRENCY", "2")
+    running = []
+    peak = []
+    executor = ActionExecutor()
+
+    async def scan(target):
+        running.append(target)
+        peak.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(target)
+        return {"action": "run_scan", "target": target, "status": "success", "message": "done"}
+
+    asyncio.run(executor.run_all([("run_scan", f"host-{i}", scan, (f"host-{i}",), {}) for i in range(6)]))
+    assert max(peak) == 2
+
+def test_slow_and_failing_actions_become_error_results():
+    events = []
+    executor = ActionExecutor(timeout=0.05)
+    actions = [
+        ("block_ip", "203.0.113.7", recording_action(events, "block_ip", delay=1), ("203.0.113.7",), {}),
+        ("block_ip", "203.0.113.8", recording_action(events, "block_ip", fail=True), ("203.0.113.8",), {}),
+        ("block_ip", "203.0.113.9", recording_action(events, "block_ip"), ("203.0.113.9",), {})
+    ]
+
+    timed_out, failed, succeeded = asyncio.run(executor.run_all(actions))
+    assert timed_out["status"] == "error"
+    assert timed_out["message"] == "Action timed out after 0.05s"
+    assert failed["status"] == "error"
+    assert failed["message"] == "Action failed: firewall unreachable"
+    assert succeeded["status"] == "success"
+    assert ("end", "block_ip", "203.0.113.7") not in events
+
+def test_results_record_start_time_and_duration():
+    executor = ActionExecutor()
+    before = time.time()
+    result = asyncio.run(executor.run("isolate_host", "web-01", recording_action([], "isolate_host", delay=0.05),
+                                      "web-01"))
+    assert before <= result["started_at"] <= time.time()
+    assert 50 <= result["duration_ms"] < 1000
@@ -0,0 +1,110 @@
+import pytest
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import mock_firewall
+from app import FIREWALL_BLOCKED_KEY, FirewallBlocker, aggregate_networks
+
+@pytest.fixture
+def firewall(monkeypatch):
+    """The mock firewall, served in-process with no added latency."""
+    monkeypatch.setenv("FIREWALL_API_URL", "http://firewall")
+    monkeypatch.setenv("FIREWALL_API_KEY", "test-key")
+    monkeypatch.setattr(mock_firewall, "LATENCY", 0)
+    mock_firewall.stats.update(requests=0, bulk_requests=0, entries=0)
+    mock_firewall.blocked.clear()
+    return mock_firewall
+
+def make_blocker(store, firewall_app=mock_firewall.app, **kwargs):
+    blocker = FirewallBlocker(window=0.01, blocked_store=store, **kwargs)
+    blocker._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=firewall_app))
+    return blocker
+
+def block_all(blocker, ips):
+    async def run():
+        try:
+            return await asyncio.gather(*(blocker.block(ip) for ip in ips))
+        finally:
+            await blocker.close()
+    return asyncio.run(run())
+
+def test_concurrent_blocks_are_sent_as_one_bulk_request(firewall, store):
+    ips = [f"198.51.100.{i}" for i in range(1, 41)]
+    results = block_all(make_blocker(store), ips)
+
+    assert [result["target"] for result in results] == ips
+    assert all(result["status"] == "success" for result in results)
+    assert firewall.stats["requests"] == 1
+    assert firewall.stats["bulk_requests"] == 1
+    assert set(store.zsets[FIREWALL_BLOCKED_KEY]) == set(ips)
+
+def test_bulk_requests_are_chunked_by_batch_size(firewall, store):
+    # Every other address, so that none of them collapse into a larger block
+    ips = [f"198.51.100.{i}" for i in range(0, 20, 2)]
+    results = block_all(make_blocker(store, batch_size=4), ips)
+
+    assert all(result["status"] == "success" for result in results)
+    assert firewall.stats["bulk_requests"] == 3
+    assert firewall.stats["entries"] == 10
+
+def test_adjacent_addresses_are_collapsed_into_cidr_blocks(firewall, store):
+    ips = [f"203.0.113.{i}" for i in range(0, 8)] + ["192.0.2.1", "2001:db8::1"]
+    results = block_all(make_blocker(store), ips)
+
+    assert firewall.blocked == {"203.0.113.0/29", "192.0.2.1/32", "2001:db8::1/128"}
+    assert results[0]["message"] == "IP blocked successfully as part of 203.0.113.0/29"
+    assert results[8]["message"] == "IP blocked successfully as part of 192.0.2.1/32"
+    assert aggregate_networks(["10.0.0.0", "10.0.0.1", "10.0.0.3"]) == ["10.0.0.0/31", "10.0.0.3/32"]
+
+def test_duplicates_and_already_blocked_addresses_are_not_resent(firewall, store):
+    store.zadd(FIREWALL_BLOCKED_KEY, {"198.51.100.9": time.time()})
+    results = block_all(make_blocker(store), ["198.51.100.7", "198.51.100.7", "198.51.100.9"])
+
+    assert [result["status"] for result in results] == ["success"] * 3
+    assert results[2]["message"] == "IP already blocked"
+    assert firewall.blocked == {"198.51.100.7/32"}
+    assert firewall.stats["entries"] == 1
+
+def test_blocks_older_than_the_ttl_are_resubmitted(firewall, store):
+    store.zadd(FIREWALL_BLOCKED_KEY, {"198.51.100.9": time.time() - 120, "198.51.100.10": time.time() - 30})
+    results = block_all(make_blocker(store, blocked_ttl=60), ["198.51.100.9", "198.51.100.10"])
+
+    assert results[0]["message"] == "IP blocked successfully as part of 198.51.100.9/32"
+    assert results[1]["message"] == "IP already blocked"
+    assert firewall.blocked == {"198.51.100.9/32"}
+    assert store.zsets[FIREWALL_BLOCKED_KEY]["198.51.100.9"] > time.time() - 60
+
+def test_invalid_addresses_fail_without_affecting_the_batch(firewall, store):
+    results = block_all(make_blocker(store), ["198.51.100.7", "not-an-ip"])
+
+    assert results[0]["status"] == "success"
+    assert results[1]["status"] == "failed"
+    assert results[1]["message"] == "Invalid IP address: not-an-ip"
+
+def test_falls_back_to_per_address_requests_without_bulk_endpoint(firewall, store):
+    legacy = FastAPI()
+    legacy.post("/block")(mock_firewall.block)
+    blocker = make_blocker(store, firewall_app=legacy)
+    ips = ["198.51.100.7", "198.51.100.8", "198.51.100.9"]
+    results = block_all(blocker, ips)
+
+    assert [result["status"] for result in results] == ["success"] * 3
+    assert not blocker.bulk_supported
+    assert firewall.blocked == set(ips)
+    assert firewall.stats == {"requests": 3, "bulk_requests": 0, "entries": 3}
+    assert set(store.zsets[FIREWALL_BLOCKED_KEY]) == set(ips)
+
+def test_firewall_errors_reach_every_caller(firewall, store):
+    def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    blocker = FirewallBlocker(window=0.01, blocked_store=store)
+    blocker._client = httpx.AsyncClient(transport=httpx.MockTransport(refuse))
+    results = block_all(blocker, ["198.51.100.7", "198.51.100.8"])
+
+    assert [result["status"] for result in results] == ["error", "error"]
+    assert "connection refused" in results[0]["message"]
+    assert FIREWALL_BLOCKED_KEY not in store.zsets
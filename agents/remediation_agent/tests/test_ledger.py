@@ -0,0 +1,133 @@
+import pytest
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import ActionExecutor, RemediationLedger, app
+
+@pytest.fixture
+def executor(store):
+    return ActionExecutor(ledger=RemediationLedger(store=store, poll_interval=0.01))
+
+def counting_action(calls, status="success", delay=0):
+    async def action(target):
+        calls.append(target)
+        await asyncio.sleep(delay)
+        return {"action": "isolate_host", "target": target, "status": status, "message": "done"}
+    return action
+
+def test_applied_action_is_suppressed(executor, store):
+    calls = []
+    action = counting_action(calls)
+
+    async def run():
+        first = await executor.run("isolate_host", "web-01", action, "web-01")
+        second = await executor.run("isolate_host", "web-01", action, "web-01")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert calls == ["web-01"]
+    assert "suppressed" not in first
+    assert second["status"] == "success"
+    assert second["suppressed"] == "applied"
+    assert json.loads(store.data["remediation:ledger:isolate_host:web-01"])["status"] == "applied"
+
+def test_inflight_duplicates_wait_for_original(executor):
+    calls = []
+    action = counting_action(calls, delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(executor.run("isolate_host", "web-01", action, "web-01") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == ["web-01"]
+    assert [result.get("suppressed") for result in results].count("in_flight") == 4
+    assert all(result["status"] == "success" for result in results)
+
+def test_failed_action_can_be_retried(executor, store):
+    calls = []
+    action = counting_action(calls, status="failed")
+
+    async def run():
+        await executor.run("isolate_host", "web-01", action, "web-01")
+        return await executor.run("isolate_host", "web-01", action, "web-01")
+
+    result = asyncio.run(run())
+    assert calls == ["web-01", "web-01"]
+    assert "suppressed" not in result
+    assert "remediation:ledger:isolate_host:web-01" not in store.data
+
+def test_different_parameters_on_one_target_are_separate_entries(executor, store):
+    calls = []
+
+    def ssh_action(command):
+        async def action(target):
+            calls.append((target, command))
+            return {"action": "ssh_command", "target": target, "status": "success", "message": command}
+        return action
+
+    async def run():
+        return await asyncio.gather(*(
+            executor.run("ssh_command", "web-01", ssh_action(command), "web-01", parameters={"command": command})
+            for command in ["systemctl stop nginx", "pkill -f miner", "systemctl stop nginx"]
+        ))
+
+    results = asyncio.run(run())
+    assert sorted(calls) == [("web-01", "pkill -f miner"), ("web-01", "systemctl stop nginx")]
+    assert [result.get("suppressed") for result in results] == [None, None, "in_flight"]
+    assert RemediationLedger.key("ssh_command", "web-01", {"command": "pkill -f miner"}) != \
+        RemediationLedger.key("ssh_command", "web-01", {"command": "systemctl stop nginx"})
+    assert executor.ledger.get("ssh_command", "web-01", {"command": "pkill -f miner"})["status"] == "applied"
+    assert executor.ledger.get("ssh_command", "web-01") is None
+
+def test_waits_for_claim_held_by_another_worker(executor, store):
+    calls = []
+    other_worker = RemediationLedger(store=store)
+    claim, _ = other_worker._claim("isolate_host", "web-01", "other-alert")
+
+    async def run():
+        async def finish_elsewhere():
+            await asyncio.sleep(0.05)
+            other_worker._release("isolate_host", "web-01", claim,
+                                  {"action": "isolate_host", "target": "web-01", "status": "success", "message": "done"})
+
+        result, _ = await asyncio.gather(
+            executor.run("isolate_host", "web-01", counting_action(calls), "web-01"),
+            finish_elsewhere()
+        )
+        return result
+
+    result = asyncio.run(run())
+    assert calls == []
+    assert result["suppressed"] == "applied"
+
+def test_audit_and_stats(executor, store):
+    calls = []
+    action = counting_action(calls)
+
+    async def run():
+        await executor.run("isolate_host", "web-01", action, "web-01", alert_id="alert-1")
+        await executor.run("isolate_host", "web-01", action, "web-01", alert_id="alert-2")
+
+    asyncio.run(run())
+    ledger = executor.ledger
+    assert [entry["outcome"] for entry in ledger.audit()] == ["suppressed", "executed"]
+    assert ledger.audit()[0]["alert_id"] == "alert-2"
+    assert ledger.stats()["executed"] == {"isolate_host": 1}
+    assert ledger.stats()["suppressed"] == {"isolate_host": 1}
+
+def test_ledger_endpoints(store, monkeypatch):
+    monkeypatch.setattr(app_module.remediation_ledger, "store", store)
+    calls = []
+    asyncio.run(app_module.action_executor.run("isolate_host", "web-01", counting_action(calls), "web-01"))
+
+    client = TestClient(app)
+    headers = {"Authorization": "Bearer test"}
+    entry = client.get("/ledger/isolate_host/web-01", headers=headers)
+    assert entry.status_code == 200
+    assert entry.json()["status"] == "applied"
+    assert client.get("/ledger/isolate_host/web-02", headers=headers).status_code == 404
+    assert client.get("/ledger", headers=headers).json()["entries"][0]["outcome"] == "executed"
+    assert client.get("/ledger/stats", headers=headers).json()["executed"] == {"isolate_host": 1}
@@ -0,0 +1,171 @@
+import pytest
+import asyncio
+import os
+import signal
+import time
+
+import asyncssh
+
+from app import SSHConnectionPool, execute_ssh_command
+
+# Runs against the sshd container from tests/docker-compose.sshd.yml when
+# SSH_TEST_HOST is set, otherwise against an in-process asyncssh server that
+# executes commands with the local shell.
+SSH_TEST_HOST = os.getenv("SSH_TEST_HOST")
+
+class LocalShellServer(asyncssh.SSHServer):
+    def begin_auth(self, username):
+        return True
+
+    def public_key_auth_supported(self):
+        return True
+
+    def validate_public_key(self, username, key):
+        return True
+
+LOCAL_PROCESSES = set()
+
+async def run_local_command(process: asyncssh.SSHServerProcess):
+    local = await asyncio.create_subprocess_shell(
+        process.command,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    LOCAL_PROCESSES.add(local)
+    try:
+        stdout, stderr = await local.communicate()
+    finally:
+        LOCAL_PROCESSES.discard(local)
+    process.stdout.write(stdout.decode())
+    process.stderr.write(stderr.decode())
+    process.exit(local.returncode)
+
+@pytest.fixture
+def ssh_target(tmp_path):
+    """Yield (host, port, user, key_path, server) for an sshd to run commands on."""
+    if SSH_TEST_HOST:
+        yield (SSH_TEST_HOST, int(os.getenv("SSH_TEST_PORT", "22")), os.environ["SSH_TEST_USER"],
+               os.environ["SSH_TEST_KEY"], None)
+        return
+
+    client_key = asyncssh.generate_private_key("ssh-ed25519")
+    key_path = tmp_path / "id_ed25519"
+    client_key.write_private_key(str(key_path))
+    yield "127.0.0.1", None, "mcp", str(key_path), client_key
+
+async def start_server(target):
+    host, port, user, key_path, client_key = target
+    if client_key is None:
+        return None, port
+    server = await asyncssh.create_server(
+        LocalShellServer, "127.0.0.1", 0,
+        server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")],
+        process_factory=run_local_command
+    )
+    return server, server.sockets[0].getsockname()[1]
+
+def with_pool(target, scenario, **pool_options):
+    host, _, user, key_path, _ = target
+
+    async def run():
+        server, port = await start_server(target)
+        pool_options.setdefault("check_host_keys", False)
+        pool = SSHConnectionPool(username=user, key_path=key_path, port=port, **pool_options)
+        try:
+            return await scenario(pool, host)
+        finally:
+            await pool.close()
+            for local in list(LOCAL_PROCESSES):
+                os.killpg(local.pid, signal.SIGKILL)
+                await local.wait()
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+
+    return asyncio.run(run())
+
+def test_command_success(ssh_target):
+    async def scenario(pool, host):
+        return await execute_ssh_command(host, "echo hello", pool=pool)
+
+    result = with_pool(ssh_target, scenario)
+    assert result["status"] == "success"
+    assert result["exit_status"] == 0
+    assert result["stdout"] == "hello\n"
+    assert result["stdout_truncated"] is False
+
+def test_command_failure_reports_exit_status(ssh_target):
+    async def scenario(pool, host):
+        return await execute_ssh_command(host, "echo oops >&2; exit 3", pool=pool)
+
+    result = with_pool(ssh_target, scenario)
+    assert result["status"] == "failed"
+    assert result["exit_status"] == 3
+    assert "oops" in result["stderr"]
+
+def test_output_is_capped(ssh_target):
+    async def scenario(pool, host):
+        return await pool.run(host, "head -c 100000 /dev/zero | tr '\\0' x", max_output=1000)
+
+    result = with_pool(ssh_target, scenario)
+    assert result["exit_status"] == 0
+    assert len(result["stdout"]) == 1000
+    assert result["stdout_truncated"] is True
+
+def test_command_timeout(ssh_target):
+    async def scenario(pool, host):
+        return await execute_ssh_command(host, "sleep 10", timeout=0.5, pool=pool)
+
+    start = time.monotonic()
+    result = with_pool(ssh_target, scenario)
+    assert result["status"] == "error"
+    assert "timed out" in result["message"]
+    assert time.monotonic() - start < 5
+
+def test_commands_share_one_connection(ssh_target):
+    async def scenario(pool, host):
+        start = time.monotonic()
+        results = await asyncio.gather(*(pool.run(host, "sleep 0.5; echo done") for _ in range(4)))
+        return results, time.monotonic() - start, len(pool._connections)
+
+    results, elapsed, connections = with_pool(ssh_target, scenario, max_channels=4)
+    assert all(result["stdout"] == "done\n" for result in results)
+    assert connections == 1
+    assert elapsed < 1.5
+
+def test_reconnects_after_connection_loss(ssh_target):
+    async def scenario(pool, host):
+        await pool.run(host, "true")
+        conn = pool._connections[host]
+        conn.close()
+        await conn.wait_closed()
+        return await pool.run(host, "echo again")
+
+    result = with_pool(ssh_target, scenario)
+    assert result["stdout"] == "again\n"
+
+def test_run_many_hosts_in_parallel(ssh_target):
+    async def scenario(pool, host):
+        return await pool.run_many([host, host], "echo ok")
+
+    results = with_pool(ssh_target, scenario)
+    assert [result["status"] for result in results] == ["success", "success"]
+
+@pytest.mark.skipif(bool(SSH_TEST_HOST), reason="needs the in-process server's unknown host key")
+def test_unknown_host_keys_are_refused(ssh_target, tmp_path):
+    known_hosts = tmp_path / "known_hosts"
+    known_hosts.write_text("")
+
+    async def scenario(pool, host):
+        return await execute_ssh_command(host, "echo hello", pool=pool)
+
+    result = with_pool(ssh_target, scenario, known_hosts=str(known_hosts), check_host_keys=True)
+    assert result["status"] == "error"
+    assert "Host key is not trusted" in result["message"]
+
+def test_skipped_without_configuration(monkeypatch):
+    monkeypatch.delenv("SSH_HOST", raising=False)
+    result = asyncio.run(execute_ssh_command("10.0.0.5", "uptime"))
+    assert result["status"] == "skipped"
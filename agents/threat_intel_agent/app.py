@@ -1,5 +1,4 @@
 from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 import os
 import redis
@@ -7,8 +6,21 @@ import httpx
 import requests
 from typing import List, Dict, Optional
 import json
+import time
+from prometheus_client import Counter, Histogram
+from mcp_common.auth import get_current_user, install_auth
+from mcp_common.event_bus import setup_event_stage
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import LATENCY_BUCKETS, setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import get_alert_id, setup_tracing
 
 app = FastAPI(title="Threat Intel Agent")
+install_auth(app)
+setup_tracing(app, "threat-intel-agent")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
 
 # Initialize Redis client
 redis_client = redis.Redis(
@@ -17,8 +29,16 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
-# OAuth2 scheme for JWT validation
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
+# Intelligence source endpoints
+VIRUSTOTAL_API_URL = os.getenv("VIRUSTOTAL_API_URL", "https://www.virustotal.com/api/v3")
+ABUSEIPDB_API_URL = os.getenv("ABUSEIPDB_API_URL", "https://api.abuseipdb.com/api/v2")
+WHOIS_API_URL = os.getenv("WHOIS_API_URL", "https://whois.whoisxmlapi.com/api/v1")
+
+# Threat intel metrics. The agent does not cache enrichments yet, so every
+# lookup goes to the source; outcome tells found, not found and errors apart.
+THREAT_INTEL_LOOKUPS = Counter("threat_intel_lookups_total", "Threat intel source lookups", ["source", "outcome"])
+THREAT_INTEL_LATENCY = Histogram("threat_intel_lookup_duration_seconds", "Threat intel source lookup latency",
+                                 ["source"], buckets=LATENCY_BUCKETS)
 
 class Indicator(BaseModel):
     type: str
@@ -32,16 +52,6 @@ class EnrichmentResult(BaseModel):
     sources: List[str]
     timestamp: float
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        # In a real implementation, validate JWT token
-        return "user"  # Simplified for demo
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
-
 async def query_virustotal(indicator: Indicator) -> Optional[Dict]:
     """Query VirusTotal API for threat intelligence."""
     vt_api_key = os.getenv("VT_API_KEY")
@@ -54,16 +64,16 @@ async def query_virustotal(indicator: Indicator) -> Optional[Dict]:
     
     # Determine the appropriate endpoint based on indicator type
     if indicator.type == "ip":
-        endpoint = f"https://www.virustotal.com/api/v3/ip_addresses/{indicator.value}"
+        endpoint = f"{VIRUSTOTAL_API_URL}/ip_addresses/{indicator.value}"
     elif indicator.type == "domain":
-        endpoint = f"https://www.virustotal.com/api/v3/domains/{indicator.value}"
+        endpoint = f"{VIRUSTOTAL_API_URL}/domains/{indicator.value}"
     elif indicator.type == "hash":
-        endpoint = f"https://www.virustotal.com/api/v3/files/{indicator.value}"
+        endpoint = f"{VIRUSTOTAL_API_URL}/files/{indicator.value}"
     elif indicator.type == "url":
         # For URLs, we need to encode it
         import base64
         encoded_url = base64.urlsafe_b64encode(indicator.value.encode()).decode().strip("=")
-        endpoint = f"https://www.virustotal.com/api/v3/urls/{encoded_url}"
+        endpoint = f"{VIRUSTOTAL_API_URL}/urls/{encoded_url}"
     else:
         return None
     
@@ -131,7 +141,7 @@ async def query_abuseipdb(indicator: Indicator) -> Optional[Dict]:
     try:
         async with httpx.AsyncClient() as client:
             response = await client.get(
-                f"https://api.abuseipdb.com/api/v2/check",
+                f"{ABUSEIPDB_API_URL}/check",
                 params={"ipAddress": indicator.value, "maxAgeInDays": 90},
                 headers=headers
             )
@@ -186,7 +196,7 @@ async def query_whois(indicator: Indicator) -> Optional[Dict]:
         
         async with httpx.AsyncClient() as client:
             response = await client.get(
-                f"https://whois.whoisxmlapi.com/api/v1",
+                WHOIS_API_URL,
                 params={"apiKey": api_key, "domainName": indicator.value}
             )
             
@@ -217,83 +227,100 @@ async def query_whois(indicator: Indicator) -> Optional[Dict]:
     
     return None
 
+async def lookup(source: str, query, indicator: Indicator) -> Optional[Dict]:
+    """Query one intelligence source, recording latency and outcome."""
+    start = time.perf_counter()
+    try:
+        result = await query(indicator)
+    except Exception:
+        THREAT_INTEL_LOOKUPS.labels(source, "error").inc()
+        raise
+    finally:
+        THREAT_INTEL_LATENCY.labels(source).observe(time.perf_counter() - start)
+    THREAT_INTEL_LOOKUPS.labels(source, "found" if result else "not_found").inc()
+    return result
+
+async def enrich(indicators: List[Indicator], alert_id: Optional[str] = None) -> EnrichmentResult:
+    """Look indicators up in the intelligence sources and store the result."""
+    enriched_indicators = []
+    sources = []
+
+    for indicator in indicators:
+        # Try different intelligence sources based on indicator type
+        if indicator.type == "ip":
+            # Try AbuseIPDB first
+            result = await lookup("AbuseIPDB", query_abuseipdb, indicator)
+            if result:
+                enriched_indicators.append(result)
+                if "AbuseIPDB" not in sources:
+                    sources.append("AbuseIPDB")
+
+            # Then try VirusTotal
+            result = await lookup("VirusTotal", query_virustotal, indicator)
+            if result:
+                enriched_indicators.append(result)
+                if "VirusTotal" not in sources:
+                    sources.append("VirusTotal")
+
+        elif indicator.type == "domain":
+            # Try WHOIS first
+            result = await lookup("WHOIS", query_whois, indicator)
+            if result:
+                enriched_indicators.append(result)
+                if "WHOIS" not in sources:
+                    sources.append("WHOIS")
+
+            # Then try VirusTotal
+            result = await lookup("VirusTotal", query_virustotal, indicator)
+            if result:
+                enriched_indicators.append(result)
+                if "VirusTotal" not in sources:
+                    sources.append("VirusTotal")
+
+        elif indicator.type in ["hash", "url"]:
+            # Try VirusTotal
+            result = await lookup("VirusTotal", query_virustotal, indicator)
+            if result:
+                enriched_indicators.append(result)
+                if "VirusTotal" not in sources:
+                    sources.append("VirusTotal")
+
+        # If no enrichment was found, add the original indicator
+        if not any(ei["value"] == indicator.value for ei in enriched_indicators):
+            enriched_indicators.append({
+                "type": indicator.type,
+                "value": indicator.value,
+                "description": "No additional information available",
+                "risk_level": "unknown",
+                "details": {}
+            })
+
+    # Create enrichment result
+    result = EnrichmentResult(
+        indicators=enriched_indicators,
+        sources=sources,
+        timestamp=time.time()
+    )
+
+    # Store in Redis for potential future reference
+    redis_client.set(
+        f"threat_intel:{alert_id or ','.join([i.value for i in indicators])}",
+        json.dumps(result.dict())
+    )
+
+    return result
+
 @app.post("/enrich", response_model=EnrichmentResult)
 async def enrich_indicators(
     request: EnrichmentRequest,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_current_user),
+    alert_id: Optional[str] = Depends(get_alert_id)
 ):
     """
     Enrich security indicators with threat intelligence data.
     """
     try:
-        enriched_indicators = []
-        sources = []
-        
-        for indicator in request.indicators:
-            # Try different intelligence sources based on indicator type
-            if indicator.type == "ip":
-                # Try AbuseIPDB first
-                result = await query_abuseipdb(indicator)
-                if result:
-                    enriched_indicators.append(result)
-                    if "AbuseIPDB" not in sources:
-                        sources.append("AbuseIPDB")
-                
-                # Then try VirusTotal
-                result = await query_virustotal(indicator)
-                if result:
-                    enriched_indicators.append(result)
-                    if "VirusTotal" not in sources:
-                        sources.append("VirusTotal")
-            
-            elif indicator.type == "domain":
-                # Try WHOIS first
-                result = await query_whois(indicator)
-                if result:
-                    enriched_indicators.append(result)
-                    if "WHOIS" not in sources:
-                        sources.append("WHOIS")
-                
-                # Then try VirusTotal
-                result = await query_virustotal(indicator)
-                if result:
-                    enriched_indicators.append(result)
-                    if "VirusTotal" not in sources:
-                        sources.append("VirusTotal")
-            
-            elif indicator.type in ["hash", "url"]:
-                # Try VirusTotal
-                result = await query_virustotal(indicator)
-                if result:
-                    enriched_indicators.append(result)
-                    if "VirusTotal" not in sources:
-                        sources.append("VirusTotal")
-            
-            # If no enrichment was found, add the original indicator
-            if not any(ei["value"] == indicator.value for ei in enriched_indicators):
-                enriched_indicators.append({
-                    "type": indicator.type,
-                    "value": indicator.value,
-                    "description": "No additional information available",
-                    "risk_level": "unknown",
-                    "details": {}
-                })
-        
-        # Create enrichment result
-        import time
-        result = EnrichmentResult(
-            indicators=enriched_indicators,
-            sources=sources,
-            timestamp=time.time()
-        )
-        
-        # Store in Redis for potential future reference
-        redis_client.set(
-            f"threat_intel:{','.join([i.value for i in request.indicators])}",
-            json.dumps(result.dict())
-        )
-        
-        return result
+        return await enrich(request.indicators, alert_id)
         
     except Exception as e:
         raise HTTPException(
@@ -301,6 +328,15 @@ async def enrich_indicators(
             detail=str(e)
         )
 
+# Event bus stage
+async def handle_threat_intel_event(alert_id: str, event: Dict, token: Optional[str]) -> Dict:
+    indicators = [Indicator(**indicator) for indicator in event["triage"]["indicators"]]
+    if not indicators:
+        return {}
+    return (await enrich(indicators, alert_id)).dict()
+
+setup_event_stage(app, "threat_intel", handle_threat_intel_event)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -1,12 +1,22 @@
 from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 import os
 import redis
-from typing import List, Optional
+from typing import Dict, List, Optional
 import json
+from mcp_common.auth import get_current_user, install_auth
+from mcp_common.event_bus import setup_event_stage
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import get_alert_id, setup_tracing
 
 app = FastAPI(title="Triage Agent")
+install_auth(app)
+setup_tracing(app, "triage-agent")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
 
 # Initialize Redis client
 redis_client = redis.Redis(
@@ -15,9 +25,6 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
-# OAuth2 scheme for JWT validation
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
-
 class Alert(BaseModel):
     source: str
     event_type: str
@@ -29,16 +36,6 @@ class TriageResult(BaseModel):
     severity: str
     indicators: List[dict]
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        # In a real implementation, validate JWT token
-        return "user"  # Simplified for demo
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
-
 def extract_indicators(alert: Alert) -> List[dict]:
     """Extract potential indicators from the alert details."""
     indicators = []
@@ -107,38 +104,43 @@ def categorize_alert(event_type: str, details: dict) -> str:
     
     return "other"
 
+def triage(alert: Alert, alert_id: Optional[str] = None) -> TriageResult:
+    """Classify an alert and store the result."""
+    # Extract indicators
+    indicators = extract_indicators(alert)
+    
+    # Determine severity
+    severity = determine_severity(alert.event_type, alert.details)
+    
+    # Categorize the alert
+    category = categorize_alert(alert.event_type, alert.details)
+    
+    # Store triage result in memory
+    triage_result = TriageResult(
+        category=category,
+        severity=severity,
+        indicators=indicators
+    )
+    
+    # Store in Redis for potential future reference
+    redis_client.set(
+        f"triage:{alert_id or f'{alert.source}:{alert.timestamp}'}",
+        json.dumps(triage_result.dict())
+    )
+    
+    return triage_result
+
 @app.post("/triage", response_model=TriageResult)
 async def triage_alert(
     alert: Alert,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(get_current_user),
+    alert_id: Optional[str] = Depends(get_alert_id)
 ):
     """
     Triage a security alert by determining its category, severity, and extracting indicators.
     """
     try:
-        # Extract indicators
-        indicators = extract_indicators(alert)
-        
-        # Determine severity
-        severity = determine_severity(alert.event_type, alert.details)
-        
-        # Categorize the alert
-        category = categorize_alert(alert.event_type, alert.details)
-        
-        # Store triage result in memory
-        triage_result = TriageResult(
-            category=category,
-            severity=severity,
-            indicators=indicators
-        )
-        
-        # Store in Redis for potential future reference
-        redis_client.set(
-            f"triage:{alert.source}:{alert.timestamp}",
-            json.dumps(triage_result.dict())
-        )
-        
-        return triage_result
+        return triage(alert, alert_id)
         
     except Exception as e:
         raise HTTPException(
@@ -146,6 +148,12 @@ async def triage_alert(
             detail=str(e)
         )
 
+# Event bus stage
+async def handle_triage_event(alert_id: str, event: Dict, token: Optional[str]) -> Dict:
+    return triage(Alert(**event["alert"]), alert_id).dict()
+
+setup_event_stage(app, "triage", handle_triage_event)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
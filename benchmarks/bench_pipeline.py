@@ -0,0 +1,335 @@
+"""
+Load-test the full alert pipeline against stub downstreams.
+
+Boots every service with benchmarks/stack.py and sends a realistic mix of
+alerts to the agent manager's /alert at one or more fixed rates. Arrivals are
+open-loop (Poisson), so a slow pipeline builds a queue rather than slowing
+the load down. Latency is measured from each alert's scheduled send time.
+
+Reported for each rate:
+- throughput, error counts, and end-to-end p50/p95/p99 overall and per scenario
+- p50/p95/p99 of each stage, taken from the spans each service writes, where
+  a stage is the time a request spends in that service's handler
+- CPU and memory of each service process
+
+The LLM, threat intel APIs, firewall, SMTP relay and Slack are stubs with
+configurable latency. Results can be saved with --output and compared with a
+previous run with --baseline. Then the exit status is 1 if end-to-end or stage
+p95 got more than --max-regression slower, or throughput fell by more than
+that, at any rate both runs share.
+
+Needs a throwaway Redis on port 6379 of --redis-host. State such as the
+remediation ledger persists between runs unless --flush-redis is given.
+Services read their usual settings from the environment, e.g. DIGEST_WINDOW=0
+to deliver every notification instead of collapsing them into digests.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--rates 1,2,5] [--duration 30] [--warmup 5]
+        [--mix brute_force=40,port_scan=25,phishing=15,malware=10,exfiltration=10]
+        [--llm-latency-ms 800] [--intel-latency-ms 150] [--firewall-latency-ms 50]
+        [--smtp-latency-ms 20] [--slack-latency-ms 100] [--no-traces] [--flush-redis]
+        [--output results.json] [--baseline previous.json] [--max-regression 0.2] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+import redis
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCHMARKS_DIR))
+sys.path.append(BENCHMARKS_DIR)
+
+from mcp_common.trace_report import load_spans
+from stack import REDIS_PORT, SERVICES, Stack
+
+SCENARIOS = ("brute_force", "port_scan", "phishing", "malware", "exfiltration")
+DEFAULT_MIX = "brute_force=40,port_scan=25,phishing=15,malware=10,exfiltration=10"
+STAGES = [name for name, _ in SERVICES if name != "auth-service"]
+
+class AlertGenerator:
+    """Alerts drawn from a fixed population of attackers, hosts and users, so indicators repeat as in real traffic."""
+
+    def __init__(self, mix: Dict[str, float], seed: int):
+        self.rng = random.Random(seed)
+        self.scenarios = list(mix)
+        self.weights = [mix[name] for name in self.scenarios]
+        rng = random.Random(seed + 1)
+        self.ips = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+                    for _ in range(500)]
+        self.domains = [f"{rng.choice(['login', 'secure', 'update', 'cdn'])}-{rng.randrange(16 ** 6):06x}.example.com"
+                        for _ in range(200)]
+        self.hashes = [f"{rng.getrandbits(256):064x}" for _ in range(100)]
+        self.hosts = [f"ws-{i:04d}.corp.example.com" for i in range(300)]
+        self.users = [f"user{i:04d}" for i in range(1000)]
+
+    def __call__(self) -> Tuple[str, Dict]:
+        scenario = self.rng.choices(self.scenarios, self.weights)[0]
+        return scenario, getattr(self, scenario)()
+
+    def alert(self, source: str, event_type: str, **details) -> Dict:
+        return {"source": source, "event_type": event_type, "timestamp": time.time(), "details": details}
+
+    def brute_force(self) -> Dict:
+        return self.alert("wazuh", "failed_login", ip=self.rng.choice(self.ips), user=self.rng.choice(self.users),
+                          host=self.rng.choice(self.hosts), attempts=self.rng.randint(5, 500))
+
+    def port_scan(self) -> Dict:
+        return self.alert("firewall", "network_connection_scan", ip=self.rng.choice(self.ips),
+                          ports=self.rng.randint(100, 65535), severity="low")
+
+    def phishing(self) -> Dict:
+        domain = self.rng.choice(self.domains)
+        return self.alert("email_gateway", "suspicious_email", domain=domain, url=f"https://{domain}/signin",
+                          user=self.rng.choice(self.users))
+
+    def malware(self) -> Dict:
+        return self.alert("edr", "malware_detected", hash=self.rng.choice(self.hashes), host=self.rng.choice(self.hosts),
+                          ip=self.rng.choice(self.ips))
+
+    def exfiltration(self) -> Dict:
+        return self.alert("dlp", "data_transfer", ip=self.rng.choice(self.ips), host=self.rng.choice(self.hosts),
+                          user=self.rng.choice(self.users), bytes=self.rng.randint(10 ** 8, 10 ** 10),
+                          severity="high")
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def rank(p: float) -> float:
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+    return {"count": len(values), "mean": statistics.fmean(values), "p50": rank(50), "p95": rank(95),
+            "p99": rank(99), "max": values[-1]}
+
+async def drive(url: str, token: str, rate: float, duration: float, generate: AlertGenerator,
+                max_in_flight: int) -> Tuple[List[Dict], float]:
+    """Send alerts at rate per second for duration seconds; returns one result per alert and the elapsed time."""
+    results = []
+    slots = asyncio.Semaphore(max_in_flight)
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        async def send(scheduled: float, scenario: str, alert: Dict):
+            result = {"scenario": scenario, "alert_id": None}
+            async with slots:
+                try:
+                    response = await client.post(f"{url}/alert", json=alert, headers=headers)
+                    result["status"] = str(response.status_code)
+                    if response.status_code == 200:
+                        result["alert_id"] = response.json().get("alert_id")
+                except Exception as e:
+                    result["status"] = type(e).__name__
+            result["latency_ms"] = (time.perf_counter() - scheduled) * 1000
+            results.append(result)
+
+        rng = random.Random(generate.rng.random())
+        tasks = []
+        start = next_at = time.perf_counter()
+        while True:
+            next_at += rng.expovariate(rate)
+            if next_at - start >= duration:
+                break
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            scenario, alert = generate()
+            tasks.append(asyncio.create_task(send(next_at, scenario, alert)))
+        await asyncio.gather(*tasks)
+    return results, time.perf_counter() - start
+
+def stage_latencies(trace_files: List[str]) -> Dict[str, Dict[str, List[float]]]:
+    """Per alert id, the duration of each request a service handled while processing it."""
+    spans = []
+    for path in trace_files:
+        if os.path.exists(path):
+            spans.extend(load_spans(path))
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+
+    by_alert = {}
+    for trace_spans in traces.values():
+        alert_id = next((span["alert_id"] for span in trace_spans if span["alert_id"]), None)
+        if not alert_id:
+            continue
+        by_id = {span["span_id"]: span for span in trace_spans}
+        stages = defaultdict(list)
+        for span in trace_spans:
+            # A service's entry span: the trace root, or called from another service
+            parent = by_id.get(span["parent_id"])
+            if parent is None or parent["service"] != span["service"]:
+                stages[span["service"]].append(span["duration_ms"])
+        by_alert[alert_id] = stages
+    return by_alert
+
+def summarise_step(rate: float, results: List[Dict], elapsed: float, before: Dict, after: Dict,
+                   stages_by_alert: Dict) -> Dict:
+    ok = [result for result in results if result["status"] == "200"]
+    by_scenario = defaultdict(list)
+    for result in ok:
+        by_scenario[result["scenario"]].append(result["latency_ms"])
+
+    stages = defaultdict(list)
+    traced = 0
+    for result in ok:
+        alert_stages = stages_by_alert.get(result["alert_id"])
+        if not alert_stages:
+            continue
+        traced += 1
+        for service, durations in alert_stages.items():
+            stages[service].extend(durations)
+
+    resources = {}
+    for name, usage in after.items():
+        if not usage or not before.get(name):
+            continue
+        cpu = usage["cpu_seconds"] - before[name]["cpu_seconds"]
+        resources[name] = {"cpu_seconds": cpu, "cpu_percent": cpu / elapsed * 100,
+                           "rss_mb": usage["rss_mb"], "peak_rss_mb": usage["peak_rss_mb"]}
+
+    return {
+        "rate": rate,
+        "seconds": elapsed,
+        "sent": len(results),
+        "completed": len(ok),
+        "errors": dict(Counter(result["status"] for result in results if result["status"] != "200")),
+        "throughput": len(ok) / elapsed,
+        "end_to_end_ms": percentiles([result["latency_ms"] for result in ok]),
+        "scenarios_ms": {scenario: percentiles(latencies) for scenario, latencies in sorted(by_scenario.items())},
+        "traced": traced,
+        "stages_ms": {stage: percentiles(stages[stage]) for stage in STAGES if stage in stages},
+        "resources": resources
+    }
+
+def compare(report: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Regressions of report against baseline beyond max_regression, as messages."""
+    regressions = []
+    previous_steps = {step["rate"]: step for step in baseline.get("steps", [])}
+    for step in report["steps"]:
+        previous = previous_steps.get(step["rate"])
+        if previous is None:
+            continue
+        if step["throughput"] < previous["throughput"] * (1 - max_regression):
+            regressions.append(f"rate {step['rate']}: throughput {previous['throughput']:.2f} -> "
+                               f"{step['throughput']:.2f}/s")
+        pairs = [("end to end", step["end_to_end_ms"], previous["end_to_end_ms"])]
+        pairs += [(stage, stats, previous.get("stages_ms", {}).get(stage, {}))
+                  for stage, stats in step["stages_ms"].items()]
+        for name, current, old in pairs:
+            if "p95" in current and "p95" in old and current["p95"] > old["p95"] * (1 + max_regression):
+                regressions.append(f"rate {step['rate']}: {name} p95 {old['p95']:.0f} -> {current['p95']:.0f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", default="1,2,5", help="comma-separated alerts per second, one step each")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per step")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unmeasured load at the first rate")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help="scenario=weight,...")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-in-flight", type=int, default=500, help="concurrent /alert requests")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--intel-latency-ms", type=float, default=150)
+    parser.add_argument("--firewall-latency-ms", type=float, default=50)
+    parser.add_argument("--smtp-latency-ms", type=float, default=20)
+    parser.add_argument("--slack-latency-ms", type=float, default=100)
+    parser.add_argument("--redis-host", default=os.getenv("REDIS_HOST", "127.0.0.1"))
+    parser.add_argument("--flush-redis", action="store_true", help="empty the Redis database before starting")
+    parser.add_argument("--no-traces", action="store_true", help="run without tracing; no per-stage latencies")
+    parser.add_argument("--work-dir", help="where service logs and traces are written (default: a temp dir)")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of a previous run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed slowdown, as a fraction")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    rates = [float(rate) for rate in args.rates.split(",")]
+    if args.flush_redis:
+        redis.Redis(host=args.redis_host, port=REDIS_PORT).flushdb()
+
+    stack = Stack(redis_host=args.redis_host, llm_latency_ms=args.llm_latency_ms,
+                  intel_latency_ms=args.intel_latency_ms, firewall_latency_ms=args.firewall_latency_ms,
+                  smtp_latency_ms=args.smtp_latency_ms, slack_latency_ms=args.slack_latency_ms,
+                  tracing=not args.no_traces, work_dir=args.work_dir)
+    generate = AlertGenerator(args.mix, args.seed)
+    runs = []
+    with stack:
+        token = stack.login()
+        url = stack.urls["agent-manager"]
+        if args.warmup > 0:
+            asyncio.run(drive(url, token, rates[0], args.warmup, generate, args.max_in_flight))
+        for rate in rates:
+            before = stack.usage()
+            results, elapsed = asyncio.run(drive(url, token, rate, args.duration, generate, args.max_in_flight))
+            runs.append((rate, results, elapsed, before, stack.usage()))
+        downstream = stack.stats()
+    # Spans are complete once the services have shut down
+    stages_by_alert = {} if args.no_traces else stage_latencies([stack.trace_file(name) for name, _ in SERVICES])
+
+    report = {
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("output", "baseline", "json", "work_dir", "redis_host")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()},
+        "work_dir": stack.work_dir,
+        "steps": [summarise_step(*run, stages_by_alert) for run in runs],
+        "downstream": downstream
+    }
+    regressions = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.max_regression)
+        report["regressions"] = regressions
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if regressions:
+        sys.exit(1)
+
+def print_report(report: Dict):
+    for step in report["steps"]:
+        e2e = step["end_to_end_ms"]
+        print(f"rate {step['rate']:g}/s: {step['completed']}/{step['sent']} completed in {step['seconds']:.1f}s, "
+              f"{step['throughput']:.2f} alerts/s, errors {step['errors'] or 'none'}")
+        print(f"  {'stage':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        rows = [("end to end", e2e)] + list(step["scenarios_ms"].items()) + list(step["stages_ms"].items())
+        for name, stats in rows:
+            if stats["count"]:
+                print(f"  {name:<24}{stats['count']:>7}{stats['p50']:>10.0f}{stats['p95']:>10.0f}{stats['p99']:>10.0f}")
+        print(f"  {'process':<24}{'cpu %':>7}{'rss MB':>10}{'peak MB':>10}")
+        for name, usage in step["resources"].items():
+            print(f"  {name:<24}{usage['cpu_percent']:>7.1f}{usage['rss_mb']:>10.0f}{usage['peak_rss_mb']:>10.0f}")
+        print()
+    print(f"downstream: {json.dumps(report['downstream'])}")
+    print(f"logs and traces: {report['work_dir']}")
+    for regression in report.get("regressions") or []:
+        print(f"REGRESSION {regression}")
+
+if __name__ == "__main__":
+    main()
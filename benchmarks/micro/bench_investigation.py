@@ -0,0 +1,21 @@
+import pytest
+
+import corpus
+
+SIZES = [10, 100, 1000]
+
+@pytest.mark.benchmark(group="investigation.analyze_indicators")
+@pytest.mark.parametrize("size", SIZES, ids=lambda size: f"{size}-indicators")
+def test_analyze_indicators(benchmark, investigation, size):
+    indicators = corpus.indicators(size)
+    threat_intel = corpus.threat_intel(indicators)
+    result = benchmark(investigation.analyze_indicators, indicators, threat_intel)
+    assert len(result) == size
+
+@pytest.mark.benchmark(group="investigation.generate_recommended_actions")
+@pytest.mark.parametrize("size", SIZES, ids=lambda size: f"{size}-findings")
+@pytest.mark.parametrize("severity", ["high", "low"])
+def test_generate_recommended_actions(benchmark, investigation, size, severity):
+    findings = corpus.findings(size)
+    result = benchmark(investigation.generate_recommended_actions, findings, severity, "ws-0001")
+    assert result
@@ -0,0 +1,12 @@
+import pytest
+
+import corpus
+
+SIZES = [10, 100, 1000]
+
+@pytest.mark.benchmark(group="remediation.plan_actions")
+@pytest.mark.parametrize("size", SIZES, ids=lambda size: f"{size}-actions")
+def test_plan_actions(benchmark, remediation, size):
+    action_plan = corpus.action_plan(size)
+    planned, skipped = benchmark(remediation.plan_actions, action_plan)
+    assert len(planned) + len(skipped) == size
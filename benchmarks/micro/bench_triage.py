@@ -0,0 +1,24 @@
+import pytest
+
+import corpus
+
+SIZES = [100, 1000, 10000]
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"{size}-alerts")
+def alerts(request, triage):
+    return [triage.Alert(**alert) for alert in corpus.alerts(request.param)]
+
+@pytest.mark.benchmark(group="triage.extract_indicators")
+def test_extract_indicators(benchmark, triage, alerts):
+    result = benchmark(lambda: [triage.extract_indicators(alert) for alert in alerts])
+    assert len(result) == len(alerts)
+
+@pytest.mark.benchmark(group="triage.determine_severity")
+def test_determine_severity(benchmark, triage, alerts):
+    result = benchmark(lambda: [triage.determine_severity(alert.event_type, alert.details) for alert in alerts])
+    assert set(result) <= {"high", "medium", "low"}
+
+@pytest.mark.benchmark(group="triage.categorize_alert")
+def test_categorize_alert(benchmark, triage, alerts):
+    result = benchmark(lambda: [triage.categorize_alert(alert.event_type, alert.details) for alert in alerts])
+    assert len(result) == len(alerts)
@@ -0,0 +1,48 @@
+"""
+Fixtures for the microbenchmarks.
+
+Every service's module is called app, so each is loaded from its file under
+its own name, letting one session benchmark several services. Tracing is off,
+and no Redis or other service is contacted.
+
+Usage:
+    # Record a baseline, on the main branch say
+    pytest benchmarks/micro --benchmark-save=baseline
+    # Compare a change with it, failing if any median is more than 20% slower
+    pytest benchmarks/micro --benchmark-compare --benchmark-compare-fail=median:20%
+
+Runs are stored under .benchmarks/ in the working directory.
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.append(REPO_ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("MEMORY_URL", "redis://localhost:6379")
+os.environ.setdefault("TRACING_ENABLED", "false")
+
+def load_service(name: str, directory: str):
+    """Import directory/app.py as module name."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_ROOT, directory, "app.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope="session")
+def triage():
+    return load_service("triage_app", "agents/triage_agent")
+
+@pytest.fixture(scope="session")
+def investigation():
+    return load_service("investigation_app", "agents/investigation_agent")
+
+@pytest.fixture(scope="session")
+def remediation():
+    return load_service("remediation_app", "agents/remediation_agent")
@@ -0,0 +1,86 @@
+"""
+Deterministic generated inputs for the microbenchmarks.
+
+Every generator takes a size and a seed and returns the same data for the
+same arguments, so runs on different commits measure identical work.
+"""
+import random
+from typing import Dict, List
+
+# Event types roughly as they arrive from the SIEM: most match a category
+# keyword early, some late, and some none at all
+EVENT_TYPES = [
+    "failed_login", "authentication_failure", "password_spray", "malware_detected", "ransomware_activity",
+    "trojan_beacon", "firewall_deny", "network_connection_scan", "suspicious_traffic", "access_denied",
+    "permission_change", "host_reboot", "endpoint_isolation", "api_error", "service_crash", "file_deleted",
+    "database_dump", "policy_violation", "audit_log_cleared", "dns_tunnel", "beaconing", "exploit_attempt"
+]
+SEVERITIES = ["critical", "high", "medium", "moderate", "low", "info"]
+INDICATOR_TYPES = ["ip", "domain", "hash", "url", "user"]
+RISK_LEVELS = ["high", "medium", "low", "unknown"]
+ACTIONS = ["block_ip", "block_domain", "isolate_host", "reset_password", "run_scan", "escalate",
+           "monitor_indicator", "update_documentation"]
+PRIORITIES = ["high", "medium", "low"]
+
+def indicator_value(rng: random.Random, indicator_type: str) -> str:
+    if indicator_type == "ip":
+        return f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+    if indicator_type == "domain":
+        return f"host-{rng.randrange(16 ** 6):06x}.example.com"
+    if indicator_type == "hash":
+        return f"{rng.getrandbits(256):064x}"
+    if indicator_type == "url":
+        return f"https://host-{rng.randrange(16 ** 6):06x}.example.com/{rng.randrange(10 ** 6)}"
+    return f"user{rng.randrange(10 ** 4):04d}"
+
+def alerts(size: int, seed: int = 1) -> List[Dict]:
+    """Alerts with a mix of event types and zero to five indicators each."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        details = {"host": f"ws-{rng.randrange(1000):04d}", "message": "x" * rng.randint(20, 200)}
+        for indicator_type in rng.sample(INDICATOR_TYPES, rng.randint(0, len(INDICATOR_TYPES))):
+            details[indicator_type] = indicator_value(rng, indicator_type)
+        if rng.random() < 0.5:
+            details["severity"] = rng.choice(SEVERITIES)
+        if rng.random() < 0.2:
+            details["category"] = "Custom"
+        corpus.append({"source": "siem", "event_type": rng.choice(EVENT_TYPES), "timestamp": 1700000000.0,
+                       "details": details})
+    return corpus
+
+def indicators(size: int, seed: int = 1) -> List[Dict]:
+    rng = random.Random(seed)
+    return [{"type": indicator_type, "value": indicator_value(rng, indicator_type)}
+            for indicator_type in (rng.choice(INDICATOR_TYPES) for _ in range(size))]
+
+def threat_intel(indicator_list: List[Dict], coverage: float = 0.8, seed: int = 1) -> Dict:
+    """Enrichment results for a fraction of the indicators, in shuffled order."""
+    rng = random.Random(seed)
+    enriched = [
+        {**indicator, "description": "Generated analysis", "risk_level": rng.choice(RISK_LEVELS), "details": {}}
+        for indicator in indicator_list if rng.random() < coverage
+    ]
+    rng.shuffle(enriched)
+    return {"indicators": enriched, "sources": ["VirusTotal", "AbuseIPDB"], "timestamp": 1700000000.0}
+
+def findings(size: int, seed: int = 1) -> List[Dict]:
+    rng = random.Random(seed)
+    return [{"indicator": indicator, "analysis": "Generated analysis", "risk_level": rng.choice(RISK_LEVELS)}
+            for indicator in indicators(size, seed)]
+
+def action_plan(size: int, seed: int = 1) -> List[Dict]:
+    """Planned actions, mostly valid, some without a handler, a target or a description."""
+    rng = random.Random(seed)
+    plan = []
+    for position in range(size):
+        action = {"action": rng.choice(ACTIONS), "priority": rng.choice(PRIORITIES),
+                  "description": f"Generated action {position}"}
+        if rng.random() < 0.9:
+            action["target"] = indicator_value(rng, "ip")
+        if rng.random() < 0.1:
+            action["parameters"] = {"timeout": 5}
+        if rng.random() < 0.02:
+            action["priority"] = ["not", "a", "string"]
+        plan.append(action)
+    return plan
@@ -0,0 +1,271 @@
+"""
+Run the whole alert pipeline locally against stub downstreams.
+
+Stack starts every service the agent manager's /alert workflow touches as its
+own uvicorn process on a free local port. It also starts the stubs that
+replace their external dependencies:
+
+- benchmarks/stubs.py for the LLM, VirusTotal, AbuseIPDB, WHOIS and Slack
+- agents/remediation_agent/mock_firewall.py for the firewall API
+- an aiosmtpd SMTP sink, run in this process, for email
+
+Redis is not started. The services expect it on port 6379 of redis_host, so
+point the stack at a throwaway instance. SSH is left unconfigured, so host
+isolation and scans are reported as skipped.
+
+Each service writes its log, and its spans when tracing is on, to the work
+directory.
+
+Usage:
+    with Stack() as stack:
+        token = stack.login()
+        httpx.post(f"{stack.urls['agent-manager']}/alert", json=alert, headers={"Authorization": f"Bearer {token}"})
+"""
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import redis
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+REDIS_PORT = 6379  # hardcoded by most services
+
+# Services in start order: (name, directory); the auth service must be up
+# before the others fetch its signing keys
+SERVICES = [
+    ("auth-service", "MCP-Platform/auth_service"),
+    ("triage-agent", "agents/triage_agent"),
+    ("threat-intel-agent", "agents/threat_intel_agent"),
+    ("llm-orchestrator", "llm_orchestrator"),
+    ("investigation-agent", "agents/investigation_agent"),
+    ("remediation-agent", "agents/remediation_agent"),
+    ("notifications-service", "MCP-Platform/notifications"),
+    ("agent-manager", "agent_manager"),
+]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port: int, process: subprocess.Popen, name: str, timeout: float = 60):
+    """Wait until port accepts connections; uvicorn binds only after app startup has finished."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited during startup with status {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{name} did not start within {timeout:.0f}s")
+
+def process_usage(pid: int) -> Dict:
+    """CPU seconds, resident and peak resident memory of a process, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            fields = stat_file.read().rpartition(")")[2].split()
+        with open(f"/proc/{pid}/status") as status_file:
+            status = dict(line.split(":", 1) for line in status_file if ":" in line)
+    except OSError:
+        return {}
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK"),
+        "rss_mb": int(status["VmRSS"].split()[0]) / 1024,
+        "peak_rss_mb": int(status["VmHWM"].split()[0]) / 1024
+    }
+
+class SinkHandler:
+    """Accepts every message after latency seconds, counting messages and envelope recipients."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages = 0
+        self.recipients = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.messages += 1
+        self.recipients += len(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+def accept_any_login(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+class Stack:
+    """The alert pipeline's services and stub downstreams, each on a free local port."""
+
+    def __init__(self, redis_host: str = "127.0.0.1", llm_latency_ms: float = 800, intel_latency_ms: float = 150,
+                 firewall_latency_ms: float = 50, smtp_latency_ms: float = 20, slack_latency_ms: float = 100,
+                 tracing: bool = True, work_dir: Optional[str] = None, env: Optional[Dict[str, str]] = None):
+        self.redis_host = redis_host
+        self.llm_latency_ms = llm_latency_ms
+        self.intel_latency_ms = intel_latency_ms
+        self.firewall_latency_ms = firewall_latency_ms
+        self.slack_latency_ms = slack_latency_ms
+        self.tracing = tracing
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="mcp-stack-")
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.extra_env = env or {}
+        self.urls: Dict[str, str] = {}
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.sink = SinkHandler(smtp_latency_ms / 1000)
+        self._smtp: Optional[Controller] = None
+        self._logs: List = []
+
+    # Processes
+    def _spawn(self, name: str, module: str, cwd: str, env: Dict[str, str]) -> int:
+        port = free_port()
+        log = open(os.path.join(self.work_dir, f"{name}.log"), "w")
+        self._logs.append(log)
+        self.processes[name] = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        self.urls[name] = f"http://127.0.0.1:{port}"
+        return port
+
+    def _service_env(self, name: str) -> Dict[str, str]:
+        env = {key: value for key, value in os.environ.items() if not key.startswith("OTEL_EXPORTER_OTLP")}
+        env.update({
+            "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])),
+            "MEMORY_URL": f"redis://{self.redis_host}:{REDIS_PORT}",
+            "REDIS_HOST": self.redis_host,
+            "REDIS_PORT": str(REDIS_PORT),
+            "TRACING_ENABLED": "true" if self.tracing else "false",
+            "TRACE_FILE": self.trace_file(name),
+            # Keep every span: the default export queue drops spans under load
+            "OTEL_BSP_MAX_QUEUE_SIZE": "262144",
+            "OTEL_BSP_SCHEDULE_DELAY": "1000"
+        })
+        if name != "auth-service":
+            env["AUTH_JWKS_URL"] = f"{self.urls['auth-service']}/.well-known/jwks.json"
+        env.update(self.extra_env)
+        return env
+
+    def trace_file(self, name: str) -> str:
+        return os.path.join(self.work_dir, f"{name}.traces.jsonl")
+
+    def start(self):
+        try:
+            redis.Redis(host=self.redis_host, port=REDIS_PORT, socket_connect_timeout=2).ping()
+        except redis.RedisError as e:
+            raise RuntimeError(f"Redis is not reachable at {self.redis_host}:{REDIS_PORT}: {str(e)}")
+
+        # Stub downstreams
+        stub_env = {**os.environ, "MOCK_LLM_LATENCY_MS": str(self.llm_latency_ms),
+                    "MOCK_INTEL_LATENCY_MS": str(self.intel_latency_ms),
+                    "MOCK_SLACK_LATENCY_MS": str(self.slack_latency_ms)}
+        firewall_env = {**os.environ, "MOCK_FIREWALL_LATENCY_MS": str(self.firewall_latency_ms)}
+        pending = [
+            ("stubs", self._spawn("stubs", "stubs:app", BENCHMARKS_DIR, stub_env)),
+            ("mock-firewall", self._spawn("mock-firewall", "mock_firewall:app",
+                                          os.path.join(REPO_ROOT, "agents/remediation_agent"), firewall_env))
+        ]
+        smtp_port = free_port()
+        self._smtp = Controller(self.sink, hostname="127.0.0.1", port=smtp_port,
+                                authenticator=accept_any_login, auth_require_tls=False)
+        self._smtp.start()
+
+        stubs = self.urls["stubs"]
+        overrides = {
+            "threat-intel-agent": {
+                "VT_API_KEY": "stub", "ABUSEIPDB_API_KEY": "stub", "WHOIS_API_KEY": "stub",
+                "VIRUSTOTAL_API_URL": f"{stubs}/virustotal",
+                "ABUSEIPDB_API_URL": f"{stubs}/abuseipdb",
+                "WHOIS_API_URL": f"{stubs}/whois"
+            },
+            "llm-orchestrator": {"OPENAI_API_KEY": "stub", "OPENAI_BASE_URL": f"{stubs}/v1"},
+            "remediation-agent": {"FIREWALL_API_URL": self.urls["mock-firewall"], "FIREWALL_API_KEY": "stub"},
+            "notifications-service": {
+                "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": str(smtp_port), "SMTP_STARTTLS": "false",
+                "SMTP_USERNAME": "stub", "SMTP_PASSWORD": "stub",
+                "SLACK_WEBHOOK_URL": f"{stubs}/slack"
+            },
+            "auth-service": {"USER_DB_URL": f"sqlite:///{os.path.join(self.work_dir, 'users.db')}",
+                             "APP_ENV": "development"}
+        }
+
+        for name, directory in SERVICES:
+            if name == "agent-manager":
+                overrides[name] = {
+                    "TRIAGE_AGENT_URL": self.urls["triage-agent"],
+                    "THREAT_INTEL_AGENT_URL": self.urls["threat-intel-agent"],
+                    "INVESTIGATION_AGENT_URL": self.urls["investigation-agent"],
+                    "REMEDIATION_AGENT_URL": self.urls["remediation-agent"],
+                    "NOTIFICATIONS_SERVICE_URL": self.urls["notifications-service"]
+                }
+            elif name == "investigation-agent":
+                overrides[name] = {"LLM_ORCHESTRATOR_URL": self.urls["llm-orchestrator"]}
+            env = self._service_env(name)
+            env.update({key: value for key, value in overrides.get(name, {}).items() if key not in self.extra_env})
+            pending.append((name, self._spawn(name, "app:app", os.path.join(REPO_ROOT, directory), env)))
+            if name == "auth-service":
+                # Everything else fetches the auth service's keys at startup
+                for started, port in pending:
+                    wait_for_port(port, self.processes[started], started)
+                pending = []
+        for name, port in pending:
+            wait_for_port(port, self.processes[name], name)
+
+    def login(self, username: str = "analyst", password: str = "analyst") -> str:
+        """An access token from the auth service."""
+        response = httpx.post(f"{self.urls['auth-service']}/token",
+                              data={"username": username, "password": password}, timeout=30)
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    def usage(self) -> Dict[str, Dict]:
+        """Resource usage of every process in the stack."""
+        return {name: process_usage(process.pid) for name, process in self.processes.items()}
+
+    def stats(self) -> Dict[str, Dict]:
+        """What the stub downstreams received."""
+        return {
+            "stubs": httpx.get(f"{self.urls['stubs']}/stats").json(),
+            "firewall": httpx.get(f"{self.urls['mock-firewall']}/stats").json(),
+            "smtp": {"messages": self.sink.messages, "recipients": self.sink.recipients}
+        }
+
+    def stop(self, timeout: float = 15):
+        """Stop every process, letting services run their shutdown handlers (which flush spans)."""
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        deadline = time.time() + timeout
+        for process in self.processes.values():
+            try:
+                process.wait(max(0.1, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        self.processes = {}
+        if self._smtp is not None:
+            self._smtp.stop()
+            self._smtp = None
+        for log in self._logs:
+            log.close()
+        self._logs = []
+
+    def __enter__(self) -> "Stack":
+        try:
+            self.start()
+        except Exception:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
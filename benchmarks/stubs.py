@@ -0,0 +1,117 @@
+"""
+Stub downstream APIs for the pipeline benchmark.
+
+One app stands in for the external APIs the agents call, each with its own
+configurable latency:
+
+- an OpenAI-compatible chat completions endpoint (/v1/chat/completions)
+- VirusTotal (/virustotal/...), AbuseIPDB (/abuseipdb/check) and WHOIS (/whois)
+- a Slack incoming webhook (/slack)
+
+Verdicts are derived from a hash of the indicator, so an indicator always gets
+the same verdict and about MOCK_MALICIOUS_PERCENT of them are malicious. Every
+latency is scaled by a random factor in [1 - MOCK_JITTER, 1 + MOCK_JITTER].
+Requests are counted per endpoint on /stats.
+
+Usage:
+    MOCK_LLM_LATENCY_MS=800 MOCK_INTEL_LATENCY_MS=150 uvicorn stubs:app --port 9100
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+import asyncio
+import hashlib
+import os
+import random
+import time
+from collections import Counter
+
+app = FastAPI(title="Stub downstream APIs")
+
+LLM_LATENCY = float(os.getenv("MOCK_LLM_LATENCY_MS", "800")) / 1000
+LLM_COMPLETION_TOKENS = int(os.getenv("MOCK_LLM_COMPLETION_TOKENS", "200"))
+INTEL_LATENCY = float(os.getenv("MOCK_INTEL_LATENCY_MS", "150")) / 1000
+SLACK_LATENCY = float(os.getenv("MOCK_SLACK_LATENCY_MS", "100")) / 1000
+JITTER = float(os.getenv("MOCK_JITTER", "0.5"))
+MALICIOUS_PERCENT = int(os.getenv("MOCK_MALICIOUS_PERCENT", "20"))
+
+stats = Counter()
+
+async def delay(latency: float):
+    await asyncio.sleep(latency * random.uniform(1 - JITTER, 1 + JITTER))
+
+def score(value: str) -> int:
+    """Stable 0-99 score for an indicator; below MALICIOUS_PERCENT is malicious."""
+    return int(hashlib.sha256(value.encode()).hexdigest()[:8], 16) % 100
+
+# LLM
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await delay(LLM_LATENCY)
+    stats["llm"] += 1
+    prompt_tokens = sum(len(message.get("content", "")) for message in body.get("messages", [])) // 4
+    # Roughly one token per word, in lines of 12 words like a real answer's paragraphs
+    words = ["finding"] * (LLM_COMPLETION_TOKENS - 2)
+    content = "Stub analysis:\n" + "\n".join(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+    return {
+        "id": f"chatcmpl-stub{stats['llm']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": LLM_COMPLETION_TOKENS,
+            "total_tokens": prompt_tokens + LLM_COMPLETION_TOKENS
+        }
+    }
+
+# Threat intelligence
+@app.get("/virustotal/{kind}/{value:path}")
+async def virustotal(kind: str, value: str):
+    await delay(INTEL_LATENCY)
+    stats["virustotal"] += 1
+    malicious = 40 if score(value) < MALICIOUS_PERCENT else score(value) % 5
+    return {"data": {"id": value, "type": kind, "attributes": {
+        "last_analysis_stats": {"malicious": malicious, "suspicious": 0, "harmless": 70 - malicious, "undetected": 0},
+        "reputation": -malicious,
+        "tags": []
+    }}}
+
+@app.get("/abuseipdb/check")
+async def abuseipdb(ipAddress: str):
+    await delay(INTEL_LATENCY)
+    stats["abuseipdb"] += 1
+    confidence = 90 if score(ipAddress) < MALICIOUS_PERCENT else score(ipAddress) % 20
+    return {"data": {"ipAddress": ipAddress, "abuseConfidenceScore": confidence, "countryCode": "ZZ",
+                     "isp": "Stub ISP", "usageType": "Data Center/Web Hosting/Transit",
+                     "totalReports": confidence, "lastReportedAt": None}}
+
+@app.get("/whois")
+async def whois(domainName: str):
+    await delay(INTEL_LATENCY)
+    stats["whois"] += 1
+    return {"WhoisRecord": {"domainName": domainName, "registrarName": "Stub Registrar",
+                            "creationDate": "2024-01-01", "expirationDate": "2030-01-01",
+                            "nameServers": {"hostNames": ["ns1.example.net"]}}}
+
+# Notifications
+@app.post("/slack", response_class=PlainTextResponse)
+async def slack(request: Request):
+    await request.body()
+    await delay(SLACK_LATENCY)
+    stats["slack"] += 1
+    return "ok"
+
+@app.get("/stats")
+async def get_stats():
+    return dict(stats)
+
+@app.post("/reset")
+async def reset():
+    stats.clear()
+    return {"status": "reset"}
@@ -1,13 +1,24 @@
 from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 import os
 import redis
 import openai
 from typing import Optional, List
 import json
+import time
+from prometheus_client import Counter, Histogram
+from mcp_common.auth import get_current_user, install_auth
+from mcp_common.loop_monitor import setup_loop_monitor
+from mcp_common.metrics import LATENCY_BUCKETS, setup_metrics
+from mcp_common.profiling import setup_profiling
+from mcp_common.tracing import setup_tracing, span
 
 app = FastAPI(title="LLM Orchestrator")
+install_auth(app)
+setup_tracing(app, "llm-orchestrator")
+setup_metrics(app)
+setup_profiling(app)
+setup_loop_monitor(app)
 
 # Initialize Redis client
 redis_client = redis.Redis(
@@ -16,11 +27,36 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
-# Initialize OpenAI client
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# OpenAI client; OPENAI_BASE_URL points it at a compatible endpoint
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4")
+_llm_client: Optional[openai.AsyncOpenAI] = None
 
-# OAuth2 scheme for JWT validation
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
+def get_llm_client() -> openai.AsyncOpenAI:
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _llm_client
+
+# LLM metrics
+LLM_LATENCY = Histogram("llm_request_duration_seconds", "LLM completion latency", ["model", "operation", "outcome"],
+                        buckets=LATENCY_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens used", ["model", "operation", "type"])
+
+async def chat_completion(operation: str, messages: List[dict]):
+    """Call the chat completion API, recording latency and token usage."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with span("openai.chat_completion", model=LLM_MODEL, operation=operation):
+            response = await get_llm_client().chat.completions.create(model=LLM_MODEL, messages=messages)
+        outcome = "success"
+    finally:
+        LLM_LATENCY.labels(LLM_MODEL, operation, outcome).observe(time.perf_counter() - start)
+    usage = getattr(response, "usage", None)
+    if usage:
+        LLM_TOKENS.labels(LLM_MODEL, operation, "prompt").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels(LLM_MODEL, operation, "completion").inc(usage.completion_tokens)
+    return response
 
 class LLMRequest(BaseModel):
     prompt: str
@@ -31,16 +67,6 @@ class LLMResponse(BaseModel):
     response: str
     context_used: Optional[dict] = None
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    try:
-        # In a real implementation, validate JWT token
-        return "user"  # Simplified for demo
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
-
 @app.post("/ask", response_model=LLMResponse)
 async def ask_llm(
     request: LLMRequest,
@@ -65,13 +91,10 @@ async def ask_llm(
     
     try:
         # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a cybersecurity assistant helping with incident response."},
-                {"role": "user", "content": full_prompt}
-            ]
-        )
+        response = await chat_completion("ask", [
+            {"role": "system", "content": "You are a cybersecurity assistant helping with incident response."},
+            {"role": "user", "content": full_prompt}
+        ])
         
         answer = response.choices[0].message.content
         
@@ -112,13 +135,10 @@ async def analyze_log(
         Log data: {json.dumps(log_data)}
         """
         
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a security analyst analyzing log entries."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        response = await chat_completion("analyze_log", [
+            {"role": "system", "content": "You are a security analyst analyzing log entries."},
+            {"role": "user", "content": prompt}
+        ])
         
         return {
             "analysis": response.choices[0].message.content
@@ -0,0 +1,6 @@
+"""
+Code shared by the MCP services.
+
+Each service image copies this package next to its app.py (see the
+mcp_common build context in MCP-Platform/docker-compose.yml).
+"""
@@ -0,0 +1,325 @@
+"""
+Stateless JWT verification for the MCP services.
+
+Tokens are signed by the auth service with RS256. Every service verifies them
+locally with the public keys from the auth service's JWKS endpoint, which are
+fetched at startup and refreshed in the background. Verified claims are kept
+in an LRU keyed on the token's hash until the token expires, so a repeated
+token costs a hash and a dict lookup. Revoked tokens are tracked in a bloom
+filter of token ids (jti) that is rebuilt from Redis periodically and
+updated over pub/sub; only a filter hit is confirmed against Redis. All of a
+user's tokens are revoked at once by bumping the user's token generation:
+tokens carry the generation they were issued under in their gen claim, and
+services keep a local copy of the current generations.
+
+Usage in a service:
+
+    from mcp_common.auth import get_current_user, install_auth
+
+    install_auth(app)
+
+    @app.get("/things")
+    async def things(current_user: str = Depends(get_current_user)):
+        ...
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+import redis.asyncio
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwk, jwt
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+AUTH_JWKS_URL = os.getenv("AUTH_JWKS_URL", "http://auth-service:8000/.well-known/jwks.json")
+JWT_ALGORITHM = "RS256"
+JWT_ISSUER = os.getenv("JWT_ISSUER", "mcp-auth-service")
+JWKS_REFRESH_INTERVAL = int(os.getenv("JWKS_REFRESH_INTERVAL", "300"))  # seconds
+JWKS_MIN_REFRESH_INTERVAL = 30  # seconds between refreshes triggered by an unknown key id
+CLAIMS_CACHE_SIZE = int(os.getenv("CLAIMS_CACHE_SIZE", "10000"))
+REVOCATION_SYNC_INTERVAL = int(os.getenv("REVOCATION_SYNC_INTERVAL", "60"))  # seconds between full rebuilds
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_CAPACITY", "100000"))  # revoked tokens the filter is sized for
+REVOCATION_ERROR_RATE = 0.001
+
+# Revoked token ids, scored by the token's expiry
+REVOKED_KEY = "auth:revoked"
+REVOCATION_CHANNEL = "auth:revocations"
+# Per-user token generation; tokens issued under an older generation are revoked
+GENERATIONS_KEY = "auth:generations"
+GENERATION_CHANNEL = "auth:generations"
+
+REDIS_HOST = os.getenv("REDIS_HOST") or os.getenv("MEMORY_URL", "redis://memory:6379").split("://")[1].split(":")[0]
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://auth-service:8000/token")
+
+class InvalidToken(Exception):
+    """Raised when a token fails verification."""
+
+def token_id(token: str) -> str:
+    """Identifier used for caching: the SHA-256 of the token."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def revocation_id(token: str, claims: Dict) -> str:
+    """Identifier used for revocation: the jti claim, or the token hash for tokens without one."""
+    return claims.get("jti") or token_id(token)
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings, sized for capacity items at error_rate."""
+
+    def __init__(self, capacity: int = REVOCATION_CAPACITY, error_rate: float = REVOCATION_ERROR_RATE):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: position i is h1 + i * h2
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class JWTVerifier:
+    """Verifies access tokens locally against cached signing keys."""
+
+    def __init__(self, jwks_url: Optional[str] = AUTH_JWKS_URL, jwks: Optional[Dict] = None, issuer: str = JWT_ISSUER,
+                 cache_size: int = CLAIMS_CACHE_SIZE, redis_client: Optional[redis.asyncio.Redis] = None):
+        self.jwks_url = jwks_url
+        self.issuer = issuer
+        self.cache_size = cache_size
+        self.redis_client = redis_client
+        self._keys: Dict[str, jwk.Key] = {}
+        self._claims: "OrderedDict[str, Dict]" = OrderedDict()
+        self._last_refresh = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self.revoked = BloomFilter()
+        self._sync_lock = asyncio.Lock()
+        self._sync_buffers: List[List[str]] = []  # one per sync in flight
+        self.generations: Dict[str, int] = {}
+        if jwks:
+            self.set_keys(jwks)
+
+    def _redis(self) -> redis.asyncio.Redis:
+        if self.redis_client is None:
+            self.redis_client = redis.asyncio.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        return self.redis_client
+
+    # Signing keys
+    def set_keys(self, jwks: Dict):
+        """Replace the key set with the keys of a JWKS document."""
+        self._keys = {key["kid"]: jwk.construct(key, key.get("alg", JWT_ALGORITHM)) for key in jwks.get("keys", [])}
+
+    async def refresh_keys(self, force: bool = True) -> bool:
+        """Fetch the JWKS document. Unforced refreshes are limited to one per JWKS_MIN_REFRESH_INTERVAL."""
+        if not self.jwks_url:
+            return False
+        async with self._refresh_lock:
+            if not force and time.monotonic() - self._last_refresh < JWKS_MIN_REFRESH_INTERVAL:
+                return False
+            self._last_refresh = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=5) as client:
+                    response = await client.get(self.jwks_url)
+                    response.raise_for_status()
+                self.set_keys(response.json())
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to fetch signing keys from {self.jwks_url}: {str(e)}")
+                return False
+
+    # Verification
+    def _decode(self, token: str) -> Dict:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except JWTError as e:
+            raise InvalidToken(str(e))
+        key = self._keys.get(kid)
+        if key is None:
+            raise KeyError(kid)
+        try:
+            return jwt.decode(token, key, algorithms=[JWT_ALGORITHM], issuer=self.issuer,
+                              options={"verify_aud": False})
+        except JWTError as e:
+            raise InvalidToken(str(e))
+
+    async def verify(self, token: str) -> Dict:
+        """Return the claims of a valid, unexpired, unrevoked token or raise InvalidToken."""
+        tid = token_id(token)
+        claims = self._claims.get(tid)
+        if claims is not None and claims["exp"] > time.time():
+            self._claims.move_to_end(tid)
+        else:
+            try:
+                claims = self._decode(token)
+            except KeyError:
+                # Signed with a key we have not seen: the auth service may have rotated keys
+                await self.refresh_keys(force=False)
+                try:
+                    claims = self._decode(token)
+                except KeyError:
+                    raise InvalidToken("Unknown signing key")
+            self._claims[tid] = claims
+            if len(self._claims) > self.cache_size:
+                self._claims.popitem(last=False)
+
+        if claims.get("gen", 0) < self.generations.get(claims["sub"], 0) or \
+                await self.is_revoked(revocation_id(token, claims)):
+            self._claims.pop(tid, None)
+            raise InvalidToken("Token has been revoked")
+        return claims
+
+    # Revocation
+    async def is_revoked(self, revoked_id: str) -> bool:
+        if revoked_id not in self.revoked:
+            return False
+        # Possible hit: confirm against Redis, and treat an unreachable Redis as revoked
+        try:
+            expires = await self._redis().zscore(REVOKED_KEY, revoked_id)
+            return expires is not None and expires > time.time()
+        except Exception as e:
+            logger.warning(f"Could not confirm token revocation: {str(e)}")
+            return True
+
+    def revoke(self, revoked_id: str):
+        """Add a revocation published by the auth service."""
+        self.revoked.add(revoked_id)
+        for received in self._sync_buffers:
+            received.append(revoked_id)
+
+    async def sync_revocations(self):
+        """Rebuild the bloom filter and token generations from Redis.
+
+        Rebuilding drops expired revocations from the filter. Revocations and
+        generations received while the Redis reads are in flight may be missing
+        from what they return, so they are carried over into the result.
+        Concurrent calls run one after the other.
+        """
+        async with self._sync_lock:
+            client = self._redis()
+            now = time.time()
+            received: List[str] = []
+            self._sync_buffers.append(received)
+            try:
+                await client.zremrangebyscore(REVOKED_KEY, "-inf", now)
+                revoked = BloomFilter()
+                for revoked_id in await client.zrangebyscore(REVOKED_KEY, now, "+inf"):
+                    revoked.add(revoked_id)
+                stored = await client.hgetall(GENERATIONS_KEY)
+                for revoked_id in received:
+                    revoked.add(revoked_id)
+            finally:
+                self._sync_buffers.remove(received)
+            self.revoked = revoked
+            generations = {user: int(generation) for user, generation in stored.items()}
+            for user, generation in self.generations.items():
+                # Generations only move forward, so a newer one seen here wins
+                generations[user] = max(generations.get(user, 0), generation)
+            self.generations = generations
+
+    def apply_generation(self, message: str):
+        """Apply a "user:generation" message published by the auth service."""
+        user, _, generation = message.rpartition(":")
+        self.generations[user] = max(self.generations.get(user, 0), int(generation))
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await self.sync_revocations()
+            except Exception as e:
+                logger.warning(f"Revocation sync failed: {str(e)}")
+            await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
+
+    async def _listen(self):
+        """Add revocations published by the auth service as they happen."""
+        while True:
+            pubsub = self._redis().pubsub()
+            try:
+                await pubsub.subscribe(REVOCATION_CHANNEL, GENERATION_CHANNEL)
+                # Catch anything revoked while we were not subscribed
+                await self.sync_revocations()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    if message["channel"] == GENERATION_CHANNEL:
+                        self.apply_generation(message["data"])
+                    else:
+                        self.revoke(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Revocation listener error: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def _key_loop(self):
+        while True:
+            await asyncio.sleep(JWKS_REFRESH_INTERVAL)
+            await self.refresh_keys()
+
+    async def start(self):
+        if self.jwks_url:
+            await self.refresh_keys()
+            self._tasks.append(asyncio.create_task(self._key_loop()))
+        self._tasks.append(asyncio.create_task(self._sync_loop()))
+        self._tasks.append(asyncio.create_task(self._listen()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.redis_client is not None:
+            await self.redis_client.aclose()
+            self.redis_client = None
+
+verifier = JWTVerifier()
+
+def install_auth(app: FastAPI, token_verifier: Optional[JWTVerifier] = None):
+    """Start and stop the verifier's key refresh and revocation sync with the app."""
+    token_verifier = token_verifier or verifier
+    app.add_event_handler("startup", token_verifier.start)
+    app.add_event_handler("shutdown", token_verifier.stop)
+
+async def get_current_claims(token: str = Depends(oauth2_scheme)) -> Dict:
+    try:
+        return await verifier.verify(token)
+    except InvalidToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+async def get_current_user(claims: Dict = Depends(get_current_claims)) -> str:
+    return claims["sub"]
+
+def require_roles(*roles: str):
+    """Dependency that allows only callers with at least one of roles."""
+    async def role_checker(claims: Dict = Depends(get_current_claims)) -> Dict:
+        if not set(claims.get("roles", [])).intersection(roles):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        return claims
+    return role_checker
@@ -0,0 +1,297 @@
+"""
+Redis Streams event bus between the alert pipeline's agents.
+
+With EVENT_BUS_ENABLED, alerts flow through the pipeline as events instead of
+HTTP calls chained by the agent manager. The agent manager publishes each
+alert to the triage stream. Every stage in PIPELINE consumes its own stream
+through a consumer group, stores its result under alert:<id>:<stage> like the
+HTTP workflow does, and publishes the alert with the results so far to the
+next stage's stream. Remediation publishes to the completed stream, which the
+agent manager consumes to send the notification.
+
+Each stage's stream is shared by every replica of its agent, so stages scale
+independently and their backlog is visible per stream (see stats()).
+Delivery is at least once:
+
+- entries are acknowledged only after the next stage's event is published
+- entries whose handler failed, or whose consumer died, stay pending and are
+  reclaimed after EVENT_RETRY_IDLE_MS
+- after EVENT_MAX_DELIVERIES attempts an entry is moved to the dead-letter
+  stream and the alert is marked failed
+
+Events carry the W3C trace context, so an alert is still one trace, and the
+submitter's token, which stages forward to the services they call. So that
+tokens are not left lying in Redis, entries are deleted from their stream
+once acknowledged and dead-lettered copies are stored without the token.
+
+Usage in an agent:
+
+    from mcp_common.event_bus import setup_event_stage
+
+    async def handle_triage_event(alert_id: str, event: Dict, token: Optional[str]) -> Dict:
+        return triage(Alert(**event["alert"])).dict()
+
+    setup_event_stage(app, "triage", handle_triage_event)
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis
+import redis.asyncio
+from fastapi import FastAPI
+from opentelemetry import propagate, trace
+from prometheus_client import Counter, Histogram
+
+from mcp_common.metrics import LATENCY_BUCKETS
+from mcp_common.tracing import set_alert_id, tracer
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EVENT_BUS_ENABLED = os.getenv("EVENT_BUS_ENABLED", "false").lower() == "true"
+EVENT_WORKERS = int(os.getenv("EVENT_WORKERS", "1"))  # consumers in this process
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "10"))
+EVENT_MAX_DELIVERIES = int(os.getenv("EVENT_MAX_DELIVERIES", "5"))
+EVENT_RETRY_IDLE_MS = int(os.getenv("EVENT_RETRY_IDLE_MS", "30000"))  # failed or orphaned entries are retried after this
+EVENT_STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "100000"))
+EVENT_BLOCK_MS = 1000
+
+# Stages in processing order; each consumes the stream named after it
+PIPELINE = ["triage", "threat_intel", "investigation", "remediation"]
+COMPLETED = "completed"
+EVENT_STREAM_PREFIX = "alerts:stream"
+EVENT_DEAD_LETTER_STREAM = "alerts:stream:dead"
+
+REDIS_HOST = os.getenv("REDIS_HOST") or os.getenv("MEMORY_URL", "redis://memory:6379").split("://")[1].split(":")[0]
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+
+EVENTS = Counter("event_bus_events_total", "Events handled by pipeline stages", ["stage", "outcome"])
+EVENT_WAIT = Histogram("event_bus_wait_seconds", "Time events spent in a stage's stream before being handled",
+                       ["stage"], buckets=LATENCY_BUCKETS)
+EVENT_LATENCY = Histogram("event_bus_processing_seconds", "Time a stage took to handle an event", ["stage"],
+                          buckets=LATENCY_BUCKETS)
+
+# handler(alert_id, event, token) -> the stage's result
+StageHandler = Callable[[str, Dict, Optional[str]], Awaitable[Dict]]
+
+_client: Optional[redis.asyncio.Redis] = None
+
+def get_client() -> redis.asyncio.Redis:
+    global _client
+    if _client is None:
+        _client = redis.asyncio.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    return _client
+
+def stream(stage: str) -> str:
+    return f"{EVENT_STREAM_PREFIX}:{stage}"
+
+def next_stage(stage: str) -> Optional[str]:
+    """The stage after stage, COMPLETED after the last one, and None after COMPLETED."""
+    if stage == COMPLETED:
+        return None
+    position = PIPELINE.index(stage)
+    return PIPELINE[position + 1] if position + 1 < len(PIPELINE) else COMPLETED
+
+def status_key(alert_id: str) -> str:
+    return f"alert:{alert_id}:status"
+
+async def publish(stage: str, alert_id: str, event: Dict, token: Optional[str] = None,
+                  client: Optional[redis.asyncio.Redis] = None) -> str:
+    """Add an alert's event to stage's stream and record stage as the alert's status."""
+    client = client or get_client()
+    fields = {"alert_id": alert_id, "payload": json.dumps(event), "published_at": str(time.time())}
+    if token:
+        fields["token"] = token
+    propagate.inject(fields)
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.xadd(stream(stage), fields, maxlen=EVENT_STREAM_MAXLEN, approximate=True)
+        pipe.set(status_key(alert_id), stage)
+        entry_id, _ = await pipe.execute()
+    return entry_id
+
+async def stats(client: Optional[redis.asyncio.Redis] = None) -> Dict:
+    """Per-stage backlog, pending entries and lag of every consumer group, plus the dead-letter length."""
+    client = client or get_client()
+    stages = {}
+    for stage in PIPELINE + [COMPLETED]:
+        stage_stats = {"length": await client.xlen(stream(stage)), "groups": {}}
+        try:
+            groups = await client.xinfo_groups(stream(stage))
+        except redis.exceptions.ResponseError:
+            groups = []  # stream not created yet
+        for group in groups:
+            oldest_pending_ms = 0
+            if group["pending"]:
+                oldest = await client.xpending_range(stream(stage), group["name"], min="-", max="+", count=1)
+                oldest_pending_ms = oldest[0]["time_since_delivered"] if oldest else 0
+            stage_stats["groups"][group["name"]] = {
+                "consumers": group["consumers"],
+                "pending": group["pending"],
+                "lag": group.get("lag"),  # entries not yet read by the group (Redis 7+)
+                "oldest_pending_ms": oldest_pending_ms
+            }
+        stages[stage] = stage_stats
+    return {"stages": stages, "dead_letter_length": await client.xlen(EVENT_DEAD_LETTER_STREAM)}
+
+class StageConsumer:
+    """Consumes a stage's stream through a consumer group and hands each alert to the next stage.
+
+    Modelled on the notification queue: entries are acknowledged and deleted
+    once handled and the next event published, failed entries are reclaimed
+    and retried after retry_idle_ms, and entries that keep failing are
+    dead-lettered.
+    """
+
+    def __init__(self, stage: str, handler: StageHandler, group: Optional[str] = None,
+                 client: Optional[redis.asyncio.Redis] = None, max_deliveries: int = EVENT_MAX_DELIVERIES,
+                 retry_idle_ms: int = EVENT_RETRY_IDLE_MS):
+        self.stage = stage
+        self.handler = handler
+        self.stream = stream(stage)
+        self.group = group or f"{stage}-workers"
+        self.client = client
+        self.max_deliveries = max_deliveries
+        self.retry_idle_ms = retry_idle_ms
+        self.consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+
+    def _client(self) -> redis.asyncio.Redis:
+        return self.client or get_client()
+
+    async def _done(self, entry_id: str):
+        """Acknowledge an entry and delete it, and the token it carries, from the stream."""
+        async with self._client().pipeline(transaction=False) as pipe:
+            pipe.xack(self.stream, self.group, entry_id)
+            pipe.xdel(self.stream, entry_id)
+            await pipe.execute()
+
+    async def ensure_group(self):
+        try:
+            await self._client().xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _read(self, consumer: str) -> List[Tuple[str, Dict, int]]:
+        response = await self._client().xreadgroup(self.group, consumer, {self.stream: ">"},
+                                                   count=EVENT_BATCH_SIZE, block=EVENT_BLOCK_MS)
+        return [(entry_id, fields, 1) for _, entries in response or [] for entry_id, fields in entries]
+
+    async def _reclaim(self, consumer: str) -> List[Tuple[str, Dict, int]]:
+        """Take over entries that have been pending longer than retry_idle_ms."""
+        client = self._client()
+        response = await client.xautoclaim(self.stream, self.group, consumer, self.retry_idle_ms,
+                                           start_id="0-0", count=EVENT_BATCH_SIZE)
+        reclaimed = []
+        for entry_id, fields in response[1]:
+            if not fields:
+                # Trimmed from the stream while pending
+                await client.xack(self.stream, self.group, entry_id)
+                continue
+            pending = await client.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+            reclaimed.append((entry_id, fields, pending[0]["times_delivered"] if pending else 1))
+        return reclaimed
+
+    async def _dead_letter(self, entry_id: str, fields: Dict, reason: str):
+        client = self._client()
+        alert_id = fields["alert_id"]
+        kept = {key: value for key, value in fields.items() if key != "token"}
+        await client.xadd(EVENT_DEAD_LETTER_STREAM, {**kept, "stage": self.stage, "entry_id": entry_id,
+                                                     "reason": reason},
+                          maxlen=EVENT_STREAM_MAXLEN, approximate=True)
+        await client.set(f"alert:{alert_id}:error", f"{self.stage}: {reason}")
+        if self.stage != COMPLETED:
+            # Let the agent manager report the failure
+            event = {**json.loads(fields["payload"]), "error": f"{self.stage}: {reason}"}
+            await publish(COMPLETED, alert_id, event, fields.get("token"), client)
+        await client.set(status_key(alert_id), "failed")
+        await self._done(entry_id)
+        EVENTS.labels(self.stage, "dead_lettered").inc()
+        logger.error(f"Alert {alert_id} dead-lettered at {self.stage}: {reason}")
+
+    async def _handle(self, entry_id: str, fields: Dict, deliveries: int):
+        alert_id = fields.get("alert_id")
+        if not alert_id or "payload" not in fields:
+            await self._done(entry_id)
+            logger.error(f"Dropped malformed {self.stage} event {entry_id}")
+            return
+        if deliveries > self.max_deliveries:
+            await self._dead_letter(entry_id, fields, f"Failed after {deliveries - 1} attempts")
+            return
+
+        EVENT_WAIT.labels(self.stage).observe(max(0.0, time.time() - float(fields.get("published_at", time.time()))))
+        start = time.perf_counter()
+        with tracer.start_as_current_span(f"{self.stage} process", context=propagate.extract(fields),
+                                          kind=trace.SpanKind.CONSUMER):
+            set_alert_id(alert_id)
+            try:
+                event = json.loads(fields["payload"])
+                result = await self.handler(alert_id, event, fields.get("token"))
+                following = next_stage(self.stage)
+                if following is not None:
+                    await self._client().set(f"alert:{alert_id}:{self.stage}", json.dumps(result))
+                    await publish(following, alert_id, {**event, self.stage: result}, fields.get("token"),
+                                  self._client())
+            except Exception as e:
+                # Leave the entry pending; it is reclaimed and retried after retry_idle_ms
+                logger.error(f"Error handling {self.stage} event for alert {alert_id}: {str(e)}")
+                EVENTS.labels(self.stage, "failed").inc()
+                if deliveries >= self.max_deliveries:
+                    await self._dead_letter(entry_id, fields, f"Failed after {deliveries} attempts: {str(e)}")
+                return
+            finally:
+                EVENT_LATENCY.labels(self.stage).observe(time.perf_counter() - start)
+
+        await self._done(entry_id)
+        EVENTS.labels(self.stage, "processed").inc()
+
+    async def consume(self, consumer: str):
+        """Process entries until cancelled."""
+        group_ready = False
+        next_reclaim = 0.0
+        while True:
+            try:
+                if not group_ready:
+                    await self.ensure_group()
+                    group_ready = True
+                entries = []
+                if time.monotonic() >= next_reclaim:
+                    # Scheduled first, so a failing reclaim does not hold up new entries
+                    next_reclaim = time.monotonic() + self.retry_idle_ms / 2000
+                    entries = await self._reclaim(consumer)
+                entries = entries or await self._read(consumer)
+                await asyncio.gather(*(self._handle(*entry) for entry in entries))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if "NOGROUP" in str(e):
+                    # The stream or group is gone, e.g. Redis restarted without persistence
+                    group_ready = False
+                logger.error(f"{self.stage} consumer {consumer} error: {str(e)}")
+                await asyncio.sleep(1)
+
+    def start(self, workers: int = EVENT_WORKERS):
+        for index in range(workers):
+            consumer = f"{self.consumer_prefix}-{index}"
+            self._tasks.append(asyncio.create_task(self.consume(consumer)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+def setup_event_stage(app: FastAPI, stage: str, handler: StageHandler,
+                      enabled: bool = EVENT_BUS_ENABLED) -> Optional[StageConsumer]:
+    """Consume stage's stream with handler while app runs, when the event bus is enabled."""
+    if not enabled:
+        return None
+    consumer = StageConsumer(stage, handler)
+    app.add_event_handler("startup", consumer.start)
+    app.add_event_handler("shutdown", consumer.stop)
+    return consumer
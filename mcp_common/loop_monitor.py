@@ -0,0 +1,167 @@
+"""
+Event-loop blocking detector for the MCP services.
+
+setup_loop_monitor() watches the event loop of a FastAPI app:
+
+- a heartbeat task on the loop wakes every LOOP_MONITOR_INTERVAL_MS and
+  records how late it woke in event_loop_lag_seconds
+- a watchdog thread notices when the heartbeat is more than
+  LOOP_BLOCK_THRESHOLD_MS overdue. It then grabs the loop thread's stack
+  while it is still blocked, logs it, and counts the event against the call
+  site in event_loop_blocks_total. The call site is the innermost frame in
+  the repository's own code, so a blocking redis-py or smtplib call is
+  attributed to the handler line that made it
+
+GET /debug/blocking (admin only) ranks the call sites by the total time they
+have blocked the loop, each with the last stack seen there.
+
+Usage in a service:
+
+    from mcp_common.loop_monitor import setup_loop_monitor
+
+    setup_loop_monitor(app)
+"""
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, FastAPI
+from prometheus_client import Counter, Histogram
+
+from mcp_common.auth import require_roles
+from mcp_common.profiling import frame_label
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL_MS = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))  # time between heartbeats
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))  # lag reported as a block
+
+LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop ran the monitor's heartbeat",
+                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+LOOP_BLOCKS = Counter("event_loop_blocks_total", "Times the event loop was blocked beyond the threshold",
+                      ["site"])
+
+# Frames from these directories are library code, never a call site
+LIBRARY_PATHS = tuple({sysconfig.get_path(name) for name in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+def is_library(filename: str) -> bool:
+    return filename.startswith(LIBRARY_PATHS) or filename == __file__ or not filename.endswith(".py")
+
+def call_site(frame) -> str:
+    """The innermost frame outside library code, or the innermost frame if there is none."""
+    innermost = frame
+    while frame is not None:
+        if not is_library(frame.f_code.co_filename):
+            return frame_label(frame)
+        frame = frame.f_back
+    return frame_label(innermost) if innermost is not None else "unknown"
+
+class LoopMonitor:
+    """Measures a loop's lag from a heartbeat task and reports blocks from a watchdog thread."""
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL_MS / 1000,
+                 threshold: float = LOOP_BLOCK_THRESHOLD_MS / 1000):
+        self.interval = interval
+        self.threshold = threshold
+        self.sites: Dict[str, Dict] = {}
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._reported_beat: Optional[float] = None
+        self._blocked_site: Optional[str] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            LOOP_LAG.observe(lag)
+            self._last_beat = now
+            if self._blocked_site is not None:
+                # The block the watchdog reported is over; lag is how long it lasted
+                site = self.sites[self._blocked_site]
+                site["blocked_seconds"] += lag
+                site["max_seconds"] = max(site["max_seconds"], lag)
+                self._blocked_site = None
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._last_beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue > self.threshold and beat != self._reported_beat:
+                self._reported_beat = beat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self.report(frame, overdue)
+
+    def report(self, frame, blocked: float):
+        """Log the stack of a blocked loop and count it against its call site."""
+        site = call_site(frame)
+        stack = "".join(traceback.format_stack(frame))
+        logger.warning(f"Event loop blocked for over {blocked * 1000:.0f} ms at {site}\n{stack}")
+        LOOP_BLOCKS.labels(site).inc()
+        entry = self.sites.setdefault(site, {"count": 0, "blocked_seconds": 0.0, "max_seconds": 0.0})
+        entry["count"] += 1
+        entry["stack"] = stack
+        self._blocked_site = site
+
+    def ranking(self) -> List[Dict]:
+        """Call sites by the total time they blocked the loop, longest first."""
+        ranked = sorted(self.sites.items(), key=lambda item: item[1]["blocked_seconds"], reverse=True)
+        return [{
+            "site": site,
+            "count": entry["count"],
+            "blocked_ms": round(entry["blocked_seconds"] * 1000, 1),
+            "max_ms": round(entry["max_seconds"] * 1000, 1),
+            "stack": entry["stack"]
+        } for site, entry in ranked]
+
+    async def start(self):
+        """Start monitoring the running loop; call from a coroutine on that loop."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+monitor = LoopMonitor()
+
+router = APIRouter(prefix="/debug", dependencies=[Depends(require_roles("admin"))])
+
+@router.get("/blocking")
+async def blocking():
+    """Call sites that blocked the event loop, ranked by total blocked time."""
+    return {"threshold_ms": monitor.threshold * 1000, "sites": monitor.ranking()}
+
+def setup_loop_monitor(app: FastAPI, enabled: bool = LOOP_MONITOR_ENABLED):
+    """Monitor app's event loop while it runs and serve the ranking on /debug/blocking."""
+    if not enabled:
+        return
+    app.add_event_handler("startup", monitor.start)
+    app.add_event_handler("shutdown", monitor.stop)
+    app.include_router(router, include_in_schema=False)
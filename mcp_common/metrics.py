@@ -0,0 +1,147 @@
+"""
+Prometheus metrics for the MCP services.
+
+setup_metrics() adds a /metrics endpoint to a FastAPI app and records, for
+every service:
+
+- http_requests_total and http_request_duration_seconds per method, route
+  template and status, and http_requests_in_progress per method
+- downstream_request_duration_seconds for every httpx request, per target
+  host and status
+- redis_command_duration_seconds for every redis-py command (sync and
+  asyncio), per command; pipelines are recorded as PIPELINE
+
+Service-specific metrics (LLM tokens, connector queries, deliveries, ...)
+are declared in the services themselves with prometheus_client.
+
+Usage in a service:
+
+    from mcp_common.metrics import setup_metrics
+
+    setup_metrics(app)
+"""
+import time
+
+import httpx
+import redis
+import redis.asyncio
+from fastapi import FastAPI, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Buckets from 5 ms to 30 s, covering both Redis-backed handlers and LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests handled", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"],
+                         buckets=LATENCY_BUCKETS)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being handled", ["method"])
+DOWNSTREAM_LATENCY = Histogram("downstream_request_duration_seconds", "Outgoing HTTP request latency",
+                               ["target", "status"], buckets=LATENCY_BUCKETS)
+REDIS_LATENCY = Histogram("redis_command_duration_seconds", "Redis command latency", ["command"],
+                          buckets=REDIS_BUCKETS)
+
+def route_template(request: Request) -> str:
+    """The matched route's path template, so /alert/{alert_id} is one series rather than one per alert."""
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def setup_metrics(app: FastAPI):
+    """Record request metrics for app, serve them on /metrics, and time httpx and Redis calls."""
+
+    @app.middleware("http")
+    async def record_request(request: Request, call_next):
+        if request.url.path == "/metrics":
+            return await call_next(request)
+        method = request.method
+        HTTP_IN_PROGRESS.labels(method).inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = route_template(request)
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_IN_PROGRESS.labels(method).dec()
+
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+    instrument_clients()
+
+_instrumented = False
+
+def instrument_clients():
+    """Wrap httpx and redis-py so every client in the process is timed. Safe to call more than once."""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    async_send = httpx.AsyncClient.send
+    sync_send = httpx.Client.send
+
+    async def timed_async_send(self, request, *args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await async_send(self, request, *args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            DOWNSTREAM_LATENCY.labels(request.url.host, status).observe(time.perf_counter() - start)
+
+    def timed_sync_send(self, request, *args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = sync_send(self, request, *args, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            DOWNSTREAM_LATENCY.labels(request.url.host, status).observe(time.perf_counter() - start)
+
+    httpx.AsyncClient.send = timed_async_send
+    httpx.Client.send = timed_sync_send
+
+    sync_execute = redis.Redis.execute_command
+    async_execute = redis.asyncio.Redis.execute_command
+    sync_pipeline = redis.client.Pipeline.execute
+    async_pipeline = redis.asyncio.client.Pipeline.execute
+
+    def timed_execute(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return sync_execute(self, *args, **options)
+        finally:
+            REDIS_LATENCY.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+    async def timed_async_execute(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await async_execute(self, *args, **options)
+        finally:
+            REDIS_LATENCY.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+    def timed_pipeline(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return sync_pipeline(self, *args, **kwargs)
+        finally:
+            REDIS_LATENCY.labels("PIPELINE").observe(time.perf_counter() - start)
+
+    async def timed_async_pipeline(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await async_pipeline(self, *args, **kwargs)
+        finally:
+            REDIS_LATENCY.labels("PIPELINE").observe(time.perf_counter() - start)
+
+    redis.Redis.execute_command = timed_execute
+    redis.asyncio.Redis.execute_command = timed_async_execute
+    redis.client.Pipeline.execute = timed_pipeline
+    redis.asyncio.client.Pipeline.execute = timed_async_pipeline
@@ -0,0 +1,160 @@
+"""
+On-demand profiling endpoints for the MCP services.
+
+setup_profiling() adds admin-only endpoints under /debug to a FastAPI app when
+PROFILING_ENABLED is true:
+
+- GET /debug/profile samples the stacks of the running worker for a bounded
+  number of seconds and returns them as collapsed stacks, one
+  "frame;frame;frame count" line per distinct stack. The output can be fed
+  straight to flamegraph.pl or speedscope
+- GET /debug/tasks lists the asyncio tasks of the event loop, each with the
+  chain of coroutines it is awaiting down to where it is suspended
+- GET /debug/loop-lag measures how late the event loop runs callbacks for a
+  bounded number of seconds
+
+Nothing runs between requests: the sampler is a thread that exists only for
+the duration of a profile, and lag is measured only while it is asked for.
+
+Usage in a service:
+
+    from mcp_common.profiling import setup_profiling
+
+    setup_profiling(app)
+
+    curl -H "Authorization: Bearer $ADMIN_TOKEN" "http://service:8000/debug/profile?seconds=30" > profile.txt
+    flamegraph.pl profile.txt > profile.svg
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from mcp_common.auth import require_roles
+
+# Configuration
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))  # default time between samples
+MAX_STACK_DEPTH = 128
+
+class StackSampler:
+    """Samples the stacks of threads at a fixed interval and counts each distinct stack."""
+
+    def __init__(self, interval: float, thread_ids: Optional[List[int]] = None):
+        self.interval = interval
+        self.thread_ids = thread_ids  # None samples every thread but the sampler's own
+        self.stacks = Counter()
+        self.samples = 0
+
+    def sample(self):
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                continue
+            self.stacks[collapse(frame)] += 1
+        self.samples += 1
+
+    def run(self, seconds: float):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            self.sample()
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        """The samples in collapsed stack format, most frequent stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+def collapse(frame) -> str:
+    """A frame and its callers as one line, outermost caller first."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+def await_stack(coro) -> List[str]:
+    """The chain of coroutines coro is awaiting, outermost first, down to where it is suspended."""
+    labels = []
+    while coro is not None and len(labels) < MAX_STACK_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        labels.append(frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return labels
+
+def describe_task(task: asyncio.Task) -> Dict:
+    coro = task.get_coro()
+    return {
+        "name": task.get_name(),
+        "coroutine": getattr(coro, "__qualname__", repr(coro)),
+        "state": "done" if task.done() else "pending",
+        "stack": await_stack(coro)
+    }
+
+async def measure_loop_lag(seconds: float, interval: float) -> Dict:
+    """How late the loop wakes from sleeps of interval seconds, over seconds."""
+    loop = asyncio.get_running_loop()
+    lags = []
+    deadline = loop.time() + seconds
+    while loop.time() < deadline:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - start - interval))
+    lags.sort()
+    return {
+        "samples": len(lags),
+        "interval_ms": interval * 1000,
+        "mean_ms": sum(lags) / len(lags) * 1000,
+        "p50_ms": lags[len(lags) // 2] * 1000,
+        "p99_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000,
+        "max_ms": lags[-1] * 1000
+    }
+
+router = APIRouter(prefix="/debug", dependencies=[Depends(require_roles("admin"))])
+_profile_lock = asyncio.Lock()
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = Query(10, gt=0), interval_ms: float = Query(PROFILE_INTERVAL_MS, ge=1),
+                  all_threads: bool = False):
+    """Sample the worker's stacks for seconds and return them as collapsed stacks."""
+    if seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {PROFILE_MAX_SECONDS:g}")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with _profile_lock:
+        # This handler runs on the event loop's thread, which is the one to sample
+        sampler = StackSampler(interval_ms / 1000, None if all_threads else [threading.get_ident()])
+        await asyncio.to_thread(sampler.run, seconds)
+    return PlainTextResponse(sampler.collapsed(), headers={"X-Profile-Samples": str(sampler.samples)})
+
+@router.get("/tasks")
+async def tasks():
+    """Every asyncio task of the event loop and where it is suspended."""
+    current = asyncio.current_task()
+    described = [describe_task(task) for task in asyncio.all_tasks() if task is not current]
+    described.sort(key=lambda task: task["coroutine"])
+    return {"count": len(described), "tasks": described}
+
+@router.get("/loop-lag")
+async def loop_lag(seconds: float = Query(1, gt=0), interval_ms: float = Query(10, ge=1)):
+    """How late the event loop runs callbacks, measured for seconds."""
+    if seconds > PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {PROFILE_MAX_SECONDS:g}")
+    return await measure_loop_lag(seconds, interval_ms / 1000)
+
+def setup_profiling(app: FastAPI, enabled: bool = PROFILING_ENABLED):
+    """Add the /debug profiling endpoints to app when profiling is enabled."""
+    if enabled:
+        app.include_router(router, include_in_schema=False)
@@ -0,0 +1,226 @@
+import asyncio
+import base64
+import secrets
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+import mcp_common.auth as auth
+from mcp_common.auth import GENERATIONS_KEY, REVOKED_KEY, BloomFilter, InvalidToken, JWTVerifier, revocation_id, token_id
+
+class MockRedis:
+    """In-memory stand-in for the sorted-set calls the verifier makes."""
+
+    def __init__(self):
+        self.zsets = {}
+        self.hashes = {}
+        self.zscore_calls = 0
+
+    async def zscore(self, key, member):
+        self.zscore_calls += 1
+        return self.zsets.get(key, {}).get(member)
+
+    async def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    async def zrangebyscore(self, key, low, high):
+        return [m for m, score in self.zsets.get(key, {}).items() if score >= low]
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def revoke(self, token, exp):
+        claims = jwt.get_unverified_claims(token)
+        self.zsets.setdefault(REVOKED_KEY, {})[revocation_id(token, claims)] = exp
+
+def _b64(number):
+    return base64.urlsafe_b64encode(number.to_bytes((number.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode()
+    numbers = private_key.public_key().public_numbers()
+    return pem, {"kty": "RSA", "alg": "RS256", "kid": kid, "n": _b64(numbers.n), "e": _b64(numbers.e)}
+
+PEM, JWK = make_key("test-key")
+
+def make_token(pem=PEM, kid="test-key", sub="analyst", exp_in=300, issuer=auth.JWT_ISSUER, **claims):
+    payload = {"sub": sub, "roles": ["analyst"], "iss": issuer, "exp": int(time.time()) + exp_in,
+               "jti": secrets.token_urlsafe(16), **claims}
+    return jwt.encode(payload, pem, algorithm="RS256", headers={"kid": kid})
+
+@pytest.fixture
+def store():
+    return MockRedis()
+
+@pytest.fixture
+def verifier(store):
+    return JWTVerifier(jwks_url=None, jwks={"keys": [JWK]}, redis_client=store)
+
+def test_valid_token_is_verified_and_cached(verifier, monkeypatch):
+    token = make_token()
+    claims = asyncio.run(verifier.verify(token))
+    assert claims["sub"] == "analyst"
+
+    # A repeated token is served from the claims cache without decoding
+    monkeypatch.setattr(verifier, "_decode", lambda token: pytest.fail("token decoded twice"))
+    assert asyncio.run(verifier.verify(token)) == claims
+
+@pytest.mark.parametrize("token", [
+    make_token(exp_in=-10),
+    make_token(issuer="someone-else"),
+    make_token(pem=make_key("test-key")[0]),
+    "not-a-jwt"
+])
+def test_invalid_tokens_are_rejected(verifier, token):
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(token))
+
+def test_cached_claims_expire_with_the_token(verifier):
+    token = make_token(exp_in=1)
+    asyncio.run(verifier.verify(token))
+    time.sleep(2.1)
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(token))
+
+def test_claims_cache_is_bounded(store):
+    verifier = JWTVerifier(jwks_url=None, jwks={"keys": [JWK]}, cache_size=2, redis_client=store)
+    tokens = [make_token(sub=f"user{i}") for i in range(3)]
+    for token in tokens:
+        asyncio.run(verifier.verify(token))
+    assert list(verifier._claims) == [token_id(token) for token in tokens[1:]]
+
+def test_unknown_key_triggers_refresh(verifier, monkeypatch):
+    pem, new_jwk = make_key("rotated")
+
+    async def refresh_keys(force=True):
+        verifier.set_keys({"keys": [JWK, new_jwk]})
+        return True
+
+    monkeypatch.setattr(verifier, "refresh_keys", refresh_keys)
+    claims = asyncio.run(verifier.verify(make_token(pem=pem, kid="rotated")))
+    assert claims["sub"] == "analyst"
+
+def test_revoked_token_is_rejected_after_sync(verifier, store):
+    token = make_token()
+    asyncio.run(verifier.verify(token))
+    store.revoke(token, time.time() + 300)
+    asyncio.run(verifier.sync_revocations())
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(token))
+
+def test_revocation_check_skips_redis_on_bloom_miss(verifier, store):
+    store.revoke(make_token(sub="someone-else"), time.time() + 300)
+    asyncio.run(verifier.sync_revocations())
+    asyncio.run(verifier.verify(make_token()))
+    assert store.zscore_calls == 0
+
+def test_bloom_hit_is_confirmed_against_redis(verifier, store):
+    token = make_token()
+    verifier.revoked.add(jwt.get_unverified_claims(token)["jti"])
+    assert asyncio.run(verifier.verify(token))["sub"] == "analyst"
+    assert store.zscore_calls == 1
+
+def test_revocation_uses_jti(verifier, store):
+    token = make_token()
+    store.revoke(token, time.time() + 300)
+    asyncio.run(verifier.sync_revocations())
+    assert jwt.get_unverified_claims(token)["jti"] in store.zsets[REVOKED_KEY]
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(token))
+
+def test_generation_bump_revokes_older_tokens(verifier, store):
+    old = make_token(gen=0)
+    other_user = make_token(sub="someone-else")
+    asyncio.run(verifier.verify(old))
+
+    store.hashes[GENERATIONS_KEY] = {"analyst": "1"}
+    asyncio.run(verifier.sync_revocations())
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(old))
+    assert asyncio.run(verifier.verify(make_token(gen=1)))["gen"] == 1
+    assert asyncio.run(verifier.verify(other_user))["sub"] == "someone-else"
+
+def test_revocations_received_during_sync_are_kept(verifier, store):
+    token = make_token()
+    revoked_id = jwt.get_unverified_claims(token)["jti"]
+    snapshot = store.zrangebyscore
+
+    async def zrangebyscore(key, low, high):
+        # Published after the snapshot was taken, so it is not in it
+        members = await snapshot(key, low, high)
+        verifier.revoke(revoked_id)
+        verifier.apply_generation("someone-else:2")
+        store.revoke(token, time.time() + 300)
+        return members
+
+    store.zrangebyscore = zrangebyscore
+    asyncio.run(verifier.sync_revocations())
+    assert revoked_id in verifier.revoked
+    assert verifier.generations == {"someone-else": 2}
+    with pytest.raises(InvalidToken):
+        asyncio.run(verifier.verify(token))
+
+def test_overlapping_syncs_keep_revocations(verifier, store):
+    snapshot = store.zrangebyscore
+    calls = []
+
+    async def zrangebyscore(key, low, high):
+        calls.append(1)
+        members = await snapshot(key, low, high)
+        await asyncio.sleep(0)
+        # Published after each sync's snapshot was taken, so it is not in it
+        revoked_id = f"jti-{len(calls)}"
+        verifier.revoke(revoked_id)
+        store.zsets.setdefault(REVOKED_KEY, {})[revoked_id] = time.time() + 300
+        return members
+
+    store.zrangebyscore = zrangebyscore
+
+    async def run():
+        await asyncio.gather(verifier.sync_revocations(), verifier.sync_revocations())
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    assert "jti-1" in verifier.revoked and "jti-2" in verifier.revoked
+
+def test_generation_messages_only_move_forward(verifier):
+    verifier.apply_generation("svc:user:3")
+    verifier.apply_generation("svc:user:2")
+    assert verifier.generations == {"svc:user": 3}
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000)
+    items = [f"token-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 50
+
+def test_dependencies(verifier, monkeypatch):
+    monkeypatch.setattr(auth, "verifier", verifier)
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(current_user: str = Depends(auth.get_current_user)):
+        return {"user": current_user}
+
+    @app.get("/admin")
+    async def admin(claims: dict = Depends(auth.require_roles("admin"))):
+        return claims
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {make_token()}"}
+    assert client.get("/me", headers=headers).json() == {"user": "analyst"}
+    assert client.get("/me").status_code == 401
+    assert client.get("/me", headers={"Authorization": "Bearer bogus"}).status_code == 401
+    assert client.get("/admin", headers=headers).status_code == 403
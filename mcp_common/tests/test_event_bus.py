@@ -0,0 +1,197 @@
+import asyncio
+import json
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+import mcp_common.event_bus as event_bus
+from mcp_common.event_bus import COMPLETED, EVENT_DEAD_LETTER_STREAM, StageConsumer, next_stage, publish, status_key
+
+ALERT = {"alert": {"source": "siem", "event_type": "brute_force", "timestamp": 1700000000.0, "details": {}}}
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+@pytest.fixture
+def store(server):
+    """Sync view of the fake Redis, for assertions."""
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+def run(server, scenario):
+    """Run scenario(client) on a new event loop with an async client of the fake Redis."""
+    async def main():
+        return await scenario(fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    return asyncio.run(main())
+
+def entries(store, stage):
+    return [fields for _, fields in store.xrange(event_bus.stream(stage))]
+
+def pending(store, consumer):
+    return store.xpending(consumer.stream, consumer.group)["pending"]
+
+def handler_failing(times, result=None):
+    calls = []
+
+    async def handler(alert_id, event, token):
+        calls.append((alert_id, token))
+        if len(calls) <= times:
+            raise RuntimeError("service unavailable")
+        return result or {"severity": "high"}
+    return handler, calls
+
+def test_next_stage_follows_the_pipeline():
+    assert [next_stage(stage) for stage in event_bus.PIPELINE] == ["threat_intel", "investigation", "remediation",
+                                                                    COMPLETED]
+    assert next_stage(COMPLETED) is None
+
+def test_handled_entry_is_published_to_the_next_stage_then_acknowledged(server, store):
+    handler, calls = handler_failing(0)
+
+    async def scenario(client):
+        consumer = StageConsumer("triage", handler, client=client)
+        await consumer.ensure_group()
+        await publish("triage", "alert-1", ALERT, "token-1", client)
+        assert await client.get(status_key("alert-1")) == "triage"
+        for entry in await consumer._read("worker"):
+            await consumer._handle(*entry)
+        return consumer
+
+    consumer = run(server, scenario)
+    assert calls == [("alert-1", "token-1")]
+    [published] = entries(store, "threat_intel")
+    assert published["alert_id"] == "alert-1"
+    assert published["token"] == "token-1"
+    assert json.loads(published["payload"]) == {**ALERT, "triage": {"severity": "high"}}
+    assert json.loads(store.get("alert:alert-1:triage")) == {"severity": "high"}
+    assert store.get(status_key("alert-1")) == "threat_intel"
+    # Acknowledged and deleted, so the token no longer sits in the triage stream
+    assert pending(store, consumer) == 0
+    assert entries(store, "triage") == []
+
+def test_entry_is_not_acknowledged_when_the_next_publish_fails(server, store, monkeypatch):
+    handler, _ = handler_failing(0)
+
+    async def failing_publish(*args, **kwargs):
+        raise ConnectionError("Redis went away")
+
+    async def scenario(client):
+        consumer = StageConsumer("triage", handler, client=client)
+        await consumer.ensure_group()
+        await publish("triage", "alert-1", ALERT, None, client)
+        monkeypatch.setattr(event_bus, "publish", failing_publish)
+        for entry in await consumer._read("worker"):
+            await consumer._handle(*entry)
+        return consumer
+
+    consumer = run(server, scenario)
+    assert pending(store, consumer) == 1
+    assert len(entries(store, "triage")) == 1
+    assert store.get(status_key("alert-1")) == "triage"
+
+def test_failed_entry_is_reclaimed_after_retry_idle_ms(server, store):
+    handler, calls = handler_failing(1)
+
+    async def scenario(client):
+        consumer = StageConsumer("triage", handler, client=client, retry_idle_ms=100)
+        await consumer.ensure_group()
+        await publish("triage", "alert-1", ALERT, None, client)
+        for entry in await consumer._read("worker"):
+            await consumer._handle(*entry)
+        # Still within retry_idle_ms of the failed delivery
+        assert await consumer._reclaim("other-worker") == []
+        await asyncio.sleep(0.15)
+        reclaimed = await consumer._reclaim("other-worker")
+        assert [deliveries for _, _, deliveries in reclaimed] == [2]
+        for entry in reclaimed:
+            await consumer._handle(*entry)
+        return consumer
+
+    consumer = run(server, scenario)
+    assert len(calls) == 2
+    assert pending(store, consumer) == 0
+    assert len(entries(store, "threat_intel")) == 1
+    assert store.get(status_key("alert-1")) == "threat_intel"
+
+def test_entry_is_dead_lettered_and_reported_at_max_deliveries(server, store):
+    handler, calls = handler_failing(10)
+
+    async def scenario(client):
+        consumer = StageConsumer("investigation", handler, client=client, max_deliveries=2, retry_idle_ms=0)
+        await consumer.ensure_group()
+        await publish("investigation", "alert-1", ALERT, "token-1", client)
+        for entry in await consumer._read("worker"):
+            await consumer._handle(*entry)
+        assert await client.get(status_key("alert-1")) == "investigation"
+        for entry in await consumer._reclaim("worker"):
+            await consumer._handle(*entry)
+        return consumer
+
+    consumer = run(server, scenario)
+    assert len(calls) == 2
+    assert pending(store, consumer) == 0
+    assert entries(store, "investigation") == []
+
+    [dead] = store.xrange(EVENT_DEAD_LETTER_STREAM)
+    assert dead[1]["stage"] == "investigation"
+    assert dead[1]["reason"] == "Failed after 2 attempts: service unavailable"
+    assert "token" not in dead[1]
+
+    # The agent manager still hears about the alert, through the completed stream
+    [completed] = entries(store, COMPLETED)
+    assert json.loads(completed["payload"])["error"] == "investigation: Failed after 2 attempts: service unavailable"
+    assert completed["token"] == "token-1"
+    assert store.get("alert:alert-1:error") == "investigation: Failed after 2 attempts: service unavailable"
+    assert store.get(status_key("alert-1")) == "failed"
+
+def test_completed_events_end_the_pipeline(server, store):
+    handler, calls = handler_failing(0)
+
+    async def scenario(client):
+        consumer = StageConsumer(COMPLETED, handler, client=client)
+        await consumer.ensure_group()
+        await publish(COMPLETED, "alert-1", ALERT, None, client)
+        await client.set(status_key("alert-1"), "notified")
+        for entry in await consumer._read("worker"):
+            await consumer._handle(*entry)
+
+    run(server, scenario)
+    assert len(calls) == 1
+    assert store.get(status_key("alert-1")) == "notified"
+    assert store.get(f"alert:alert-1:{COMPLETED}") is None
+
+def test_consumers_carry_an_alert_through_every_stage(server, store):
+    seen = []
+
+    def stage_handler(stage):
+        async def handler(alert_id, event, token):
+            seen.append((stage, sorted(key for key in event if key != "alert")))
+            return {"stage": stage}
+        return handler
+
+    async def scenario(client):
+        consumers = [StageConsumer(stage, stage_handler(stage), client=client)
+                     for stage in event_bus.PIPELINE + [COMPLETED]]
+        for consumer in consumers:
+            consumer.start(workers=1)
+        try:
+            await publish("triage", "alert-1", ALERT, None, client)
+            for _ in range(200):
+                if len(seen) == len(consumers):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            for consumer in consumers:
+                await consumer.stop()
+
+    run(server, scenario)
+    assert seen == [
+        ("triage", []),
+        ("threat_intel", ["triage"]),
+        ("investigation", ["threat_intel", "triage"]),
+        ("remediation", ["investigation", "threat_intel", "triage"]),
+        (COMPLETED, ["investigation", "remediation", "threat_intel", "triage"])
+    ]
+    assert store.get(status_key("alert-1")) == COMPLETED
+    assert all(store.xlen(event_bus.stream(stage)) == 0 for stage in event_bus.PIPELINE + [COMPLETED])
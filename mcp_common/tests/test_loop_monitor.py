@@ -0,0 +1,47 @@
+import asyncio
+import queue
+
+import mcp_common.loop_monitor as loop_monitor
+from mcp_common.loop_monitor import LoopMonitor
+
+def blocking_call():
+    # Blocks inside queue.py and threading.py, which are skipped when finding the call site
+    try:
+        queue.Queue().get(timeout=0.3)
+    except queue.Empty:
+        pass
+
+async def handler():
+    blocking_call()
+
+def test_blocks_are_ranked_by_call_site():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+
+    async def run():
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        for _ in range(2):
+            await handler()
+            await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(run())
+    ranking = monitor.ranking()
+    assert len(ranking) == 1
+    assert ranking[0]["site"].startswith("blocking_call (test_loop_monitor.py:")
+    assert ranking[0]["count"] == 2
+    assert ranking[0]["blocked_ms"] >= 500
+    assert "in handler" in ranking[0]["stack"]
+    assert "queue.py" in ranking[0]["stack"]
+
+def test_no_blocks_when_the_loop_is_free():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+
+    async def run():
+        await monitor.start()
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+
+    asyncio.run(run())
+    assert monitor.ranking() == []
+    assert loop_monitor.LOOP_LAG.collect()[0].samples
@@ -0,0 +1,21 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from mcp_common.metrics import setup_metrics
+
+def test_metrics_are_labelled_by_route_template():
+    app = FastAPI()
+    setup_metrics(app)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"item_id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    body = client.get("/metrics").text
+
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"} 2.0' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 2.0' in body
+    assert 'route="/metrics"' not in body
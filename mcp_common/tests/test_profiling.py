@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import mcp_common.auth as auth
+from mcp_common.profiling import StackSampler, setup_profiling
+
+def make_app(roles):
+    app = FastAPI()
+    setup_profiling(app, enabled=True)
+    app.dependency_overrides[auth.get_current_claims] = lambda: {"sub": "someone", "roles": roles}
+
+    @app.get("/busy")
+    async def busy():
+        # Blocks the event loop, as a slow handler would
+        time.sleep(0.3)
+        return {}
+
+    @app.get("/waiting")
+    async def waiting():
+        await asyncio.sleep(0.2)
+        return {}
+
+    return app
+
+def test_endpoints_are_opt_in_and_admin_only():
+    disabled = FastAPI()
+    setup_profiling(disabled, enabled=False)
+    assert TestClient(disabled).get("/debug/tasks").status_code == 404
+    assert TestClient(make_app(["user"])).get("/debug/tasks").status_code == 403
+
+def test_sampler_counts_collapsed_stacks():
+    def spin_here(stop):
+        while not stop.is_set():
+            pass
+
+    stop = threading.Event()
+    worker = threading.Thread(target=spin_here, args=(stop,))
+    worker.start()
+    try:
+        sampler = StackSampler(0.001, [worker.ident])
+        sampler.run(0.05)
+    finally:
+        stop.set()
+        worker.join()
+    assert sampler.samples > 0
+    stack, count = sampler.collapsed().splitlines()[0].rsplit(" ", 1)
+    frames = stack.split(";")
+    assert frames[0].startswith("_bootstrap (threading.py:")
+    assert any(frame.startswith("spin_here (test_profiling.py:") for frame in frames)
+    assert int(count) > 0
+
+def test_profile_loop_lag_and_tasks():
+    with TestClient(make_app(["admin"])) as client:
+        # The profile samples the loop thread while another request blocks it
+        blocker = threading.Thread(target=lambda: (time.sleep(0.05), client.get("/busy")))
+        blocker.start()
+        response = client.get("/debug/profile", params={"seconds": 0.5, "interval_ms": 5})
+        blocker.join()
+        assert response.status_code == 200
+        assert int(response.headers["X-Profile-Samples"]) > 10
+        assert "busy (test_profiling.py:" in response.text
+
+        assert client.get("/debug/profile", params={"seconds": 3600}).status_code == 400
+        lag = client.get("/debug/loop-lag", params={"seconds": 0.1}).json()
+        assert lag["samples"] > 0 and lag["max_ms"] >= lag["p50_ms"] >= 0
+        waiter = threading.Thread(target=client.get, args=("/waiting",))
+        waiter.start()
+        time.sleep(0.05)
+        tasks = client.get("/debug/tasks").json()
+        waiter.join()
+        assert tasks["count"] == len(tasks["tasks"])
+        stacks = [frame for task in tasks["tasks"] for frame in task["stack"]]
+        assert any(frame.startswith("waiting (test_profiling.py:") for frame in stacks)
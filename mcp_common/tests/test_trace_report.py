@@ -0,0 +1,18 @@
+from mcp_common.trace_report import summarise
+
+def make_span(span_id, parent_id, service, name, start, duration_ms):
+    return {"trace_id": "0x1", "span_id": span_id, "parent_id": parent_id, "name": name, "service": service,
+            "alert_id": "abc" if parent_id is None else None, "start": start, "duration_ms": duration_ms}
+
+def test_service_time_excludes_downstream_calls():
+    spans = [
+        make_span("a", None, "agent-manager", "POST /alert", 0.0, 100),
+        make_span("b", "a", "agent-manager", "POST", 0.01, 60),
+        make_span("c", "b", "triage-agent", "POST /triage", 0.015, 50),
+        make_span("d", "c", "triage-agent", "SET", 0.02, 5),
+    ]
+    report = summarise(spans, top=10)
+    trace = report["traces"][0]
+    assert trace["alert_id"] == "abc"
+    assert trace["services_ms"] == {"agent-manager": 50, "triage-agent": 50}
+    assert report["operations"][0]["name"] == "POST /alert"
@@ -0,0 +1,112 @@
+"""
+Summarise a TRACE_FILE written by mcp_common.tracing.
+
+Prints, per trace, the wall time and the time spent in each service
+(excluding time spent waiting on the services it called), and, across all
+traces, the count, total and mean duration of every operation, slowest first.
+
+Usage:
+    python -m mcp_common.trace_report traces.jsonl [--trace TRACE_ID] [--top 20] [--json]
+"""
+import argparse
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+def parse_time(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+def load_spans(path: str) -> List[Dict]:
+    spans = []
+    with open(path) as trace_file:
+        for line in trace_file:
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            start, end = parse_time(raw["start_time"]), parse_time(raw["end_time"])
+            spans.append({
+                "trace_id": raw["context"]["trace_id"],
+                "span_id": raw["context"]["span_id"],
+                "parent_id": raw.get("parent_id"),
+                "name": raw["name"],
+                "service": raw.get("resource", {}).get("attributes", {}).get("service.name", "unknown"),
+                "alert_id": raw.get("attributes", {}).get("alert.id"),
+                "start": start,
+                "duration_ms": (end - start) * 1000
+            })
+    return spans
+
+def summarise(spans: List[Dict], top: int) -> Dict:
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+
+    per_trace = []
+    for trace_id, trace_spans in traces.items():
+        start = min(span["start"] for span in trace_spans)
+        end = max(span["start"] + span["duration_ms"] / 1000 for span in trace_spans)
+        by_id = {span["span_id"]: span for span in trace_spans}
+
+        def entry_of(span):
+            """The span where the request entered span's service."""
+            while span["parent_id"] in by_id and by_id[span["parent_id"]]["service"] == span["service"]:
+                span = by_id[span["parent_id"]]
+            return span
+
+        # Time in each service excluding the downstream services it waited on
+        services = defaultdict(float)
+        for span in trace_spans:
+            if entry_of(span) is not span:
+                continue
+            services[span["service"]] += span["duration_ms"]
+            if span["parent_id"] in by_id:
+                services[entry_of(by_id[span["parent_id"]])["service"]] -= span["duration_ms"]
+        services = {service: max(ms, 0.0) for service, ms in services.items()}
+        per_trace.append({
+            "trace_id": trace_id,
+            "alert_id": next((span["alert_id"] for span in trace_spans if span["alert_id"]), None),
+            "spans": len(trace_spans),
+            "wall_ms": (end - start) * 1000,
+            "services_ms": dict(sorted(services.items(), key=lambda item: -item[1]))
+        })
+    per_trace.sort(key=lambda row: -row["wall_ms"])
+
+    by_name = defaultdict(list)
+    for span in spans:
+        by_name[(span["service"], span["name"])].append(span["duration_ms"])
+    operations = [
+        {"service": service, "name": name, "count": len(durations),
+         "total_ms": sum(durations), "mean_ms": sum(durations) / len(durations), "max_ms": max(durations)}
+        for (service, name), durations in by_name.items()
+    ]
+    operations.sort(key=lambda row: -row["total_ms"])
+    return {"traces": per_trace, "operations": operations[:top]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="trace file written with TRACE_FILE")
+    parser.add_argument("--trace", help="only this trace id")
+    parser.add_argument("--top", type=int, default=20, help="operations to list")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    if args.trace:
+        spans = [span for span in spans if span["trace_id"].endswith(args.trace.lower().removeprefix("0x"))]
+    report = summarise(spans, args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for row in report["traces"]:
+        services = ", ".join(f"{service} {ms:.0f} ms" for service, ms in row["services_ms"].items())
+        print(f"{row['trace_id']} alert={row['alert_id']} {row['spans']} spans {row['wall_ms']:.0f} ms: {services}")
+    print()
+    print(f"{'service':<22}{'operation':<40}{'count':>7}{'total ms':>11}{'mean ms':>10}{'max ms':>10}")
+    for row in report["operations"]:
+        print(f"{row['service']:<22}{row['name'][:39]:<40}{row['count']:>7}{row['total_ms']:>11.1f}"
+              f"{row['mean_ms']:>10.1f}{row['max_ms']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+OpenTelemetry tracing for the MCP services.
+
+setup_tracing() instruments a FastAPI app, every httpx client and every
+redis-py client in the process. Incoming requests continue the trace in
+their traceparent header, and outgoing httpx requests carry it on, so an
+alert processed by the agent manager shows up as one trace across every
+agent it touches. Calls that do not go through httpx or Redis (LLM SDKs,
+SSH, SMTP) can be wrapped in span().
+
+Spans are exported to an OTLP collector when OTEL_EXPORTER_OTLP_ENDPOINT is
+set, and appended as JSON lines to TRACE_FILE when that is set; see
+mcp_common/trace_report.py for summarising a trace file.
+
+Usage in a service:
+
+    from mcp_common.tracing import setup_tracing
+
+    setup_tracing(app, "triage-agent")
+"""
+import logging
+import os
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from opentelemetry import trace
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+from opentelemetry.instrumentation.redis import RedisInstrumentor
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")  # e.g. http://otel-collector:4318
+TRACE_FILE = os.getenv("TRACE_FILE")  # JSON lines, one span per line
+TRACE_EXCLUDED_URLS = os.getenv("TRACE_EXCLUDED_URLS", "health,metrics")
+
+# Alert being processed, set by the agent manager and forwarded to every agent
+ALERT_ID_HEADER = "X-Alert-ID"
+
+tracer = trace.get_tracer("mcp")
+
+def setup_tracing(app: FastAPI, service_name: str) -> Optional[TracerProvider]:
+    """Install a tracer provider for this process and instrument app, httpx and Redis."""
+    if not TRACING_ENABLED:
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    if OTLP_ENDPOINT:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{OTLP_ENDPOINT}/v1/traces")))
+    if TRACE_FILE:
+        trace_file = open(TRACE_FILE, "a")
+        provider.add_span_processor(BatchSpanProcessor(
+            ConsoleSpanExporter(out=trace_file, formatter=lambda span: span.to_json(indent=None) + "\n")
+        ))
+    trace.set_tracer_provider(provider)
+
+    FastAPIInstrumentor.instrument_app(app, tracer_provider=provider, excluded_urls=TRACE_EXCLUDED_URLS)
+    if not HTTPXClientInstrumentor().is_instrumented_by_opentelemetry:
+        HTTPXClientInstrumentor().instrument(tracer_provider=provider)
+    if not RedisInstrumentor().is_instrumented_by_opentelemetry:
+        RedisInstrumentor().instrument(tracer_provider=provider)
+
+    # Flush buffered spans before the process exits
+    app.add_event_handler("shutdown", provider.shutdown)
+    return provider
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child span of the current request, e.g. an external API call."""
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+def set_alert_id(alert_id: str):
+    """Tag the current span with the alert being processed."""
+    trace.get_current_span().set_attribute("alert.id", alert_id)
+
+def get_alert_id(request: Request) -> Optional[str]:
+    """Dependency returning the alert id forwarded by the agent manager, tagging the request's span with it."""
+    alert_id = request.headers.get(ALERT_ID_HEADER)
+    if alert_id:
+        set_alert_id(alert_id)
+    return alert_id